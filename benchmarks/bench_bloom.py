@@ -0,0 +1,141 @@
+"""Measured false positive rate, speed and size of the URL dedup filters from 10K to 10M URLs.
+
+Every filter is configured the way the crawler configures its own
+(bloom_filter.initial_capacity / error_rate), fed N synthetic URLs and then
+asked about URLs it has never seen. Run from the repository root:
+
+    python -m benchmarks.bench_bloom --sizes 10000 100000 1000000 10000000 --json bloom.json
+"""
+import argparse
+import json
+import platform
+import time
+
+import config.crawler_config as crawler_config
+from bloom_filter.adaptive_bloom import AdaptiveBloomFilter
+from bloom_filter.numpy_bloom import NumpyBloomFilter
+from bloom_filter.scalable_bloom import ScalableBloomFilter
+
+try:
+    import pybloom_live
+except ImportError:
+    pybloom_live = None
+
+def make_urls(start, count, prefix='https://site'):
+    return [f'{prefix}{i % 9973}.example.com/path/{i}?ref={i * 2654435761 % 2 ** 32}'
+            for i in range(start, start + count)]
+
+class PyBloomAdapter:
+    """pybloom_live filters behind the add_many / contains_many calls the crawler uses."""
+    def __init__(self, bloom):
+        self.bloom = bloom
+
+    def add_many(self, items):
+        for item in items:
+            self.bloom.add(item)
+
+    def contains_many(self, items):
+        return [item in self.bloom for item in items]
+
+    @property
+    def num_bits(self):
+        filters = getattr(self.bloom, 'filters', [self.bloom])
+        return sum(len(f.bitarray) for f in filters)
+
+def make_filters(capacity, error_rate):
+    """name -> (factory, pure Python?)"""
+    filters = {
+        'adaptive': (lambda: AdaptiveBloomFilter(initial_capacity=capacity, error_rate=error_rate), False),
+        'scalable': (lambda: ScalableBloomFilter(initial_capacity=capacity, error_rate=error_rate), False),
+        'fixed': (lambda: NumpyBloomFilter(capacity, error_rate), False)
+    }
+    if pybloom_live is not None:
+        filters['pybloom'] = (lambda: PyBloomAdapter(pybloom_live.BloomFilter(capacity, error_rate)), True)
+        filters['pybloom_scalable'] = (lambda: PyBloomAdapter(pybloom_live.ScalableBloomFilter(
+            initial_capacity=capacity, error_rate=error_rate)), True)
+    return filters
+
+def num_bits(bloom):
+    if isinstance(bloom, AdaptiveBloomFilter):
+        return bloom.bloom_filter.num_bits
+    return bloom.num_bits
+
+def measure(factory, urls, queries, batch):
+    bloom = factory()
+    started = time.perf_counter()
+    for start in range(0, urls, batch):
+        bloom.add_many(make_urls(start, min(batch, urls - start)))
+    insert_time = time.perf_counter() - started
+
+    false_positives = 0
+    started = time.perf_counter()
+    for start in range(0, queries, batch):
+        probes = make_urls(start, min(batch, queries - start), prefix='https://unseen')
+        false_positives += int(sum(bool(hit) for hit in bloom.contains_many(probes)))
+    query_time = time.perf_counter() - started
+
+    sample = make_urls(max(0, urls - 1000), min(1000, urls))
+    false_negatives = len(sample) - int(sum(bool(hit) for hit in bloom.contains_many(sample)))
+    return {
+        'fpr': false_positives / queries,
+        'false_negatives': false_negatives,
+        'inserts_per_sec': round(urls / insert_time),
+        'queries_per_sec': round(queries / query_time),
+        'memory_bytes': num_bits(bloom) // 8
+    }
+
+def benchmark(sizes, capacity, error_rate, queries, batch, python_max, names=None):
+    filters = make_filters(capacity, error_rate)
+    results = []
+    for urls in sizes:
+        for name, (factory, pure_python) in filters.items():
+            if names and name not in names:
+                continue
+            entry = {'filter': name, 'urls': urls}
+            if pure_python and urls > python_max:
+                entry['skipped'] = f'pure Python; above --python-max {python_max}'
+            else:
+                try:
+                    entry.update(measure(factory, urls, queries, batch))
+                except IndexError as e:
+                    # pybloom_live's fixed filter refuses inserts past its capacity
+                    entry['skipped'] = str(e)
+            results.append(entry)
+            print(json.dumps(entry), flush=True)
+    return {
+        'benchmark': 'bloom',
+        'python': platform.python_version(),
+        'params': {
+            'capacity': capacity,
+            'error_rate': error_rate,
+            'queries': queries,
+            'sizes': list(sizes)
+        },
+        'results': results
+    }
+
+def add_arguments(parser):
+    bloom_config = crawler_config.CONFIG.get('bloom_filter', {})
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000, 10000000],
+                        help='URL counts to insert')
+    parser.add_argument('--capacity', type=int, default=bloom_config.get('initial_capacity', 1000000))
+    parser.add_argument('--error-rate', type=float, default=bloom_config.get('error_rate', 0.001))
+    parser.add_argument('--queries', type=int, default=100000, help='unseen URLs probed for the FPR')
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--python-max', type=int, default=1000000,
+                        help='largest size run through the pure-Python pybloom_live filters')
+    parser.add_argument('--filters', nargs='+', help='only these filters')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--json', metavar='PATH', help='write the results to PATH')
+    args = parser.parse_args()
+    results = benchmark(args.sizes, args.capacity, args.error_rate, args.queries, args.batch,
+                        args.python_max, args.filters)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(json.dumps(results, indent=2, sort_keys=True) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""End-to-end crawl throughput against a local synthetic site and a local Redis.
+
+Needs no network access. Run from the repository root:
+
+    python -m benchmarks.bench_crawl --max-pages 2000 --hosts 8 --latency 0.01 --json crawl.json
+"""
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import config.crawler_config as crawler_config
+from benchmarks.mock_site import serve
+from benchmarks.redis_standin import RedisStandIn
+from crawler.crawler import WebCrawler
+
+def rss_bytes():
+    """Current resident set size; the peak where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def bench_config(args, redis_port):
+    config = copy.deepcopy(crawler_config.CONFIG)
+    config.update({
+        'max_urls': args.max_pages,
+        'num_workers': args.workers,
+        'max_in_flight': args.workers,
+        'max_per_host': max(1, args.workers // args.hosts),
+        'max_depth': 1000,
+        'crawl_delay': 0,
+        'redis': {'host': '127.0.0.1', 'port': redis_port},
+        'checkpoint': {'enabled': False},
+        'drain_timeout': 0
+    })
+    config['bloom_filter']['snapshot_path'] = None
+    config['dedup']['backend'] = args.dedup
+    config['parse_pool']['workers'] = args.parse_workers
+    config['metrics'] = dict(config.get('metrics', {}), http_port=None, flush_interval=3600,
+                             sample_every=1, keep_samples=True)
+    return config
+
+async def crawl(config, start_urls, verbose=False):
+    crawler = WebCrawler(config)
+    rss_start = rss_bytes()
+    rss_peak = rss_start
+
+    async def sample_memory():
+        nonlocal rss_peak
+        while True:
+            rss_peak = max(rss_peak, rss_bytes())
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        counters = await crawler.crawl(start_urls)
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    rss_end = rss_bytes()
+    latency = {}
+    for (name, labels), histogram in sorted(crawler.metrics.histograms.items()):
+        key = name.replace('_seconds', '') + ''.join(f'[{value}]' for _, value in labels)
+        latency[key] = {
+            'count': histogram.count,
+            'p50_ms': round(histogram.quantile(0.5) * 1000, 3),
+            'p99_ms': round(histogram.quantile(0.99) * 1000, 3)
+        }
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'pages_crawled': counters['crawled'],
+        'pages_per_sec': round(counters['crawled'] / elapsed, 1),
+        'fetch_to_store_ms': latency.get('fetch_to_store', {}),
+        'latency_ms': latency,
+        'memory_mb': {
+            'start': round(rss_start / 2 ** 20, 1),
+            'peak': round(rss_peak / 2 ** 20, 1),
+            'end': round(rss_end / 2 ** 20, 1),
+            'growth': round((rss_end - rss_start) / 2 ** 20, 1)
+        },
+        'counters': counters
+    }
+
+def benchmark(args):
+    site_params = {
+        'pages': args.graph_pages or args.max_pages * 10,
+        'fan_out': args.fan_out,
+        'page_bytes': args.page_bytes,
+        'latency': args.latency,
+        'dup_ratio': args.dup_ratio,
+        'hosts': args.hosts,
+        'seed': args.seed
+    }
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    # The site runs in its own process so serving pages doesn't eat the crawler's CPU
+    site = context.Process(target=serve, args=(site_params, ready), daemon=True)
+    site.start()
+    try:
+        ports = ready.get(timeout=30)
+        with RedisStandIn(args.redis) as standin:
+            os.environ['REDIS_HOST'] = standin.host
+            os.environ['REDIS_PORT'] = str(standin.port)
+            config = bench_config(args, standin.port)
+            start_urls = [f'http://127.0.0.1:{port}/p/{n}' for n, port in enumerate(ports)]
+            results = asyncio.run(crawl(config, start_urls, args.verbose))
+            redis_backend = standin.backend
+    finally:
+        site.terminate()
+        site.join()
+    return {
+        'benchmark': 'crawl',
+        'python': platform.python_version(),
+        'redis': redis_backend,
+        'params': dict(site_params, max_pages=args.max_pages, workers=args.workers,
+                       parse_workers=args.parse_workers, dedup=args.dedup),
+        **results
+    }
+
+def add_arguments(parser):
+    parser.add_argument('--max-pages', type=int, default=1000, help='pages to crawl')
+    parser.add_argument('--graph-pages', type=int, help='pages in the site (default: 10x --max-pages)')
+    parser.add_argument('--fan-out', type=int, default=10, help='links per page')
+    parser.add_argument('--page-bytes', type=int, default=16384)
+    parser.add_argument('--latency', type=float, default=0.005, help='server delay per page, seconds')
+    parser.add_argument('--dup-ratio', type=float, default=0.05, help='share of pages duplicating another')
+    parser.add_argument('--hosts', type=int, default=4, help='local ports acting as separate hosts')
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--parse-workers', type=int, default=0, help='parser processes; 0 parses inline')
+    parser.add_argument('--dedup', choices=['local', 'redis'], default='local')
+    parser.add_argument('--redis', choices=['auto', 'server', 'fakeredis'], default='auto',
+                        help='local Redis stand-in to use')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="show the crawler's own output")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--json', metavar='PATH', help='also write the results to PATH')
+    args = parser.parse_args()
+    results = benchmark(args)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    print(output)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
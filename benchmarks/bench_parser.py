@@ -0,0 +1,91 @@
+"""Compare per-core page parsing throughput: BeautifulSoup vs the streaming extractor.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parser --pages 200 --links 250
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from bs4 import BeautifulSoup
+
+from crawler.extractor import extract_page
+
+def make_page(num_links, paragraphs, seed):
+    rng = random.Random(seed)
+    word = lambda: ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+    parts = ['<!DOCTYPE html><html><head><title>', word(), ' ', word(), '</title>',
+             '<base href="https://example.com/">',
+             '<style>body { font-family: sans-serif; }</style>',
+             '<script>var x = "<a href=\\"/no\\">";</script></head><body>']
+    for i in range(paragraphs):
+        parts.append('<div class="c"><p>')
+        parts.append(' '.join(word() for _ in range(40)))
+        parts.append('</p></div>')
+        for j in range(num_links // paragraphs):
+            href = f'/{word()}/{word()}?id={rng.randint(0, 10**6)}' if rng.random() < 0.7 \
+                else f'https://{word()}.org/{word()}'
+            parts.append(f'<a href="{href}" class="l">{word()} {word()}</a> ')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+def parse_with_bs4(html):
+    """What the crawler and utils did before: one full parse per field."""
+    soup = BeautifulSoup(html, 'html.parser')
+    links = [a['href'] for a in soup.find_all('a', href=True)]
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string if soup.title else None
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+    return links, title, text
+
+def parse_with_extractor(html):
+    page = extract_page(html)
+    return page.links, page.title, page.text
+
+def run(parse, pages):
+    start = time.perf_counter()
+    for html in pages:
+        parse(html)
+    elapsed = time.perf_counter() - start
+    return len(pages) / elapsed
+
+def benchmark(num_pages, links, paragraphs):
+    pages = [make_page(links, paragraphs, seed) for seed in range(num_pages)]
+    avg_kb = sum(len(p) for p in pages) / len(pages) / 1024
+    results = {
+        'pages': num_pages,
+        'avg_page_kb': round(avg_kb, 1),
+        'bs4_pages_per_sec': round(run(parse_with_bs4, pages), 1),
+        'extractor_pages_per_sec': round(run(parse_with_extractor, pages), 1)
+    }
+    results['speedup'] = round(results['extractor_pages_per_sec'] / results['bs4_pages_per_sec'], 2)
+    return results
+
+def add_arguments(parser):
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--links', type=int, default=250)
+    parser.add_argument('--paragraphs', type=int, default=50)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = benchmark(args.pages, args.links, args.paragraphs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.pages} pages, {results['avg_page_kb']:.1f} KB average, single core")
+        print(f"BeautifulSoup (3 parses): {results['bs4_pages_per_sec']:.1f} pages/s")
+        print(f"Streaming extractor:      {results['extractor_pages_per_sec']:.1f} pages/s")
+        print(f"Speedup: {results['speedup']}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Show how the numbers in two benchmark JSON files differ.
+
+    python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import json
+
+def flatten(value, prefix=''):
+    """Numeric leaves keyed by dotted path; Bloom results by filter and size."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((f"{entry.get('filter')}@{entry.get('urls')}" if isinstance(entry, dict) and 'filter' in entry
+                  else str(index), entry) for index, entry in enumerate(value))
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, child in items:
+        flat.update(flatten(child, f'{prefix}.{key}' if prefix else str(key)))
+    return flat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.0,
+                        help='only show changes larger than this fraction (e.g. 0.05)')
+    args = parser.parse_args()
+    with open(args.old) as f:
+        old = flatten(json.load(f))
+    with open(args.new) as f:
+        new = flatten(json.load(f))
+    for key in sorted(set(old) | set(new)):
+        if key in ('started', 'duration_s'):
+            continue
+        before, after = old.get(key), new.get(key)
+        if before is None or after is None:
+            print(f"{key}: {before} -> {after}")
+            continue
+        if before == after:
+            continue
+        change = (after - before) / abs(before) if before else float('inf')
+        if abs(change) > args.threshold:
+            print(f"{key}: {before} -> {after} ({change:+.1%})")
+
+if __name__ == '__main__':
+    main()
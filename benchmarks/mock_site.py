@@ -0,0 +1,130 @@
+"""Synthetic link-graph web server for offline crawl benchmarks.
+
+Serves a deterministic random link graph on 127.0.0.1 so crawl benchmarks
+run without network access and every run crawls the same pages:
+
+    python -m benchmarks.mock_site --pages 10000 --fan-out 10 --hosts 4
+"""
+import argparse
+import asyncio
+import random
+import socket
+import string
+
+from aiohttp import web
+
+class LinkGraphSite:
+    """Pages /p/<n> of a seeded random graph, spread over `hosts` local ports.
+
+    Each page links to fan_out others, is padded to about page_bytes and
+    answers after `latency` seconds. A dup_ratio share of the pages serve
+    another page's body under their own URL, like mirrors do, which is
+    what content dedup has to catch. Every port is a separate host as far
+    as the crawler's per-host politeness is concerned.
+    """
+    def __init__(self, pages=10000, fan_out=10, page_bytes=16384, latency=0.0, dup_ratio=0.0,
+                 hosts=1, seed=0):
+        self.pages = pages
+        self.fan_out = fan_out
+        self.page_bytes = page_bytes
+        self.latency = latency
+        self.dup_ratio = dup_ratio
+        self.hosts = hosts
+        self.seed = seed
+        self.ports = []
+        self.runner = None
+        self.words = [''.join(random.Random(seed + i).choices(string.ascii_lowercase, k=3 + i % 8))
+                      for i in range(2000)]
+
+    def url(self, n):
+        return f'http://127.0.0.1:{self.ports[n % self.hosts]}/p/{n}'
+
+    def start_urls(self, count=1):
+        return [self.url(n) for n in range(min(count, self.pages))]
+
+    def original(self, n):
+        """The page whose body page n serves; n itself unless it's a duplicate."""
+        rng = random.Random(self.seed * 1000003 + n)
+        if n and rng.random() < self.dup_ratio:
+            return rng.randrange(n)
+        return n
+
+    def render(self, n):
+        rng = random.Random(self.seed * 7919 + n)
+        links = ''.join(f'<li><a href="{self.url(rng.randrange(self.pages))}">{rng.choice(self.words)}</a></li>'
+                        for _ in range(self.fan_out))
+        head = f'<!DOCTYPE html><html><head><title>Page {n}</title></head><body><h1>Page {n}</h1><ul>{links}</ul>'
+        parts = [head]
+        size = len(head)
+        while size < self.page_bytes:
+            paragraph = '<p>' + ' '.join(rng.choice(self.words) for _ in range(60)) + '</p>'
+            parts.append(paragraph)
+            size += len(paragraph)
+        parts.append('</body></html>')
+        return ''.join(parts)
+
+    async def handle_page(self, request):
+        n = int(request.match_info['n'])
+        if n >= self.pages:
+            raise web.HTTPNotFound()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.Response(text=self.render(self.original(n)), content_type='text/html')
+
+    async def handle_robots(self, request):
+        return web.Response(text='User-agent: *\nAllow: /\n')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/p/{n}', self.handle_page)
+        app.router.add_get('/robots.txt', self.handle_robots)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        for _ in range(self.hosts):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(('127.0.0.1', 0))
+            self.ports.append(sock.getsockname()[1])
+            await web.SockSite(self.runner, sock).start()
+        return self.ports
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+def serve(params, ready):
+    """Process target: run a site built from params and report its ports on `ready`."""
+    async def run():
+        site = LinkGraphSite(**params)
+        ready.put(await site.start())
+        await asyncio.Event().wait()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--fan-out', type=int, default=10)
+    parser.add_argument('--page-bytes', type=int, default=16384)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before each response')
+    parser.add_argument('--dup-ratio', type=float, default=0.0)
+    parser.add_argument('--hosts', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    async def run():
+        site = LinkGraphSite(args.pages, args.fan_out, args.page_bytes, args.latency, args.dup_ratio,
+                             args.hosts, args.seed)
+        await site.start()
+        print(f"Serving {args.pages} pages; start at {site.url(0)}")
+        await asyncio.Event().wait()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
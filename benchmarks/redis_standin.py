@@ -0,0 +1,81 @@
+"""A throwaway local Redis for benchmarks: a redis-server child process, or fakeredis over TCP."""
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import redis
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class RedisStandIn:
+    """Starts an empty Redis on a free localhost port and stops it afterwards.
+
+    backend 'server' runs the redis-server binary with persistence off;
+    'fakeredis' serves fakeredis over TCP from a thread (slower, but needs
+    nothing installed beyond the package); 'auto' prefers the real server.
+    """
+    def __init__(self, backend='auto'):
+        self.backend = backend
+        self.host = '127.0.0.1'
+        self.port = None
+        self.process = None
+        self.server = None
+
+    def start(self):
+        backend = self.backend
+        if backend == 'auto':
+            backend = 'server' if shutil.which('redis-server') else 'fakeredis'
+        self.port = free_port()
+        if backend == 'server':
+            self.process = subprocess.Popen(
+                [shutil.which('redis-server') or 'redis-server', '--port', str(self.port), '--bind', self.host,
+                 '--save', '', '--appendonly', 'no'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elif backend == 'fakeredis':
+            try:
+                from fakeredis import TcpFakeServer
+            except ImportError:
+                raise RuntimeError("No redis-server on PATH and fakeredis is not installed; "
+                                   "install one of them to run this benchmark")
+            self.server = TcpFakeServer((self.host, self.port), server_type='redis')
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        else:
+            raise ValueError(f"Unknown Redis backend: {backend}")
+        self.backend = backend
+        self.wait_ready()
+        return self
+
+    def wait_ready(self, timeout=10):
+        client = redis.Redis(host=self.host, port=self.port)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                client.ping()
+                return
+            except redis.ConnectionError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+            finally:
+                client.close()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
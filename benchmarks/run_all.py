@@ -0,0 +1,63 @@
+"""Run the parser, Bloom filter and crawl benchmarks and write one JSON file to diff across releases.
+
+Everything runs locally (synthetic pages, a mock site and a throwaway
+Redis), so results only depend on the code and the machine:
+
+    python -m benchmarks.run_all --json results/0.1.0.json
+    python -m benchmarks.compare results/0.1.0.json results/0.2.0.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+from benchmarks import bench_bloom, bench_crawl, bench_parser
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def defaults(module, argv):
+    parser = argparse.ArgumentParser()
+    module.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json', metavar='PATH', required=True, help='where to write the results')
+    parser.add_argument('--quick', action='store_true', help='smaller sizes for a smoke run')
+    parser.add_argument('--redis', choices=['auto', 'server', 'fakeredis'], default='auto')
+    args = parser.parse_args()
+
+    parser_args = defaults(bench_parser, ['--pages', '20'] if args.quick else [])
+    bloom_args = defaults(bench_bloom, ['--sizes', '10000', '100000'] if args.quick else [])
+    crawl_args = defaults(bench_crawl, (['--max-pages', '200'] if args.quick else []) + ['--redis', args.redis])
+
+    started = time.time()
+    print("Parser benchmark...")
+    parser_results = bench_parser.benchmark(parser_args.pages, parser_args.links, parser_args.paragraphs)
+    print("Bloom filter benchmark...")
+    bloom_results = bench_bloom.benchmark(bloom_args.sizes, bloom_args.capacity, bloom_args.error_rate,
+                                          bloom_args.queries, bloom_args.batch, bloom_args.python_max)
+    print("Crawl benchmark...")
+    crawl_results = bench_crawl.benchmark(crawl_args)
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'started': started,
+        'duration_s': round(time.time() - started, 1),
+        'parser': parser_results,
+        'bloom': bloom_results,
+        'crawl': crawl_results
+    }
+    with open(args.json, 'w') as f:
+        f.write(json.dumps(results, indent=2, sort_keys=True) + '\n')
+    print(f"Wrote {args.json}")
+
+if __name__ == '__main__':
+    main()
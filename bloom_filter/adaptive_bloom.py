@@ -1,15 +1,19 @@
 import hashlib
 import math
-from pybloom_live import BloomFilter
+from bloom_filter.scalable_bloom import ScalableBloomFilter
+from bloom_filter.snapshot import save_snapshot, load_snapshot
 import random
 import string
 from urllib.parse import urlparse
 
 class AdaptiveBloomFilter:
-    def __init__(self, initial_capacity=50, error_rate=0.2, adaptation_threshold=0.05):
-        self.bloom_filter = BloomFilter(capacity=initial_capacity, error_rate=error_rate)
+    def __init__(self, initial_capacity=50, error_rate=0.2, adaptation_threshold=0.05, reservoir_size=1000,
+                 grow_fill=0.9):
+        self.bloom_filter = ScalableBloomFilter(initial_capacity=initial_capacity, error_rate=error_rate)
         self.hash_functions = [hashlib.md5, hashlib.sha1, hashlib.sha256]
-        self.inserted_items = set()
+        # A uniform sample of inserted items, used only to estimate FPR/FNR
+        self.reservoir_size = reservoir_size
+        self.inserted_items = []
         self.stats = {
             'total_checks': 0,
             'false_positives': 0,
@@ -20,19 +24,43 @@ class AdaptiveBloomFilter:
         self.adaptation_threshold = adaptation_threshold  # 1% error rate threshold
         self.last_fpr = 0
         self.last_fnr = 0
+        self.grow_fill = grow_fill  # Only add a slice once the newest one is this full
+        self.fpr_before_growth = None
 
     def add(self, item):
-        self.bloom_filter.add(item)
-        self.inserted_items.add(item)
+        self.add_many([item])
+
+    def add_many(self, items):
+        """Add a batch of items and return a bool array of which were already present."""
+        present = self.bloom_filter.add_many(items)
+        count = self.bloom_filter.count - int((~present).sum())
+        for item, was_present in zip(items, present):
+            if was_present:
+                continue
+            # Reservoir sampling keeps the sample uniform over everything inserted
+            count += 1
+            if len(self.inserted_items) < self.reservoir_size:
+                self.inserted_items.append(item)
+            else:
+                index = random.randrange(count)
+                if index < self.reservoir_size:
+                    self.inserted_items[index] = item
+        return present
 
     def contains(self, item):
         result = item in self.bloom_filter
         self.stats['total_checks'] += 1
         return result
 
+    def contains_many(self, items):
+        """Return a bool array telling which items are (probably) present."""
+        self.stats['total_checks'] += len(items)
+        return self.bloom_filter.contains_many(items)
+
     def sample_fpr(self, num_samples=50):
         """Test FPR by querying random non-inserted items that resemble real URLs."""
         false_positives = 0
+        sampled = set(self.inserted_items)
         
         # Extract patterns from real inserted URLs to create similar test URLs
         real_domains = set()
@@ -66,7 +94,7 @@ class AdaptiveBloomFilter:
             # Determine test type - 30% very similar to real URLs, 70% more random
             if random.random() < 0.3 and self.inserted_items:
                 # Take a real URL and modify it slightly to create a false positive
-                real_url = random.choice(list(self.inserted_items))
+                real_url = random.choice(self.inserted_items)
                 try:
                     parsed = urlparse(real_url)
                     # Change just a small part of the URL
@@ -101,8 +129,8 @@ class AdaptiveBloomFilter:
                 rand_id = ''.join(random.choices(string.digits + string.ascii_lowercase, k=4))
                 fake_url = f"https://{domain}/{path}/{rand_id}"
             
-            # Skip if we accidentally generated a real URL
-            if fake_url in self.inserted_items:
+            # Skip if we accidentally generated a sampled real URL
+            if fake_url in sampled:
                 continue
                 
             # Test if this URL is falsely recognized as seen
@@ -119,7 +147,7 @@ class AdaptiveBloomFilter:
         if not self.inserted_items:
             return 0
         false_negatives = 0
-        sample_items = random.sample(list(self.inserted_items), min(num_samples, len(self.inserted_items)))
+        sample_items = random.sample(self.inserted_items, min(num_samples, len(self.inserted_items)))
         for item in sample_items:
             if item not in self.bloom_filter:
                 false_negatives += 1
@@ -130,75 +158,71 @@ class AdaptiveBloomFilter:
     def adapt(self):
         fpr = self.sample_fpr()
         fnr = self.sample_fnr()
-        if fpr > self.adaptation_threshold:
-            return self.increase_capacity()
-        elif fnr > self.adaptation_threshold:
-            return self.increase_capacity()  # FNR should almost never happen; resize up
-        return False  # No adaptation needed
+        if fpr <= self.adaptation_threshold and fnr <= self.adaptation_threshold:
+            return False  # No adaptation needed
+        # A new slice can't lower the FPR of what is already stored; stop once it didn't help
+        if self.fpr_before_growth is not None and fpr >= self.fpr_before_growth:
+            return False
+        grew = self.increase_capacity()
+        if grew:
+            self.fpr_before_growth = fpr
+        return grew
 
     def increase_capacity(self):
+        """Start a new, larger slice with a tighter error rate.
+
+        Items already inserted stay in their slices, so nothing is forgotten.
+        Does nothing until the newest slice is grow_fill full: an emptier
+        slice still has room, and adding another only costs memory.
+        """
+        filters = self.bloom_filter.filters
+        if filters and filters[-1].count < filters[-1].capacity * self.grow_fill:
+            return False
         try:
-            # Use a very conservative growth strategy
-            max_capacity = 10000  # 10K items max for safety
-            
-            # Increase by just 25% instead of doubling
-            new_capacity = min(int(self.bloom_filter.capacity * 1.25) + 5, max_capacity)
-            
-            # If we're already near max capacity, adjust the error rate instead
-            if self.bloom_filter.capacity >= max_capacity * 0.5:
-                # Increase error rate slightly (accept more false positives)
-                new_error_rate = min(self.bloom_filter.error_rate * 1.2, 0.4)
-                print(f"Near capacity limit, adjusting error rate to {new_error_rate}")
-                new_filter = BloomFilter(capacity=self.bloom_filter.capacity, error_rate=new_error_rate)
-            else:
-                # Create new filter with increased capacity
-                print(f"Increasing capacity from {self.bloom_filter.capacity} to {new_capacity}")
-                new_filter = BloomFilter(capacity=new_capacity, error_rate=self.bloom_filter.error_rate)
-            
-            # Copy existing items safely - but limit to 1000 max to avoid capacity issues
-            item_count = 0
-            items_to_copy = list(self.inserted_items)[:1000]  # Limit to 1000 items
-            for item in items_to_copy:
-                try:
-                    new_filter.add(item)
-                    item_count += 1
-                except Exception as e:
-                    print(f"Warning: Failed to add item {item_count} to new filter: {e}")
-                    break  # Stop if we hit an error
-            
-            print(f"Successfully copied {item_count} items to new filter")
-            self.bloom_filter = new_filter
+            old_capacity = self.bloom_filter.capacity
+            self.bloom_filter.add_slice()
+            print(f"Increasing capacity from {old_capacity} to {self.bloom_filter.capacity}")
             return True
         except Exception as e:
             print(f"Warning: Failed to increase Bloom filter capacity: {e}")
-            # If we can't increase capacity, try increasing error rate as fallback
-            try:
-                current_error_rate = self.bloom_filter.error_rate
-                new_error_rate = min(current_error_rate * 1.5, 0.5)
-                print(f"Trying fallback: adjusting error rate from {current_error_rate} to {new_error_rate}")
-                # Keep the same capacity but increase error rate
-                new_filter = BloomFilter(
-                    capacity=self.bloom_filter.capacity,
-                    error_rate=new_error_rate
-                )
-                # Copy a limited number of items
-                items_to_copy = list(self.inserted_items)[:500]  # Very conservative
-                for item in items_to_copy:
-                    try:
-                        new_filter.add(item)
-                    except:
-                        break
-                self.bloom_filter = new_filter
-                return True
-            except Exception as e2:
-                print(f"Fallback also failed: {e2}")
-                # Last resort - create a new empty filter with higher error rate
-                try:
-                    print("Creating new empty filter as last resort")
-                    self.bloom_filter = BloomFilter(capacity=100, error_rate=0.3)
-                    return True
-                except:
-                    return False
+            return False
+
+    def save(self, path):
+        """Snapshot the filter and its FPR sample to a memory-mappable file."""
+        save_snapshot(self.bloom_filter, path, extra={
+            'adaptation_threshold': self.adaptation_threshold,
+            'reservoir_size': self.reservoir_size,
+            'grow_fill': self.grow_fill,
+            'inserted_items': self.inserted_items
+        })
+
+    def copy(self):
+        """A copy that can be saved from another thread while this filter is in use."""
+        other = AdaptiveBloomFilter(
+            initial_capacity=self.bloom_filter.initial_capacity,
+            error_rate=self.bloom_filter.error_rate,
+            adaptation_threshold=self.adaptation_threshold,
+            reservoir_size=self.reservoir_size,
+            grow_fill=self.grow_fill
+        )
+        other.bloom_filter = self.bloom_filter.copy()
+        other.inserted_items = list(self.inserted_items)
+        return other
+
+    @classmethod
+    def load(cls, path, mode='c', verify=False):
+        """Restore a filter saved with save() by mapping the file, not rebuilding it."""
+        bloom, extra = load_snapshot(path, mode=mode, verify=verify)
+        adaptive = cls(
+            initial_capacity=bloom.initial_capacity,
+            error_rate=bloom.error_rate,
+            adaptation_threshold=extra.get('adaptation_threshold', 0.05),
+            reservoir_size=extra.get('reservoir_size', 1000),
+            grow_fill=extra.get('grow_fill', 0.9)
+        )
+        adaptive.bloom_filter = bloom
+        adaptive.inserted_items = extra.get('inserted_items', [])
+        return adaptive
 
     def get_stats(self):
         return {
@@ -211,6 +235,8 @@ class AdaptiveBloomFilter:
             'last_fnr': self.last_fnr,
             'capacity': self.bloom_filter.capacity,
             'error_rate': self.bloom_filter.error_rate,
-            'inserted_count': len(self.inserted_items)
+            'inserted_count': self.bloom_filter.count,
+            'slices': len(self.bloom_filter.filters),
+            'num_bits': self.bloom_filter.num_bits
         }
 
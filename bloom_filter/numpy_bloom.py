@@ -0,0 +1,72 @@
+import hashlib
+import math
+import numpy as np
+
+class NumpyBloomFilter:
+    """Fixed-size Bloom filter on a NumPy array of uint64 words.
+
+    Each item is hashed once to a 128-bit digest split into (h1, h2); the k
+    bit offsets h1 + i*h2 are then computed for a whole batch at once, so
+    checking a page's outlinks is a handful of array operations instead of
+    one interpreter round trip per link.
+    """
+    def __init__(self, capacity, error_rate=0.001, bits=None):
+        self.capacity = int(capacity)
+        self.error_rate = error_rate
+        num_bits = int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_words = max(1, (num_bits + 63) // 64)
+        self.num_bits = self.num_words * 64
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        # bits may be an existing array such as a np.memmap of a snapshot
+        self.bits = np.zeros(self.num_words, dtype=np.uint64) if bits is None else bits
+        self.count = 0
+
+    @staticmethod
+    def hash_items(items):
+        """Return (h1, h2) uint64 arrays for a batch of strings."""
+        digests = b''.join(hashlib.md5(item.encode('utf-8')).digest() for item in items)
+        hashes = np.frombuffer(digests, dtype=np.uint64).reshape(-1, 2)
+        # An odd h2 keeps the k offsets distinct
+        return hashes[:, 0], hashes[:, 1] | np.uint64(1)
+
+    def offsets(self, h1, h2):
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        # uint64 arithmetic wraps, which is fine for hashing
+        with np.errstate(over='ignore'):
+            offsets = (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+        return offsets >> np.uint64(6), offsets & np.uint64(63)
+
+    def contains_hashes(self, h1, h2):
+        words, bits = self.offsets(h1, h2)
+        return ((self.bits[words] >> bits) & np.uint64(1)).all(axis=1)
+
+    def add_hashes(self, h1, h2):
+        words, bits = self.offsets(h1, h2)
+        np.bitwise_or.at(self.bits, words.ravel(), (np.uint64(1) << bits).ravel())
+        self.count += len(h1)
+
+    def contains_many(self, items):
+        """Return a bool array telling which items are (probably) present."""
+        if not items:
+            return np.zeros(0, dtype=bool)
+        return self.contains_hashes(*self.hash_items(items))
+
+    def add_many(self, items):
+        """Add a batch of items."""
+        if items:
+            self.add_hashes(*self.hash_items(items))
+
+    def add(self, item):
+        self.add_many([item])
+
+    def __contains__(self, item):
+        return bool(self.contains_many([item])[0])
+
+    def __len__(self):
+        return self.count
+
+    def copy(self):
+        """An independent in-memory copy, e.g. to save while this filter keeps taking inserts."""
+        other = NumpyBloomFilter(self.capacity, self.error_rate, bits=np.array(self.bits))
+        other.count = self.count
+        return other
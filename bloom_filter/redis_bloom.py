@@ -0,0 +1,109 @@
+import hashlib
+import math
+
+class RedisBloomFilter:
+    """Bloom filter whose bit array lives in Redis so every crawler node shares it.
+
+    Bit offsets are computed client-side with double hashing and read or
+    written with one BITFIELD command per URL, pipelined per batch. SET
+    returns the previous bit values, so a batch is checked and marked in a
+    single round trip.
+    """
+    def __init__(self, client, key='bloom', capacity=1000000, error_rate=0.001):
+        self.redis = client
+        self.bits_key = f'{key}:bits'
+        self.params_key = f'{key}:params'
+        self.set_params(capacity, error_rate)
+        self.stats = {
+            'total_checks': 0,
+            'inserted': 0
+        }
+
+    def set_params(self, capacity, error_rate):
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+        self.num_bits = int(math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        if self.num_bits > 2 ** 32:
+            raise ValueError(f"{self.num_bits} bits exceeds the 512MB Redis string limit")
+
+    async def connect(self):
+        """Adopt the parameters already stored in Redis, or publish ours."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hsetnx(self.params_key, 'capacity', self.capacity)
+        pipe.hsetnx(self.params_key, 'error_rate', self.error_rate)
+        pipe.hgetall(self.params_key)
+        params = (await pipe.execute())[-1]
+        params = {k.decode() if isinstance(k, bytes) else k: v for k, v in params.items()}
+        self.set_params(params['capacity'], params['error_rate'])
+
+    def offsets(self, item):
+        digest = hashlib.md5(item.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def bitfield_args(self, item, op):
+        args = ['BITFIELD', self.bits_key]
+        for offset in self.offsets(item):
+            if op == 'SET':
+                args.extend(('SET', 'u1', offset, 1))
+            else:
+                args.extend(('GET', 'u1', offset))
+        return args
+
+    async def contains_many(self, items):
+        """Return a list telling which items are (probably) in the filter."""
+        if not items:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for item in items:
+            pipe.execute_command(*self.bitfield_args(item, 'GET'))
+        results = await pipe.execute()
+        self.stats['total_checks'] += len(items)
+        return [all(bits) for bits in results]
+
+    async def check_and_add_many(self, items):
+        """Add items and return which of them were already present, in one round trip."""
+        if not items:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for item in items:
+            pipe.execute_command(*self.bitfield_args(item, 'SET'))
+        results = await pipe.execute()
+        seen = [all(old_bits) for old_bits in results]
+        self.stats['total_checks'] += len(items)
+        self.stats['inserted'] += seen.count(False)
+        return seen
+
+    async def add_many(self, items):
+        await self.check_and_add_many(items)
+
+    async def contains(self, item):
+        return (await self.contains_many([item]))[0]
+
+    async def add(self, item):
+        await self.check_and_add_many([item])
+
+    async def count(self):
+        """Estimate how many distinct items all nodes have added, from the set bits."""
+        set_bits = await self.redis.bitcount(self.bits_key)
+        if set_bits >= self.num_bits:
+            return self.capacity
+        return int(-self.num_bits / self.num_hashes * math.log(1 - set_bits / self.num_bits))
+
+    def get_stats(self):
+        return {
+            'total_checks': self.stats['total_checks'],
+            'false_positives': 0,
+            'false_negatives': 0,
+            'fpr_samples': 0,
+            'fnr_samples': 0,
+            'last_fpr': 0,
+            'last_fnr': 0,
+            'capacity': self.capacity,
+            'error_rate': self.error_rate,
+            'inserted_count': self.stats['inserted'],
+            'num_bits': self.num_bits,
+            'num_hashes': self.num_hashes
+        }
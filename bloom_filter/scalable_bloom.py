@@ -0,0 +1,87 @@
+import numpy as np
+from bloom_filter.numpy_bloom import NumpyBloomFilter
+
+class ScalableBloomFilter:
+    """Bloom filter that grows by chaining fixed-size slices.
+
+    When the newest slice is full a new one is added with `growth` times the
+    capacity and `tightening` times the error rate, so the compound false
+    positive rate stays under error_rate no matter how many items arrive.
+    Growing never touches the items already inserted.
+    """
+    def __init__(self, initial_capacity=1000, error_rate=0.001, growth=2, tightening=0.9):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = []
+
+    def slice_params(self, index):
+        capacity = int(self.initial_capacity * self.growth ** index)
+        # Error rates form a geometric series that sums to error_rate
+        error_rate = self.error_rate * (1 - self.tightening) * self.tightening ** index
+        return capacity, error_rate
+
+    def add_slice(self):
+        """Start a new, larger and tighter slice for future inserts."""
+        capacity, error_rate = self.slice_params(len(self.filters))
+        self.filters.append(NumpyBloomFilter(capacity=capacity, error_rate=error_rate))
+
+    def contains_hashes(self, h1, h2):
+        found = np.zeros(len(h1), dtype=bool)
+        for f in self.filters:
+            found |= f.contains_hashes(h1, h2)
+        return found
+
+    def contains_many(self, items):
+        """Return a bool array telling which items are (probably) present."""
+        if not items:
+            return np.zeros(0, dtype=bool)
+        return self.contains_hashes(*NumpyBloomFilter.hash_items(items))
+
+    def add_many(self, items):
+        """Add a batch of items and return a bool array of which were already present."""
+        if not items:
+            return np.zeros(0, dtype=bool)
+        h1, h2 = NumpyBloomFilter.hash_items(items)
+        present = self.contains_hashes(h1, h2)
+        # Only insert the first copy of each new item; later copies count as present
+        new = np.flatnonzero(~present)
+        _, first = np.unique(np.stack([h1[new], h2[new]], axis=1), axis=0, return_index=True)
+        first = np.sort(first)
+        present[np.delete(new, first)] = True
+        new = new[first]
+        while len(new):
+            if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+                self.add_slice()
+            last = self.filters[-1]
+            batch, new = new[:last.capacity - last.count], new[last.capacity - last.count:]
+            last.add_hashes(h1[batch], h2[batch])
+        return present
+
+    def __contains__(self, item):
+        return bool(self.contains_many([item])[0])
+
+    def add(self, item):
+        """Add item and return True if it was (probably) already present."""
+        return bool(self.add_many([item])[0])
+
+    @property
+    def capacity(self):
+        return sum(f.capacity for f in self.filters)
+
+    @property
+    def count(self):
+        return sum(f.count for f in self.filters)
+
+    @property
+    def num_bits(self):
+        return sum(f.num_bits for f in self.filters)
+
+    def __len__(self):
+        return self.count
+
+    def copy(self):
+        other = ScalableBloomFilter(self.initial_capacity, self.error_rate, self.growth, self.tightening)
+        other.filters = [f.copy() for f in self.filters]
+        return other
@@ -0,0 +1,99 @@
+import json
+import os
+import struct
+import zlib
+import numpy as np
+from bloom_filter.numpy_bloom import NumpyBloomFilter
+from bloom_filter.scalable_bloom import ScalableBloomFilter
+
+# File layout: a fixed preamble, a JSON header, then each slice's uint64
+# words. The data section and every slice start on a page boundary so the
+# arrays can be memory-mapped directly; slice offsets in the header are
+# relative to the start of the data section.
+MAGIC = b'ABF1'
+PREAMBLE = struct.Struct('<4sII')  # magic, header length, header crc32
+PAGE_SIZE = 4096
+
+def page_align(size):
+    return -(-size // PAGE_SIZE) * PAGE_SIZE
+
+class SnapshotError(Exception):
+    pass
+
+def save_snapshot(bloom, path, extra=None):
+    """Write a ScalableBloomFilter to path atomically."""
+    slices = []
+    offset = 0
+    for f in bloom.filters:
+        slices.append({
+            'capacity': f.capacity,
+            'error_rate': f.error_rate,
+            'num_words': f.num_words,
+            'num_hashes': f.num_hashes,
+            'count': f.count,
+            'offset': offset,
+            'crc32': zlib.crc32(f.bits)
+        })
+        offset += page_align(f.bits.nbytes)
+    header = json.dumps({
+        'initial_capacity': bloom.initial_capacity,
+        'error_rate': bloom.error_rate,
+        'growth': bloom.growth,
+        'tightening': bloom.tightening,
+        'slices': slices,
+        'extra': extra or {}
+    }).encode('utf-8')
+    data_start = page_align(PREAMBLE.size + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as out:
+        out.write(PREAMBLE.pack(MAGIC, len(header), zlib.crc32(header)))
+        out.write(header)
+        for f, meta in zip(bloom.filters, slices):
+            out.seek(data_start + meta['offset'])
+            out.write(memoryview(f.bits))
+        out.truncate(data_start + offset)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+
+def read_header(path):
+    with open(path, 'rb') as src:
+        magic, length, crc = PREAMBLE.unpack(src.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a Bloom filter snapshot")
+        header = src.read(length)
+    if zlib.crc32(header) != crc:
+        raise SnapshotError(f"{path} has a corrupt header")
+    header = json.loads(header)
+    header['data_start'] = page_align(PREAMBLE.size + length)
+    return header
+
+def load_snapshot(path, mode='c', verify=False):
+    """Map a snapshot back into a ScalableBloomFilter without copying it.
+
+    mode is passed to np.memmap: 'c' (the default) keeps inserts private
+    to this process, 'r' maps it read-only so many processes share one copy
+    through the page cache, and 'r+' writes inserts through to the file,
+    leaving the header's counts and checksums stale until the next
+    save_snapshot. Checking the bit-array checksums reads the whole file,
+    so it is only done when verify is set.
+    Returns (filter, extra).
+    """
+    header = read_header(path)
+    bloom = ScalableBloomFilter(
+        initial_capacity=header['initial_capacity'],
+        error_rate=header['error_rate'],
+        growth=header['growth'],
+        tightening=header['tightening']
+    )
+    for meta in header['slices']:
+        bits = np.memmap(path, dtype=np.uint64, mode=mode,
+                         offset=header['data_start'] + meta['offset'], shape=(meta['num_words'],))
+        if verify and zlib.crc32(bits) != meta['crc32']:
+            raise SnapshotError(f"{path} has a corrupt slice at offset {meta['offset']}")
+        f = NumpyBloomFilter(meta['capacity'], meta['error_rate'], bits=bits)
+        f.num_hashes = meta['num_hashes']
+        f.count = meta['count']
+        bloom.filters.append(f)
+    return bloom, header['extra']
@@ -1,3 +1,8 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
 START_URLS = [
     'https://wikipedia.org',
     'https://python.org',
@@ -12,16 +17,130 @@ ALLOWED_DOMAINS = [
 
 CONFIG = {
     'num_workers': 3,  # Number of concurrent crawler workers
+    'max_in_flight': 3,  # Global cap on simultaneous fetches across all workers
+    'max_urls': 50,    # Stop once this many pages have been crawled
+    # 'budget_key': None,  # Redis counter that makes max_urls a budget shared by several processes
     'max_depth': 2,    # Maximum depth to crawl
     'crawl_delay': 2,  # Delay between requests (in seconds) to be polite
+    'max_per_host': 2,  # Maximum simultaneous fetches to a single host
+    'max_pending': 1000,  # URLs held in the per-host scheduler before the feeder pauses
+    'pop_batch': 50,   # URLs taken from the shared queue per round trip
+    'pop_timeout': 1,  # Seconds a blocking pop waits on an empty queue
     'timeout': 30,     # Request timeout (in seconds)
+    'drain_timeout': 30,  # Seconds in-flight URLs get to finish after SIGINT/SIGTERM
+    'launcher': {
+        'processes': None,  # Crawler processes per node; None for one per CPU core
+        'uvloop': True      # Run each process on uvloop when it is installed
+    },
+    'fetch': {
+        'max_bytes': 5242880,   # Bodies are cut off after this many bytes
+        'truncate': True,       # Keep the first max_bytes of oversized pages; False drops them
+        'chunk_size': 65536,    # Bytes read per chunk while streaming a body
+        'content_types': ['text/html', 'application/xhtml+xml'],  # Anything else is rejected on headers
+        # 'time_budget': 30,    # Seconds for a whole fetch; defaults to 'timeout'
+        'connect_timeout': 10,  # Seconds to open a connection
+        'sock_read_timeout': 15,  # Seconds to wait for the next bytes of a response
+        'limit': 100,           # Open connections across all hosts
+        # 'limit_per_host': 2,  # Open connections per host; defaults to 'max_per_host'
+        'keepalive_timeout': 30,  # Seconds an idle connection is kept for reuse
+        'dns_ttl': 300,         # Seconds a resolved host stays cached
+        'prefetch_dns': True    # Resolve hosts as soon as their URLs are scheduled
+        # 'user_agent': 'DistributedCrawler',  # User-Agent header; defaults to robots.user_agent
+    },
     'bloom_filter': {
         'initial_capacity': 1000000,
-        'error_rate': 0.001
+        'error_rate': 0.001,
+        'snapshot_path': 'bloom_filter.snapshot'  # Memory-mapped on restart; None to disable
+    },
+    'canonical': {
+        'sort_query': True,            # Order query parameters so ?a=1&b=2 == ?b=2&a=1
+        'strip_trailing_slash': True,  # Treat /a/ and /a as the same page
+        'force_https': False,          # Rewrite http:// links to https://
+        'cache_size': 100000           # LRU entries of memoized canonical URLs
+        # 'drop_params': [...]         # Override canonical.DEFAULT_DROP_PARAMS
+    },
+    'parse_pool': {
+        'workers': 4,       # Parser processes; 0 parses inline on the event loop
+        'max_queue': 8,     # Pages waiting for a parser before fetch workers block
+        'shm_threshold': 262144  # Bodies this size or larger go through shared memory
+    },
+    'content_dedup': {
+        'enabled': True,
+        'backend': 'local',  # 'local' or 'redis' to share fingerprints across nodes
+        'key': 'content',    # Key prefix in Redis
+        'max_distance': 3,   # SimHash bits that may differ for a near-duplicate
+        'min_tokens': 20,    # Shorter pages are only checked for exact duplicates
+        'min_text_tokens': 5  # Pages with fewer words (empty, script-only) are never called duplicates
+    },
+    'dedup': {
+        'backend': 'local',  # 'local' per-process filter, or 'redis' to share one across nodes
+        'key': 'bloom'       # Key prefix of the shared filter in Redis
+    },
+    'storage': {
+        'compression': {
+            'codec': 'zstd',         # 'zstd', 'zlib' (used if zstandard is missing) or 'none'
+            'level': 3,
+            'dictionaries': True,    # Train a zstd dictionary per domain
+            'train_samples': 50,     # Pages of a domain sampled before training its dictionary
+            'dict_size': 65536       # Bytes per trained dictionary
+        }
+    },
+    'frontier': {
+        'key': 'frontier',          # Redis sorted set of URLs waiting to be crawled
+        'shards': 16,               # Split by host into this many sets, each worked by one node; 1 disables
+        'lease_ttl': 15,            # Seconds a node keeps its shards without a heartbeat
+        'heartbeat_interval': 5,    # Seconds between heartbeats / rebalances
+        'reliable': True,           # Claimed URLs stay in a processing set until acked; dead nodes' work is requeued
+        'method': 'opic',           # 'opic' (pages share their score among links) or 'inlinks'
+        'seed_score': 1.0,          # Score given to each start URL
+        'max_links_per_page': 50,   # Highest-scored new links kept per page
+        'domain_priorities': {}     # e.g. {'python.org': 2.0}; most specific suffix wins
+    },
+    'robots': {
+        'enabled': True,
+        'user_agent': 'DistributedCrawler',  # Its product token is matched against robots.txt User-agent lines
+        'ttl': 86400,          # Seconds parsed rules are cached
+        'error_ttl': 600,      # Seconds a host's URLs wait before its unreachable robots.txt is tried again
+        'cache_size': 10000,   # Hosts kept in the local LRU
+        'max_crawl_delay': 60,  # Cap on honoured Crawl-delay values
+        'backend': 'local',    # 'redis' to share parsed rules across nodes
+        'key': 'robots'        # Key prefix in Redis
+    },
+    'recrawl': {
+        'enabled': False,          # Revisit stored pages with conditional GETs
+        'initial_interval': 86400,  # Seconds before a new page's first revisit
+        'min_interval': 3600,      # Pages that keep changing are revisited no more often than this
+        'max_interval': 2592000,   # ...and static ones at least this often
+        'backoff': 2.0,            # Interval multiplier when a revisit finds no change
+        'speedup': 0.5,            # Interval multiplier when it finds a change
+        'batch_size': 50,          # Due URLs claimed per round trip
+        'poll_interval': 5,        # Seconds between checks when nothing is due
+        'claim_ttl': 600           # Seconds a node may hold a claimed revisit before others retry it
+    },
+    'metrics': {
+        'enabled': True,
+        'sample_every': 10,     # Time one in N Bloom filter checks
+        'flush_interval': 10,   # Seconds between snapshots saved to Redis under stats:<checkpoint name>
+        'http_host': '127.0.0.1',
+        'http_port': 9108,      # Prometheus /metrics endpoint (one port per process from here); None to disable
+        'max_hosts': 50         # Busiest hosts exported with their in-flight count
+    },
+    'checkpoint': {
+        'enabled': True,
+        'name': 'crawler',  # Key suffix; give each crawler process its own
+        'interval': 30      # Seconds between saves of counters and the Bloom filter snapshot
+    },
+    'batch_writes': {
+        'batch_size': 100,       # Flush once this many writes are buffered
+        'flush_interval': 0.05,  # ...or after this many seconds
+        'max_buffer': 5000,      # Callers wait for a flush beyond this
+        'retry_backoff': 0.1,    # First wait before resending a batch Redis didn't get; doubles per failure
+        'max_backoff': 5.0,      # ...up to this many seconds
+        'close_retries': 5       # Resends on shutdown before the rest of the buffer is given up
     },
     'redis': {
-        'host': 'localhost',
-        'port': 6379
+        'host': os.getenv('REDIS_HOST', 'localhost'),  # Frontier, storage, dedup and robots all use this server
+        'port': int(os.getenv('REDIS_PORT', 6379))
     },
     'memcached': {
         'host': 'localhost',
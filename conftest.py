@@ -0,0 +1 @@
+# Puts the repository root on sys.path so a bare `pytest` can import the packages
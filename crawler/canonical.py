@@ -0,0 +1,113 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode, quote
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+DEFAULT_DROP_PARAMS = [
+    'utm_*', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid',
+    'sessionid', 'session_id', 'sid', 'phpsessid', 'jsessionid', 'aspsessionid*'
+]
+
+PERCENT_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+PATH_SESSION = re.compile(r';(jsessionid|phpsessid|sid)=[^/?#]*', re.IGNORECASE)
+
+def remove_dot_segments(path: str) -> str:
+    """Resolve '.' and '..' segments as described in RFC 3986 section 5.2.4."""
+    if '.' not in path:
+        return path
+    output = []
+    segments = path.split('/')
+    for segment in segments[1:] if path.startswith('/') else segments:
+        if segment == '..':
+            if output:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    if segments[-1] in ('.', '..'):
+        output.append('')
+    return '/' + '/'.join(output)
+
+class UrlCanonicalizer:
+    """Turns hrefs into one canonical absolute URL per resource.
+
+    Resolves against the page (or its <base>), lowercases scheme and host,
+    drops default ports, userinfo and fragments, resolves dot-segments,
+    normalizes percent-escapes and filters/sorts query parameters. Results
+    are memoized in an LRU cache since the same links recur on every page
+    of a site.
+    """
+    def __init__(self, drop_params: Optional[Iterable[str]] = None, sort_query: bool = True,
+                 strip_trailing_slash: bool = True, force_https: bool = False,
+                 cache_size: int = 100000):
+        params = DEFAULT_DROP_PARAMS if drop_params is None else drop_params
+        self.drop_exact = {p.lower() for p in params if not p.endswith('*')}
+        self.drop_prefixes = tuple(p[:-1].lower() for p in params if p.endswith('*'))
+        self.sort_query = sort_query
+        self.strip_trailing_slash = strip_trailing_slash
+        self.force_https = force_https
+        self.canonicalize_absolute = lru_cache(maxsize=cache_size)(self.canonicalize_uncached)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'UrlCanonicalizer':
+        return cls(**config.get('canonical', {}))
+
+    def keep_param(self, name: str) -> bool:
+        name = name.lower()
+        return name not in self.drop_exact and not name.startswith(self.drop_prefixes)
+
+    def canonicalize(self, href: str, base: Optional[str] = None) -> Optional[str]:
+        """Return the canonical form of href (resolved against base), or None if it isn't crawlable."""
+        href = href.strip()
+        if base:
+            try:
+                href = urljoin(base, href)
+            except ValueError:
+                return None
+        return self.canonicalize_absolute(href)
+
+    def canonicalize_uncached(self, url: str) -> Optional[str]:
+        try:
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in DEFAULT_PORTS:
+                return None
+            host = (parts.hostname or '').rstrip('.')
+            if not host:
+                return None
+            if not host.isascii():
+                host = host.encode('idna').decode('ascii')
+            port = parts.port
+        except (ValueError, UnicodeError):
+            return None
+
+        if self.force_https and scheme == 'http':
+            scheme = 'https'
+            if port == 80:
+                port = None
+        netloc = f'[{host}]' if ':' in host else host
+        if port and port != DEFAULT_PORTS[scheme]:
+            netloc = f'{netloc}:{port}'
+
+        path = PATH_SESSION.sub('', parts.path)
+        path = remove_dot_segments(path) or '/'
+        path = PERCENT_ESCAPE.sub(lambda m: m.group(0).upper(), quote(path, safe="/%:@!$&'()*+,;=~"))
+        if self.strip_trailing_slash and len(path) > 1 and path.endswith('/'):
+            path = path.rstrip('/') or '/'
+
+        query = ''
+        if parts.query:
+            params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                      if self.keep_param(k)]
+            if self.sort_query:
+                params.sort()
+            query = urlencode(params, safe="/:@!$'()*+,;~", quote_via=quote)
+
+        return urlunsplit((scheme, netloc, path, query, ''))
+
+    def cache_info(self):
+        return self.canonicalize_absolute.cache_info()
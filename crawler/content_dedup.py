@@ -0,0 +1,174 @@
+import hashlib
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r'\w+')
+
+def normalize_text(text: str) -> List[str]:
+    return WORD.findall(text.lower())
+
+def exact_hash(words: List[str]) -> str:
+    """Hash of the normalized text, so whitespace and case changes don't matter."""
+    return hashlib.sha1(' '.join(words).encode('utf-8')).hexdigest()
+
+def simhash(words: List[str], shingle_size: int = 3) -> int:
+    """64-bit SimHash over word shingles."""
+    if len(words) < shingle_size:
+        shingles = [' '.join(words)]
+    else:
+        shingles = [' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    digests = b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    # A fingerprint bit is set when most shingles have it set
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), 'big')
+
+class ContentFingerprint:
+    __slots__ = ('exact', 'simhash', 'tokens')
+
+    def __init__(self, exact: str, simhash: Optional[int], tokens: int):
+        self.exact = exact
+        self.simhash = simhash
+        self.tokens = tokens
+
+class ContentIndex:
+    """Local exact-hash table plus banded LSH index over 64-bit SimHashes.
+
+    The fingerprint is split into max_distance + 1 bands; two fingerprints
+    within max_distance bits must agree exactly on at least one band, so a
+    lookup only compares against pages sharing a band. Pages with fewer
+    than min_text_tokens words (empty bodies, script-only shells) are not
+    checked at all; they would otherwise all match the first such page.
+    """
+    def __init__(self, max_distance: int = 3, min_tokens: int = 20, shingle_size: int = 3,
+                 min_text_tokens: int = 5):
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.min_text_tokens = min_text_tokens
+        self.shingle_size = shingle_size
+        num_bands = max_distance + 1
+        widths = [64 // num_bands + (1 if i < 64 % num_bands else 0) for i in range(num_bands)]
+        self.bands: List[Tuple[int, int]] = []  # (shift, mask)
+        shift = 64
+        for width in widths:
+            shift -= width
+            self.bands.append((shift, (1 << width) - 1))
+        self.exact: Dict[str, str] = {}
+        self.buckets: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in self.bands]
+        self.stats = {
+            'checked': 0,
+            'too_short': 0,
+            'exact_duplicates': 0,
+            'near_duplicates': 0
+        }
+
+    def fingerprint(self, text: str) -> ContentFingerprint:
+        words = normalize_text(text)
+        fp = simhash(words, self.shingle_size) if len(words) >= self.min_tokens else None
+        return ContentFingerprint(exact_hash(words), fp, len(words))
+
+    def band_keys(self, fp: int) -> List[int]:
+        return [(fp >> shift) & mask for shift, mask in self.bands]
+
+    def find_near(self, fp: int) -> Optional[str]:
+        for band, key in enumerate(self.band_keys(fp)):
+            for other, url in self.buckets[band].get(key, ()):
+                if bin(fp ^ other).count('1') <= self.max_distance:
+                    return url
+        return None
+
+    def add(self, url: str, fingerprint: ContentFingerprint):
+        self.exact.setdefault(fingerprint.exact, url)
+        if fingerprint.simhash is not None:
+            for band, key in enumerate(self.band_keys(fingerprint.simhash)):
+                self.buckets[band].setdefault(key, []).append((fingerprint.simhash, url))
+
+    async def check_and_add(self, url: str, text: str) -> Optional[str]:
+        """Return the URL of an earlier page with the same or near-same content, else index this one."""
+        fingerprint = self.fingerprint(text)
+        if fingerprint.tokens < self.min_text_tokens:
+            self.stats['too_short'] += 1
+            return None
+        self.stats['checked'] += 1
+        original = self.exact.get(fingerprint.exact)
+        if original:
+            self.stats['exact_duplicates'] += 1
+            return original
+        if fingerprint.simhash is not None:
+            original = self.find_near(fingerprint.simhash)
+            if original:
+                self.stats['near_duplicates'] += 1
+                return original
+        self.add(url, fingerprint)
+        return None
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, indexed=len(self.exact))
+
+class RedisContentIndex(ContentIndex):
+    """ContentIndex kept in Redis so every node sees every fingerprint.
+
+    Each LSH band is a Redis set of 'fingerprint url' members; a lookup is
+    one pipelined round trip. Only a page that turns out to be new claims
+    its exact hash (SET NX), in the same round trip that adds it to the bands.
+    """
+    def __init__(self, client, key: str = 'content', **kwargs):
+        super().__init__(**kwargs)
+        self.redis = client
+        self.key = key
+
+    def band_key(self, band: int, value: int) -> str:
+        return f'{self.key}:band:{band}:{value:x}'
+
+    async def check_and_add(self, url: str, text: str) -> Optional[str]:
+        fingerprint = self.fingerprint(text)
+        if fingerprint.tokens < self.min_text_tokens:
+            self.stats['too_short'] += 1
+            return None
+        self.stats['checked'] += 1
+        pipe = self.redis.pipeline(transaction=False)
+        exact_key = f'{self.key}:exact:{fingerprint.exact}'
+        pipe.get(exact_key)
+        band_keys = []
+        if fingerprint.simhash is not None:
+            band_keys = [self.band_key(band, value)
+                         for band, value in enumerate(self.band_keys(fingerprint.simhash))]
+            for key in band_keys:
+                pipe.smembers(key)
+        results = await pipe.execute()
+        if results[0] is not None:
+            self.stats['exact_duplicates'] += 1
+            return self.decode(results[0])
+        if fingerprint.simhash is not None:
+            for members in results[1:]:
+                for member in members:
+                    other, _, other_url = self.decode(member).partition(' ')
+                    if bin(fingerprint.simhash ^ int(other, 16)).count('1') <= self.max_distance:
+                        self.stats['near_duplicates'] += 1
+                        return other_url
+        # New content: claim the exact hash; GET reports the winner if another node just did
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(exact_key, url, nx=True)
+        pipe.get(exact_key)
+        results = await pipe.execute()
+        if not results[0]:
+            self.stats['exact_duplicates'] += 1
+            return self.decode(results[1])
+        if band_keys:
+            member = f'{fingerprint.simhash:x} {url}'
+            pipe = self.redis.pipeline(transaction=False)
+            for key in band_keys:
+                pipe.sadd(key, member)
+            await pipe.execute()
+        return None
+
+    @staticmethod
+    def decode(value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
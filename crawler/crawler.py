@@ -1,144 +1,682 @@
 import asyncio
-import aiohttp
-from bs4 import BeautifulSoup
 from bloom_filter.adaptive_bloom import AdaptiveBloomFilter
-from storage.redis_storage import RedisStorage
-import redis
+from bloom_filter.redis_bloom import RedisBloomFilter
+from storage.redis_storage import AsyncRedisStorage, get_async_pool, close_async_pools
+from storage.batch_writer import BatchWriter
+from crawler.scheduler import CrawlScheduler
+from crawler.parse_pool import ParsePool
+from crawler.fetcher import PageFetcher
+from crawler.recrawl import RecrawlPolicy
+from crawler.robots import RobotsCache
+from crawler.metrics import Metrics
+from crawler.frontier import AsyncRedisFrontier, ShardedRedisFrontier, LinkScorer
+from crawler.canonical import UrlCanonicalizer
+from crawler.content_dedup import ContentIndex, RedisContentIndex
+import redis.asyncio as aioredis
 import logging
-import random
+import os
 from urllib.parse import urljoin, urlparse
 import time
-from collections import deque
+from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class Queue:
-    """Base Queue interface"""
-    def push(self, item):
-        pass
-    
-    def pop(self):
-        pass
-
-class RedisQueue(Queue):
-    """Redis-backed distributed queue"""
-    def __init__(self, name, host='localhost', port=6379):
-        try:
-            self.db = redis.StrictRedis(host=host, port=port, db=0, socket_timeout=2)
-            # Test connection
-            self.db.ping()
-            self.key = name
-            self.is_connected = True
-            print("Successfully connected to Redis. Using distributed queue.")
-        except Exception as e:
-            print(f"Redis connection failed: {e}. Falling back to local queue.")
-            self.is_connected = False
-            self.local_queue = LocalQueue(name)
-
-    def push(self, item):
-        if self.is_connected:
-            self.db.lpush(self.key, item)
-        else:
-            self.local_queue.push(item)
-
-    def pop(self):
-        if self.is_connected:
-            return self.db.rpop(self.key)
-        else:
-            return self.local_queue.pop()
-
-class LocalQueue(Queue):
-    """In-memory queue for local operation"""
-    def __init__(self, name):
-        self.queue = deque()
-        self.name = name
-        print(f"Using local in-memory queue: {name}")
-
-    def push(self, item):
-        self.queue.append(item)
-
-    def pop(self):
-        try:
-            return self.queue.popleft()
-        except IndexError:
-            return None
-
 class WebCrawler:
+    # Counters saved in checkpoints so a restarted crawl keeps its budget and stats
+    checkpoint_fields = ('crawled', 'duplicates', 'errors', 'unique', 'empty_pops', 'invalid_urls',
+                         'content_duplicates', 'not_modified', 'robots_blocked', 'rejected', 'deferred',
+                         'attempts')
+
     def __init__(self, config):
         self.config = config
+        self.metrics = Metrics(**config.get('metrics', {}))
         self.allowed_domains = config.get('allowed_domains', [])
-        self.bloom_filter = AdaptiveBloomFilter()
-        self.storage = RedisStorage()
-        self.queue = RedisQueue('url_queue', host=config['redis']['host'], port=config['redis']['port'])
-        self.max_urls = 50
+        self.bloom_filter = self.create_bloom_filter(config)
+        # Same server as the frontier, so one writer can order pages, links and acks
+        self.storage = AsyncRedisStorage(compression=config.get('storage', {}).get('compression'),
+                                         host=config['redis']['host'], port=config['redis']['port'])
+        self.frontier, self.scorer = self.create_frontier(config)
+        self.leased = {}  # canonical URL -> URL as claimed from a reliable frontier, until acked
+        self.snapshot_save = None  # Bloom filter snapshot being written by a thread
+        self.checkpoint_config = config.get('checkpoint', {})
+        self.scheduler = CrawlScheduler(config)
+        self.canonicalizer = UrlCanonicalizer.from_config(config)
+        self.max_pending = config.get('max_pending', 1000)
+        self.pop_batch = config.get('pop_batch', 50)
+        self.pop_timeout = config.get('pop_timeout', 1)
+        self.batch_config = config.get('batch_writes', {})
+        self.page_writer = BatchWriter(self.storage.redis, metrics=self.metrics, name='redis', **self.batch_config)
+        self.queue_writer = None  # the page writer, once the frontier is in Redis
+        self.fetcher = PageFetcher(**{'time_budget': config.get('timeout', 30),
+                                      'limit_per_host': config.get('max_per_host', 2),
+                                      'user_agent': config.get('robots', {}).get('user_agent',
+                                                                                 'DistributedCrawler'),
+                                      'metrics': self.metrics,
+                                      **config.get('fetch', {})})
+        self.recrawl = RecrawlPolicy(**config.get('recrawl', {}))
+        self.revisits = {}  # URL -> stored validators, for revisits waiting in the scheduler
+        self.robots = RobotsCache(**config.get('robots', {}))
+        self.parse_pool = ParsePool(metrics=self.metrics, **config.get('parse_pool', {}))
+        self.content_index = self.create_content_index(config)
+        self.max_urls = config.get('max_urls', 50)
+        # Redis counter of pages crawled by every process sharing max_urls (set by the launcher)
+        self.budget_key = config.get('budget_key')
+        self.budget_used = 0
+        self.num_workers = config.get('num_workers', 3)
+        self.max_in_flight = config.get('max_in_flight', self.num_workers)
+        self.drain_timeout = config.get('drain_timeout', 30)
         self.crawled = 0
         self.duplicates = 0
         self.errors = 0
         self.unique = 0
         self.empty_pops = 0
         self.invalid_urls = 0
+        self.content_duplicates = 0
+        self.not_modified = 0
+        self.robots_blocked = 0
+        self.rejected = 0  # Fetched but turned down: non-200, not HTML or over the size cap
+        self.deferred = 0  # Taken from the frontier but left for a later run (budget spent, shutdown)
+        self.attempts = 0
         self.session = None
+        self.in_flight = None
+        self.done = None
+        self.stopping = False
+        self.busy = 0  # workers between taking a URL and finishing with it
+        self.metrics.add_collector(self.collect_metrics)
+
+    def create_bloom_filter(self, config, backend=None):
+        """Pick the URL dedup backend: 'local' (per process) or 'redis' (shared by all nodes)."""
+        bloom_config = config.get('bloom_filter', {})
+        backend = backend or config.get('dedup', {}).get('backend', 'local')
+        if backend == 'redis':
+            client = aioredis.Redis(connection_pool=get_async_pool(
+                config['redis']['host'], config['redis']['port']))
+            return RedisBloomFilter(
+                client,
+                key=config.get('dedup', {}).get('key', 'bloom'),
+                capacity=bloom_config.get('initial_capacity', 1000000),
+                error_rate=bloom_config.get('error_rate', 0.001)
+            )
+        snapshot_path = bloom_config.get('snapshot_path')
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                bloom_filter = AdaptiveBloomFilter.load(snapshot_path)
+                print(f"Loaded Bloom filter snapshot from {snapshot_path} "
+                      f"({bloom_filter.bloom_filter.count} URLs)")
+                return bloom_filter
+            except Exception as e:
+                print(f"Could not load Bloom filter snapshot {snapshot_path}: {e}. Starting empty.")
+        return AdaptiveBloomFilter(
+            initial_capacity=bloom_config.get('initial_capacity', 50),
+            error_rate=bloom_config.get('error_rate', 0.2)
+        )
+
+    def save_bloom_filter(self):
+        """Snapshot the local Bloom filter so a restart doesn't re-crawl everything."""
+        snapshot_path = self.config.get('bloom_filter', {}).get('snapshot_path')
+        if not snapshot_path or self.shared_dedup:
+            return
+        try:
+            self.bloom_filter.save(snapshot_path)
+            print(f"Saved Bloom filter snapshot to {snapshot_path}")
+        except Exception as e:
+            logger.error(f"Error saving Bloom filter snapshot: {str(e)}")
+
+    def create_frontier(self, config):
+        """Priority frontier, sharded by host across nodes when 'shards' > 1, and its link scorer."""
+        frontier_config = dict(config.get('frontier', {}))
+        name = frontier_config.pop('key', 'frontier')
+        shards = frontier_config.pop('shards', 1)
+        lease_ttl = frontier_config.pop('lease_ttl', 15)
+        heartbeat_interval = frontier_config.pop('heartbeat_interval', 5)
+        reliable = frontier_config.pop('reliable', False)
+        host, port = config['redis']['host'], config['redis']['port']
+        if shards > 1 or reliable:
+            frontier = ShardedRedisFrontier(name, host=host, port=port, shards=shards, lease_ttl=lease_ttl,
+                                            heartbeat_interval=heartbeat_interval, reliable=reliable)
+        else:
+            frontier = AsyncRedisFrontier(name, host=host, port=port)
+        return frontier, LinkScorer(**frontier_config)
+
+    @property
+    def reliable_frontier(self):
+        return getattr(self.frontier, 'reliable', False) and self.frontier.is_connected
+
+    async def ack(self, *raw_urls):
+        """Tell a reliable frontier these URLs are finished.
+
+        Pages, links and acks all go through the page writer, in order, so
+        an ack never reaches Redis ahead of the page or the links it covers.
+        """
+        if raw_urls and self.reliable_frontier:
+            await self.page_writer.submit(lambda pipe: self.frontier.write_ack(pipe, *raw_urls))
+
+    async def restore_checkpoint(self):
+        name = self.checkpoint_config.get('name', 'crawler')
+        state = await self.storage.load_checkpoint(name)
+        if not state:
+            return
+        for field in self.checkpoint_fields:
+            setattr(self, field, state.get(field, 0))
+        print(f"Resuming from checkpoint '{name}' saved at {state.get('timestamp')} "
+              f"({self.crawled} pages crawled)")
+
+    async def checkpoint(self):
+        """Save counters to Redis and snapshot the local Bloom filter."""
+        state = self.get_stats()
+        state['timestamp'] = datetime.now().isoformat()
+        await self.storage.save_checkpoint(self.checkpoint_config.get('name', 'crawler'), state)
+        snapshot_path = self.config.get('bloom_filter', {}).get('snapshot_path')
+        if snapshot_path and not self.shared_dedup:
+            try:
+                await self.save_bloom_snapshot(snapshot_path)
+            except Exception as e:
+                logger.error(f"Error saving Bloom filter snapshot: {str(e)}")
+
+    async def save_bloom_snapshot(self, snapshot_path):
+        """Write the Bloom filter from a thread; only the copy it writes is made on the loop."""
+        if self.snapshot_save is not None:
+            # A save whose checkpoint was cancelled keeps running; don't write the file twice at once
+            await asyncio.wait([self.snapshot_save])
+        bloom_filter = self.bloom_filter.copy()
+        self.snapshot_save = asyncio.get_running_loop().run_in_executor(None, bloom_filter.save, snapshot_path)
+        await asyncio.shield(self.snapshot_save)
+
+    async def checkpoint_loop(self):
+        interval = self.checkpoint_config.get('interval', 30)
+        while not self.done.is_set():
+            await asyncio.sleep(interval)
+            await self.checkpoint()
+
+    def collect_metrics(self):
+        """Copy the crawl's own counters and queue depths into the metrics."""
+        for field in self.checkpoint_fields:
+            self.metrics.set_counter(field, getattr(self, field))
+        fetch_stats = self.fetcher.get_stats()
+        for field in ('fetched', 'bytes', 'rejected_status', 'rejected_type', 'too_large', 'timeouts'):
+            self.metrics.set_counter(f'fetch_{field}', fetch_stats[field])
+        self.metrics.set_gauge('scheduler_pending', len(self.scheduler.pending_urls))
+        self.metrics.set_gauge('scheduler_hosts', len(self.scheduler.host_queues))
+        self.metrics.set_gauge('workers_busy', self.busy)
+        self.metrics.set_gauge('leased_urls', len(self.leased))
+        self.metrics.set_gauge('write_buffer', len(self.page_writer.buffer), (('writer', self.page_writer.name),))
+        # Busiest hosts only, so the label set stays bounded
+        self.metrics.gauges = {key: value for key, value in self.metrics.gauges.items()
+                               if key[0] != 'host_in_flight'}
+        busiest = sorted(self.scheduler.host_in_flight.items(), key=lambda item: item[1], reverse=True)
+        for host, in_flight in busiest[:self.metrics.max_hosts]:
+            self.metrics.set_gauge('host_in_flight', in_flight, (('host', host),))
+
+    async def flush_metrics(self):
+        """Measure Redis round-trip time and frontier size, then save a snapshot via save_stats."""
+        try:
+            started = time.perf_counter()
+            await self.storage.redis.ping()
+            self.metrics.observe('redis_rtt_seconds', time.perf_counter() - started)
+            self.metrics.set_gauge('frontier_size', await self.frontier.size())
+        except Exception as e:
+            logger.error(f"Error measuring Redis for metrics: {str(e)}")
+        await self.storage.save_stats(self.metrics.snapshot(), self.checkpoint_config.get('name', 'crawler'))
+
+    async def metrics_loop(self):
+        while not self.done.is_set():
+            await asyncio.sleep(self.metrics.flush_interval)
+            await self.flush_metrics()
+
+    def create_content_index(self, config):
+        """Near-duplicate content index: 'local', 'redis' (shared by all nodes), or disabled."""
+        content_config = dict(config.get('content_dedup', {}))
+        if not content_config.pop('enabled', True):
+            return None
+        backend = content_config.pop('backend', 'local')
+        if backend == 'redis':
+            client = aioredis.Redis(connection_pool=get_async_pool(
+                config['redis']['host'], config['redis']['port']))
+            return RedisContentIndex(client, **content_config)
+        content_config.pop('key', None)
+        return ContentIndex(**content_config)
+
+    @property
+    def shared_dedup(self):
+        return isinstance(self.bloom_filter, RedisBloomFilter)
+
+    async def connect_bloom_filter(self):
+        if not self.shared_dedup:
+            return
+        try:
+            await self.bloom_filter.connect()
+            print("Using shared Redis Bloom filter for URL dedup.")
+        except Exception as e:
+            print(f"Redis Bloom filter unavailable: {e}. Falling back to local filter.")
+            self.bloom_filter = self.create_bloom_filter(self.config, backend='local')
+
+    async def filter_unseen(self, urls):
+        """Return the URLs the Bloom filter has not seen, without marking them."""
+        started = self.metrics.sample()
+        if self.shared_dedup:
+            seen = await self.bloom_filter.contains_many(urls)
+        else:
+            seen = self.bloom_filter.contains_many(urls)
+        self.metrics.since('bloom_check_seconds', started)
+        return [url for url, was_seen in zip(urls, seen) if not was_seen]
+
+    async def mark_seen(self, urls):
+        """Mark URLs as seen and return the ones that were new."""
+        started = self.metrics.sample()
+        if self.shared_dedup:
+            seen = await self.bloom_filter.check_and_add_many(urls)
+        else:
+            self.bloom_filter.stats['total_checks'] += len(urls)
+            seen = self.bloom_filter.add_many(urls)
+        self.metrics.since('bloom_add_seconds', started)
+        return [url for url, was_seen in zip(urls, seen) if not was_seen]
 
     async def initialize_session(self):
-        self.session = aiohttp.ClientSession()
+        self.session = self.fetcher.create_session()
 
-    async def fetch(self, url):
+    async def fetch(self, url, validators=None):
         try:
-            async with self.session.get(url, timeout=self.config['timeout']) as response:
-                if response.status == 200 and 'text/html' in response.headers.get('content-type', ''):
-                    return await response.text()
+            result = await self.fetcher.fetch(self.session, url, validators)
+        except asyncio.TimeoutError:
+            logger.error(f"Error fetching {url}: timed out")
+            self.errors += 1
+            return None
         except Exception as e:
             logger.error(f"Error fetching {url}: {str(e)}")
             self.errors += 1
-        return None
-
-    async def extract_and_enqueue_links(self, html):
-        soup = BeautifulSoup(html, 'html.parser')
-        links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].startswith('http')]
-        random.shuffle(links)
-        count = 0
-        for link in links:
-            if count >= 10:
-                break
-            if not self.bloom_filter.contains(link):
-                self.queue.push(link)
-                count += 1
+            return None
+        if result is None:
+            self.rejected += 1
+        return result
 
-    async def crawl(self, start_urls):
-        await self.initialize_session()
-        # Seed the queue
-        for url in start_urls:
-            self.queue.push(url)
-        attempts = 0
-        while self.crawled < self.max_urls:
-            raw_url = self.queue.pop()
-            if not raw_url:
-                self.empty_pops += 1
-                await asyncio.sleep(1)
-                continue
-            url = raw_url.decode('utf-8') if isinstance(raw_url, bytes) else raw_url
-            attempts += 1
-            # Check if URL is valid
-            if not self.is_valid_url(url):
+    async def extract_and_enqueue_links(self, url, page, depth=0, score=1.0):
+        if depth >= self.scheduler.max_depth:
+            return  # its links would be too deep to crawl
+        base = urljoin(url, page.base_href) if page.base_href else url
+        links = {}
+        for href in page.links:
+            link = self.canonicalizer.canonicalize(href, base)
+            # Drop links robots.txt already rules out; unknown hosts are checked before fetching
+            if link and self.is_valid_url(link) and self.robots.known_allowed(link) is not False:
+                links[link] = None
+        new_links = await self.filter_unseen(list(links))
+        # Links already waiting in the frontier are unseen too; pushing them again raises their score
+        await self.enqueue(self.scorer.score_links(new_links, depth, score))
+
+    async def enqueue(self, entries):
+        """Push (url, depth, score) entries to the frontier through the write-behind buffer."""
+        if not entries:
+            return
+        if self.queue_writer:
+            await self.queue_writer.submit(lambda pipe: self.frontier.write_push(pipe, *entries))
+        else:
+            for url, depth, score in entries:
+                await self.frontier.push(url, depth, score)
+
+    async def save_page(self, url, result, page, validators=None, depth=None, score=None):
+        """Store a page's raw bytes through the write-behind buffer."""
+        timestamp = datetime.now().isoformat()
+
+        def write(pipe):
+            self.storage.write_page(pipe, url, result.body, timestamp,
+                                    title=page.title if page else None, encoding=result.encoding,
+                                    etag=result.etag, last_modified=result.last_modified,
+                                    depth=depth, score=score)
+            if self.recrawl.enabled:
+                interval = self.recrawl.next_interval(
+                    validators.get('recrawl_interval') if validators else None, changed=True)
+                self.storage.schedule_recrawl(pipe, url, interval, self.recrawl.next_due(interval))
+
+        def stored():
+            self.metrics.observe('fetch_to_store_seconds', time.perf_counter() - result.started)
+        await self.page_writer.submit(write, stored if result.started is not None else None)
+
+    async def record_unchanged(self, url, validators):
+        """A revisit found nothing new: note the check and push the next one further out."""
+        timestamp = datetime.now().isoformat()
+        interval = self.recrawl.next_interval(validators.get('recrawl_interval'), changed=False)
+
+        def write(pipe):
+            self.storage.touch_page(pipe, url, timestamp)
+            if self.recrawl.enabled:
+                self.storage.schedule_recrawl(pipe, url, interval, self.recrawl.next_due(interval))
+        await self.page_writer.submit(write)
+
+    async def return_revisit(self, url, validators, due=None):
+        """Give back a claimed revisit that wasn't checked, at its current interval or at `due`."""
+        if validators is None:
+            return  # not a revisit
+        interval = validators.get('recrawl_interval') or self.recrawl.initial_interval
+
+        def write(pipe):
+            self.storage.schedule_recrawl(pipe, url, interval,
+                                          self.recrawl.next_due(interval) if due is None else due)
+        await self.page_writer.submit(write)
+
+    async def backoff(self, task, error, failures):
+        """Log a failed loop iteration and sleep, doubling the wait up to 30s while it keeps failing."""
+        delay = min(0.5 * 2 ** (failures - 1), 30)
+        logger.error(f"{task} failed, retrying in {delay:.1f}s: {str(error)}")
+        await asyncio.sleep(delay)
+
+    async def feed_recrawls(self):
+        """Move URLs whose revisit is due into the scheduler, bypassing the Bloom filter."""
+        failures = 0
+        while not self.done.is_set():
+            try:
+                await self.feed_recrawls_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                await self.backoff("Claiming due revisits", e, failures)
+
+    async def feed_recrawls_once(self):
+        room = min(self.recrawl.batch_size, self.max_pending - len(self.scheduler.pending_urls))
+        urls = (await self.storage.claim_due_recrawls(time.time(), room, self.recrawl.claim_ttl)
+                if room > 0 else [])
+        if not urls:
+            await asyncio.sleep(self.recrawl.poll_interval)
+            return
+        validators = await self.storage.get_validators(urls)
+        for url, stored in zip(urls, validators):
+            self.attempts += 1
+            # The depth and score of the first visit, so a changed page expands its links as it did then;
+            # a page stored under a larger max_depth is still revisited, but not expanded
+            depth = min(stored.get('depth', 0), self.scheduler.max_depth)
+            score = stored.get('score', self.scorer.seed_score)
+            if self.scheduler.schedule_url(url, depth, score):
+                self.revisits[url] = stored
+            else:
+                # Already waiting as a regular URL, whose fetch reschedules it anyway
+                self.duplicates += 1
+                await self.return_revisit(url, stored)
+        self.fetcher.prefetch({urlparse(url).hostname for url in urls})
+
+    async def feed_scheduler(self):
+        """Move the highest-priority URLs from the frontier into the per-host scheduler."""
+        failures = 0
+        while not self.done.is_set():
+            try:
+                await self.feed_scheduler_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                await self.backoff("Popping from the frontier", e, failures)
+
+    async def feed_scheduler_once(self):
+        if len(self.scheduler.pending_urls) >= self.max_pending:
+            # Enough local backlog; let the workers drain it first
+            await asyncio.sleep(0.1)
+            return
+        room = min(self.pop_batch, self.max_pending - len(self.scheduler.pending_urls))
+        # Work a dead node had claimed goes first
+        entries = await self.frontier.pop_retries(room) if self.reliable_frontier else []
+        retry = bool(entries)
+        if not entries:
+            entries = await self.frontier.pop_many(room, block=True, timeout=self.pop_timeout)
+        if not entries:
+            self.empty_pops += 1
+            return
+        await self.schedule(entries, retry)
+
+    async def schedule(self, entries, retry=False):
+        """Validate and dedup popped (url, depth, score) entries, then hand them to the scheduler."""
+        valid = {}
+        finished = []
+        for raw_url, depth, score in entries:
+            self.attempts += 1
+            # Check if URL is valid; seeds and other nodes' pushes may not be canonical yet
+            url = self.canonicalizer.canonicalize(raw_url)
+            if not url or not self.is_valid_url(url):
                 self.invalid_urls += 1
+                finished.append(raw_url)
                 continue
-                
-            if self.bloom_filter.contains(url):
+            if url in valid:
                 self.duplicates += 1
-                # Don't adapt during crawl
+                finished.append(raw_url)
                 continue
-            html = await self.fetch(url)
-            if html:
-                self.bloom_filter.add(url)
-                self.storage.save_page(url, html)
-                self.crawled += 1
-                self.unique += 1
-                print(f"[{self.crawled}] ✓ Crawled: {url[:80]}...")
-                await self.extract_and_enqueue_links(html)
-                # Don't adapt during crawl
+            valid[url] = (depth, score, raw_url)
+
+        # Mark the URLs before fetching so each is only scheduled once.
+        # Don't adapt during crawl.
+        new_urls = await self.mark_seen(list(valid))
+        if retry:
+            # Requeued after a crash: already marked, but never finished
+            new_urls = list(valid)
+        self.duplicates += len(valid) - len(new_urls)
+        scheduled = set()
+        for url in new_urls:
+            depth, score, raw_url = valid[url]
+            if self.scheduler.schedule_url(url, depth, score):
+                scheduled.add(url)
+                if self.reliable_frontier:
+                    self.leased[url] = raw_url
+        finished.extend(raw_url for url, (_, _, raw_url) in valid.items() if url not in scheduled)
+        await self.ack(*finished)
+        # Resolve new hosts while their URLs wait for a worker
+        self.fetcher.prefetch({urlparse(url).hostname for url in new_urls})
+
+    async def worker(self, worker_id):
+        """Fetch URLs handed out by the scheduler until the crawl is done."""
+        while not self.done.is_set():
+            url, depth, score = await self.scheduler.get_next_url()
+            self.busy += 1
+            try:
+                await self.handle_url(worker_id, url, depth, score)
+            except Exception as e:
+                # e.g. Redis went away mid-page; count it and keep the worker alive
+                self.errors += 1
+                logger.error(f"Worker {worker_id} failed on {url}: {str(e)}")
+                await self.release(url)
+            finally:
+                self.busy -= 1
+
+    async def release(self, url):
+        """Ack a URL this node took from a reliable frontier, if it is still leased."""
+        raw_url = self.leased.pop(url, None)
+        if raw_url is not None:
+            await self.ack(raw_url)
+
+    async def handle_url(self, worker_id, url, depth, score):
+        validators = self.revisits.pop(url, None)
+        try:
+            async with self.in_flight:
+                # The robots.txt fetch for a new host takes this host's slot too
+                allowed = await self.robots.allowed(url)
+                result = await self.fetch(url, validators) if allowed else None
+        except asyncio.CancelledError:
+            self.deferred += 1  # Shut down mid-fetch; the URL is fetched again next run
+            if validators is not None:
+                self.revisits[url] = validators  # returned by crawl() on the way out
+            raise
+        finally:
+            self.scheduler.update_last_crawled(url)
+        if allowed is None:
+            # robots.txt is unreachable, which is no Disallow: keep the URL (still leased)
+            # and hold its host until the robots.txt is tried again
+            self.scheduler.defer_host(self.scheduler.get_host(url), self.robots.retry_after(url))
+            self.scheduler.schedule_url(url, depth, score)
+            if validators is not None:
+                self.revisits[url] = validators
+            return
+        if not allowed:
+            self.robots_blocked += 1
+            await self.return_revisit(url, validators)
+        elif result:
+            if self.budget_spent():
+                self.deferred += 1
+                await self.return_revisit(url, validators, due=time.time())
+                return  # left unacked, so a reliable frontier hands it out again
+            await self.process_page(worker_id, url, result, validators, depth, score)
+        elif validators is not None:
+            # Failed revisit: keep the page on the recrawl schedule
+            await self.record_unchanged(url, validators)
+        await self.release(url)
+
+    async def process_page(self, worker_id, url, result, validators=None, depth=0, score=1.0):
+        """Parse, dedup by content, store and expand one fetched page."""
+        if result.not_modified or (
+                validators and validators.get('content_hash') == self.storage.content_hash(result.body)):
+            # 304, or a server that ignores validators but sent the same bytes
+            self.not_modified += 1
+            print(f"    = Unchanged: {url[:80]}")
+            await self.record_unchanged(url, validators)
+            return
+        # Parse once, off the event loop; storage and link discovery share the result
+        page = await self.parse_pool.parse(result.body, result.encoding)
+        if page and self.content_index:
+            original = await self.content_index.check_and_add(url, page.text)
+            # A changed revisit may still match its own earlier fingerprint
+            if original and original != url:
+                # Mirrors and session-ID variants: don't store or expand them
+                self.content_duplicates += 1
+                print(f"    ≈ Duplicate content: {url[:80]} (same as {original[:80]})")
+                await self.return_revisit(url, validators)
+                return
+        await self.save_page(url, result, page, validators, depth, score)
+        self.crawled += 1
+        self.unique += 1
+        print(f"[{self.crawled}] ✓ Crawled: {url[:80]}... (worker {worker_id})")
+        await self.count_page()
+        if self.budget_spent():
+            self.done.set()
+            return
+        if page:
+            await self.extract_and_enqueue_links(url, page, depth, score)
+
+    def budget_spent(self):
+        return self.budget_used >= self.max_urls
+
+    async def count_page(self):
+        """Count a crawled page against the budget, the shared one when processes split it."""
+        if not self.budget_key:
+            self.budget_used = self.crawled
+            return
+        try:
+            self.budget_used = await self.storage.redis.incr(self.budget_key)
+        except Exception as e:
+            logger.error(f"Error counting page against the shared budget: {str(e)}")
+            self.budget_used += 1
+
+    async def refresh_budget(self):
+        if not self.budget_key:
+            self.budget_used = self.crawled
+            return
+        try:
+            self.budget_used = int(await self.storage.redis.get(self.budget_key) or 0)
+        except Exception as e:
+            logger.error(f"Error reading the shared budget: {str(e)}")
+
+    async def budget_loop(self):
+        """End the crawl once the processes sharing the budget spent it, even if this one got no URLs."""
+        while not self.done.is_set():
+            await asyncio.sleep(1)
+            await self.refresh_budget()
+            if self.budget_spent():
+                self.done.set()
+
+    def stop(self):
+        """Stop taking new URLs and let in-flight fetches finish (e.g. on SIGTERM)."""
+        if self.stopping or self.done is None:
+            return
+        self.stopping = True
+        print(f"\nStopping: draining {self.busy} in-flight URLs (up to {self.drain_timeout}s)...")
+        self.done.set()
+
+    async def drain(self):
+        """Wait for workers in the middle of a URL; idle ones are cancelled right after."""
+        deadline = time.monotonic() + self.drain_timeout
+        while self.busy and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    def get_stats(self):
+        return {field: getattr(self, field) for field in self.checkpoint_fields}
+
+    def set_crawl_delay(self, host, delay):
+        """Apply a robots.txt Crawl-delay, never going below our own delay."""
+        self.scheduler.set_crawl_delay(host, max(delay, self.scheduler.rate_limit))
+
+    async def crawl(self, start_urls):
+        await self.initialize_session()
+        self.robots.connect(self.session, aioredis.Redis(connection_pool=get_async_pool(
+            self.config['redis']['host'], self.config['redis']['port'])), self.set_crawl_delay)
+        self.in_flight = asyncio.Semaphore(self.max_in_flight)
+        self.done = asyncio.Event()
+        self.parse_pool.start()
+        await self.connect_bloom_filter()
+        if await self.frontier.connect():
+            self.queue_writer = self.page_writer
+        writers = [self.page_writer]
+        for writer in writers:
+            await writer.start()
+        checkpointing = self.checkpoint_config.get('enabled', False)
+        if checkpointing:
+            await self.restore_checkpoint()
+        # Seed the queue
+        for url in start_urls:
+            await self.frontier.push(url, 0, self.scorer.seed_score)
+        workers = [asyncio.create_task(self.worker(i)) for i in range(self.num_workers)]
+        workers.append(asyncio.create_task(self.feed_scheduler()))
+        if self.recrawl.enabled:
+            workers.append(asyncio.create_task(self.feed_recrawls()))
+        if checkpointing:
+            workers.append(asyncio.create_task(self.checkpoint_loop()))
+        if self.metrics.enabled:
+            await self.metrics.start()
+            workers.append(asyncio.create_task(self.metrics_loop()))
+        if self.budget_key:
+            workers.append(asyncio.create_task(self.budget_loop()))
+        await self.refresh_budget()
+        if self.budget_spent():
+            self.done.set()
+        # Wait for the end of the crawl, or for a task to die, which ends it too.
+        # (FIRST_EXCEPTION would ignore done being set, so watch for any task finishing.)
+        done_waiter = asyncio.create_task(self.done.wait())
+        finished, _ = await asyncio.wait([done_waiter, *workers], return_when=asyncio.FIRST_COMPLETED)
+        done_waiter.cancel()
+        for task in finished:
+            if task is not done_waiter and not self.done.is_set():
+                error = task.exception() if not task.cancelled() else None
+                logger.error(f"Crawler task {task.get_coro().__qualname__} exited unexpectedly: {error!r}")
+                self.stop()
+        if self.stopping:
+            await self.drain()
+        # Stop idle workers, and in-flight ones once the budget is spent or the drain timed out
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Scheduled but never handed to a worker
+        self.deferred += len(self.scheduler.pending_urls)
+        # Revisits claimed but not checked are still due
+        for url, validators in self.revisits.items():
+            await self.return_revisit(url, validators, due=time.time())
+        self.revisits.clear()
+        # Make sure every buffered page and link reaches Redis
+        for writer in writers:
+            await writer.close()
+        if checkpointing:
+            if self.budget_spent():
+                # Budget spent; the next run starts a fresh crawl
+                await self.storage.delete_checkpoint(self.checkpoint_config.get('name', 'crawler'))
+            else:
+                await self.checkpoint()
+        if self.metrics.enabled:
+            await self.flush_metrics()
+            await self.metrics.close()
+        await self.frontier.close()
+        await self.storage.close()
+        await close_async_pools()
         await self.session.close()
-        
+        await self.fetcher.close()
+        self.parse_pool.shutdown()
+        if not self.shared_dedup:
+            self.adapt_bloom_filter()
+            self.save_bloom_filter()
+        self.print_stats(self.attempts)
+        return self.get_stats()
+
+    def adapt_bloom_filter(self):
         # Now adapt the Bloom filter at the end
         print("\nAdapting Bloom filter size at the end of crawling...")
         print(f"Initial capacity: {self.bloom_filter.bloom_filter.capacity}")
@@ -152,23 +690,26 @@ class WebCrawler:
         old_threshold = self.bloom_filter.adaptation_threshold
         self.bloom_filter.adaptation_threshold = 0.01  # 1% threshold to force resize
         
-        # Try to adapt up to 3 times
+        # Try to adapt up to 3 times, stopping as soon as a step doesn't help
+        fpr = initial_fpr
         for i in range(3):
             print(f"Adaptation attempt {i+1}...")
-            result = self.bloom_filter.adapt()
+            if not self.bloom_filter.adapt():
+                print("  No slice added")
+                break
             new_fpr = self.bloom_filter.sample_fpr(200) * 100
             print(f"  New capacity: {self.bloom_filter.bloom_filter.capacity}")
             print(f"  New error rate: {self.bloom_filter.bloom_filter.error_rate}")
             print(f"  New FPR: {new_fpr:.2f}%")
-            if new_fpr < 1.0:  # Stop if FPR is below 1%
+            if new_fpr < 1.0 or new_fpr >= fpr:  # Below 1%, or growing didn't improve it
                 break
+            fpr = new_fpr
         
         # Restore original threshold
         self.bloom_filter.adaptation_threshold = old_threshold
         
         print(f"Final capacity after adaptation: {self.bloom_filter.bloom_filter.capacity}")
         print(f"Final error rate: {self.bloom_filter.bloom_filter.error_rate}")
-        self.print_stats(attempts)
 
     def is_valid_url(self, url):
         parsed = urlparse(url)
@@ -177,8 +718,6 @@ class WebCrawler:
             return parsed.scheme in ['http', 'https']
         return (parsed.scheme in ['http', 'https'] and parsed.netloc in self.allowed_domains)
 
-    # Worker logic is now in crawl()
-
     def print_stats(self, attempts):
         bloom_stats = self.bloom_filter.get_stats()
         print("\n=== Crawl Statistics ===")
@@ -189,9 +728,16 @@ class WebCrawler:
         print(f"Errors encountered: {self.errors}")
         print(f"Empty queue pops: {self.empty_pops}")
         print(f"Invalid URLs skipped: {self.invalid_urls}")
+        print(f"Duplicate content skipped: {self.content_duplicates}")
+        print(f"Unchanged on revisit: {self.not_modified}")
+        print(f"Blocked by robots.txt: {self.robots_blocked}")
+        print(f"Rejected by the fetcher: {self.rejected}")
+        print(f"Deferred to a later run: {self.deferred}")
         
-        # Verify all attempts are accounted for
-        accounted = self.crawled + self.duplicates + self.errors + self.empty_pops + self.invalid_urls
+        # Verify all attempts are accounted for; an empty pop took no URL, so it isn't one
+        accounted = (self.crawled + self.duplicates + self.errors + self.invalid_urls
+                     + self.content_duplicates + self.not_modified + self.robots_blocked + self.rejected
+                     + self.deferred)
         print(f"Total accounted for: {accounted} of {attempts} attempts")
         if accounted != attempts:
             print(f"WARNING: {attempts - accounted} attempts unaccounted for!")
@@ -202,18 +748,38 @@ class WebCrawler:
         print(f"Bloom Filter capacity: {bloom_stats['capacity']}")
         print(f"Bloom Filter error rate: {bloom_stats['error_rate']}")
         print(f"Bloom Filter inserted count: {bloom_stats['inserted_count']}")
+        fetch_stats = self.fetcher.get_stats()
+        print("\n=== Fetch Statistics ===")
+        print(f"Pages fetched: {fetch_stats['fetched']} ({fetch_stats['bytes']} bytes)")
+        print(f"Rejected by status / content type: {fetch_stats['rejected_status']} / {fetch_stats['rejected_type']}")
+        print(f"Over size cap: {fetch_stats['too_large']}, over time budget: {fetch_stats['timeouts']}")
+        print(f"DNS lookups: {fetch_stats['dns']['lookups']} (cache hits: {fetch_stats['dns']['hits']}, "
+              f"prefetched: {fetch_stats['dns']['prefetched']})")
+        if isinstance(self.frontier, ShardedRedisFrontier) and self.frontier.is_connected:
+            frontier_stats = self.frontier.get_stats()
+            print(f"Frontier node {frontier_stats['node_id']}: {frontier_stats['acquired']} shard leases acquired, "
+                  f"{frontier_stats['released']} released, {frontier_stats['lost']} lost")
+        robots_stats = self.robots.get_stats()
+        print(f"robots.txt fetched: {robots_stats['fetched']} (errors: {robots_stats['errors']}, "
+              f"shared cache hits: {robots_stats['redis_hits']}, local hits: {robots_stats['cache_hits']}, "
+              f"URLs put off while unreachable: {robots_stats['unreachable']})")
+        compression_stats = self.storage.compressor.get_stats()
+        print("\n=== Storage Statistics ===")
+        print(f"Page codec: {compression_stats['codec']} (dictionaries trained: {compression_stats['dictionaries']})")
+        print(f"Compression ratio: {compression_stats['compression_ratio']:.2f}x")
+        print(f"Bytes saved: {compression_stats['bytes_saved']} of {compression_stats['raw_bytes']}")
+        if self.metrics.histograms:
+            print("\n=== Latency (p50 / p99, bucket upper bounds) ===")
+            for (name, labels), histogram in sorted(self.metrics.histograms.items()):
+                label = ','.join(value for _, value in labels)
+                print(f"{name}{f'[{label}]' if label else ''}: {histogram.quantile(0.5) * 1000:g}ms / "
+                      f"{histogram.quantile(0.99) * 1000:g}ms ({histogram.count} samples)")
         print("Crawling completed.")
 
-if __name__ == "__main__":
-    import config.crawler_config as config
-    
-    async def main():
-        crawler = WebCrawler(config.CONFIG)
-        start_urls = config.START_URLS
-        
-        try:
-            await crawler.crawl(start_urls)
-        except KeyboardInterrupt:
-            logger.info("Crawler interrupted by user")
+def main(argv=None):
+    """Console entry point; see crawler.launcher for the options."""
+    from crawler.launcher import main as launch
+    return launch(argv)
 
-    asyncio.run(main())
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from html.parser import HTMLParser
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+SKIP_TEXT_TAGS = {'script', 'style', 'noscript', 'template'}
+
+class ExtractedPage:
+    """Everything the crawler and storage need from one page."""
+    __slots__ = ('links', 'base_href', 'title', 'text')
+
+    def __init__(self, links: List[str], base_href: Optional[str], title: Optional[str], text: str):
+        self.links = links
+        self.base_href = base_href
+        self.title = title
+        self.text = text
+
+class LinkExtractor(HTMLParser):
+    """Streaming extractor: collects hrefs, <base href>, title and text in one pass.
+
+    Works on HTMLParser's start/end/data events, so no DOM is built.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.base_href = None
+        self.title = None
+        self.title_parts = None
+        self.text_parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for name, value in attrs:
+                if name == 'href' and value:
+                    self.links.append(value.strip())
+                    break
+        elif tag == 'base' and self.base_href is None:
+            for name, value in attrs:
+                if name == 'href' and value:
+                    self.base_href = value.strip()
+                    break
+        elif tag == 'title' and self.title is None and self.title_parts is None:
+            self.title_parts = []
+        elif tag in SKIP_TEXT_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == 'title' and self.title_parts is not None:
+            self.title = ''.join(self.title_parts).strip() or None
+            self.title_parts = None
+        elif tag in SKIP_TEXT_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.title_parts is not None:
+            self.title_parts.append(data)
+        self.text_parts.append(data)
+
+    def result(self) -> ExtractedPage:
+        if self.title_parts is not None:
+            # Unclosed <title>
+            self.title = ''.join(self.title_parts).strip() or None
+        return ExtractedPage(self.links, self.base_href, self.title, clean_text(''.join(self.text_parts)))
+
+def clean_text(text: str) -> str:
+    """Collapse whitespace the same way utils.get_page_content always has."""
+    # Break into lines and remove leading and trailing space on each
+    lines = (line.strip() for line in text.splitlines())
+    # Break multi-headlines into a line each
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    # Drop blank lines
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+def extract_page(html: str) -> ExtractedPage:
+    """Parse a page once and return its links, base href, title and text."""
+    extractor = LinkExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except Exception as e:
+        logger.warning(f"Error parsing HTML: {str(e)}")
+    return extractor.result()
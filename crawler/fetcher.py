@@ -0,0 +1,267 @@
+import asyncio
+import codecs
+import logging
+import re
+import socket
+import time
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+try:
+    import brotli  # lets aiohttp decode 'br' responses
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTENT_TYPES = ['text/html', 'application/xhtml+xml']
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+
+def sniff_charset(body, limit=1024):
+    """Charset declared in a <meta> tag near the top of the page, if any."""
+    match = META_CHARSET.search(body[:limit])
+    return match.group(1).decode('ascii') if match else None
+
+class FetchResult:
+    """A fetched page body, kept as bytes; the charset is only worked out when asked for.
+
+    A 304 answer to a conditional request has status 304 and no body.
+    """
+    __slots__ = ('url', 'status', 'body', 'content_type', 'header_charset', 'truncated', 'charset',
+                 'etag', 'last_modified', 'started')
+
+    def __init__(self, url, status, body, content_type, header_charset=None, truncated=False,
+                 etag=None, last_modified=None):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.header_charset = header_charset
+        self.truncated = truncated
+        self.charset = None
+        self.etag = etag
+        self.last_modified = last_modified
+        self.started = None  # perf_counter() when the fetch began
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+    @property
+    def encoding(self):
+        if self.charset is None:
+            self.charset = 'utf-8'
+            for candidate in (self.header_charset, sniff_charset(self.body)):
+                if candidate:
+                    try:
+                        self.charset = codecs.lookup(candidate).name
+                        break
+                    except LookupError:
+                        continue
+        return self.charset
+
+class CachingResolver(AbstractResolver):
+    """DNS resolver with a TTL cache that can be warmed ahead of the fetches.
+
+    Concurrent lookups of one host share a single query, and prefetch()
+    resolves hosts as they enter the frontier so the first fetch to a host
+    doesn't wait on DNS.
+    """
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.resolver = DefaultResolver()
+        self.cache = {}    # (host, family) -> (expires, addresses)
+        self.pending = {}  # (host, family) -> task resolving it
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'prefetched': 0
+        }
+
+    def cached(self, key):
+        entry = self.cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def lookup(self, host, family):
+        key = (host, family)
+        task = self.pending.get(key)
+        if task is None:
+            self.stats['lookups'] += 1
+            task = asyncio.ensure_future(self.resolver.resolve(host, 0, family))
+            self.pending[key] = task
+            task.add_done_callback(lambda t: self.store(key, t))
+        return await asyncio.shield(task)
+
+    def store(self, key, task):
+        self.pending.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.cache[key] = (time.monotonic() + self.ttl, task.result())
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        addresses = self.cached((host, family))
+        if addresses is not None:
+            self.stats['hits'] += 1
+        else:
+            addresses = await self.lookup(host, family)
+        return [dict(address, port=port) for address in addresses]
+
+    def prefetch(self, hosts, family=socket.AF_UNSPEC):
+        """Start resolving hosts that aren't cached yet, without waiting for them.
+
+        family matches TCPConnector's default, so the fetch finds the entry.
+        """
+        for host in hosts:
+            key = (host, family)
+            if key in self.pending or self.cached(key) is not None:
+                continue
+            self.stats['prefetched'] += 1
+            asyncio.ensure_future(self.lookup(host, family)).add_done_callback(self.ignore_failure)
+
+    @staticmethod
+    def ignore_failure(task):
+        if not task.cancelled():
+            task.exception()  # a failed prefetch just means the fetch resolves again
+
+    async def close(self):
+        for task in self.pending.values():
+            task.cancel()
+        await self.resolver.close()
+
+class PageFetcher:
+    """Streams response bodies with a size cap and a time budget.
+
+    Non-HTML responses are dropped as soon as the headers arrive, and bodies
+    are read chunk by chunk so a worker never holds more than max_bytes of
+    one page. Pages over the cap are truncated (the links up front are still
+    worth having); fetches that exceed time_budget are abandoned.
+
+    create_session() builds the one ClientSession the crawl shares: a
+    TCPConnector with total and per-host limits and keep-alive, so
+    connections to a host are reused across thousands of fetches, plus a
+    TTL DNS cache and connect/sock_read/total timeouts. With a Metrics
+    object the session also records DNS, connect, time-to-first-byte and
+    body download times.
+    """
+    def __init__(self, max_bytes=5 * 1024 * 1024, time_budget=30, chunk_size=65536,
+                 content_types=None, truncate=True, limit=100, limit_per_host=2,
+                 keepalive_timeout=30, dns_ttl=300, prefetch_dns=True, connect_timeout=10,
+                 sock_read_timeout=15, user_agent=None, metrics=None):
+        self.max_bytes = max_bytes
+        self.time_budget = time_budget
+        self.chunk_size = chunk_size
+        self.content_types = tuple(content_types or DEFAULT_CONTENT_TYPES)
+        self.truncate = truncate
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.prefetch_dns = prefetch_dns
+        self.timeout = aiohttp.ClientTimeout(total=time_budget, connect=connect_timeout,
+                                             sock_read=sock_read_timeout)
+        self.headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if user_agent:
+            self.headers['User-Agent'] = user_agent
+        self.resolver = CachingResolver(ttl=dns_ttl)
+        self.metrics = metrics
+        self.stats = {
+            'fetched': 0,
+            'bytes': 0,
+            'rejected_status': 0,
+            'rejected_type': 0,
+            'too_large': 0,
+            'timeouts': 0,
+            'conditional': 0,
+            'not_modified': 0
+        }
+
+    def create_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            resolver=self.resolver,
+            use_dns_cache=False  # the resolver caches, and prefetch() can warm it
+        )
+        trace_configs = [self.metrics.trace_config()] if self.metrics is not None else None
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers,
+                                     trace_configs=trace_configs)
+
+    def prefetch(self, hosts):
+        if self.prefetch_dns:
+            self.resolver.prefetch(hosts)
+
+    async def fetch(self, session, url, validators=None):
+        """Return a FetchResult for an HTML page, or None if it was rejected.
+
+        validators (etag / last_modified from an earlier fetch) turn this into
+        a conditional GET; an unchanged page comes back as a bodiless 304.
+        """
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+            if headers:
+                self.stats['conditional'] += 1
+        started = time.perf_counter()
+        try:
+            result = await self.fetch_body(session, url, headers)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+        if result is not None:
+            result.started = started
+        return result
+
+    async def fetch_body(self, session, url, headers=None):
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and headers:
+                self.stats['not_modified'] += 1
+                return FetchResult(url, 304, None, '', etag=response.headers.get('etag'),
+                                   last_modified=response.headers.get('last-modified'))
+            if response.status != 200:
+                self.stats['rejected_status'] += 1
+                return None
+            content_type = response.headers.get('content-type', '').lower()
+            if not content_type.startswith(self.content_types):
+                self.stats['rejected_type'] += 1
+                return None
+            if not self.truncate and (response.content_length or 0) > self.max_bytes:
+                self.stats['too_large'] += 1
+                return None
+
+            started = time.perf_counter()
+            body = bytearray()
+            truncated = False
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                body += chunk
+                if len(body) >= self.max_bytes:
+                    truncated = len(body) > self.max_bytes or not response.content.at_eof()
+                    break
+            if truncated:
+                self.stats['too_large'] += 1
+                if not self.truncate:
+                    return None
+                del body[self.max_bytes:]
+            self.stats['fetched'] += 1
+            self.stats['bytes'] += len(body)
+            if self.metrics is not None:
+                self.metrics.observe('download_seconds', time.perf_counter() - started)
+            return FetchResult(url, response.status, bytes(body), content_type,
+                               response.charset, truncated, response.headers.get('etag'),
+                               response.headers.get('last-modified'))
+
+    async def close(self):
+        await self.resolver.close()
+
+    def get_stats(self):
+        return dict(self.stats, dns=dict(self.resolver.stats))
@@ -0,0 +1,477 @@
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import socket
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+
+from storage.redis_storage import get_async_pool
+
+logger = logging.getLogger(__name__)
+
+# (url, depth, score)
+FrontierEntry = Tuple[str, int, float]
+
+class LinkScorer:
+    """Scores discovered links so the crawl budget goes to important pages first.
+
+    With 'opic' (On-line Page Importance Computation) a fetched page hands
+    its score out in equal shares to its links, and the shares a URL
+    collects from every page linking to it add up while it waits in the
+    frontier. 'inlinks' gives each link 1, so the score is the in-link
+    count. Either way the result is multiplied by the weight of the most
+    specific matching entry in domain_priorities.
+    """
+    def __init__(self, method: str = 'opic', seed_score: float = 1.0,
+                 domain_priorities: Optional[Dict[str, float]] = None, max_links_per_page: int = 50):
+        self.method = method
+        self.seed_score = seed_score
+        self.domain_priorities = {d.lower(): w for d, w in (domain_priorities or {}).items()}
+        self.max_links_per_page = max_links_per_page
+
+    def domain_weight(self, url: str) -> float:
+        if not self.domain_priorities:
+            return 1.0
+        host = (urlsplit(url).hostname or '').split('.')
+        for i in range(len(host)):
+            weight = self.domain_priorities.get('.'.join(host[i:]))
+            if weight is not None:
+                return weight
+        return 1.0
+
+    def score_links(self, links: List[str], parent_depth: int, parent_score: float) -> List[FrontierEntry]:
+        """Frontier entries for a page's links, best first, capped at max_links_per_page."""
+        if not links:
+            return []
+        share = parent_score / len(links) if self.method == 'opic' else 1.0
+        depth = parent_depth + 1
+        entries = [(link, depth, share * self.domain_weight(link)) for link in links]
+        entries.sort(key=lambda entry: entry[2], reverse=True)
+        return entries[:self.max_links_per_page]
+
+class AsyncRedisFrontier:
+    """Priority frontier in a Redis sorted set, highest score popped first.
+
+    Members are URLs scored by priority; rediscovering a URL adds to its
+    score in place with ZINCRBY. Depths live in a hash next to it and keep
+    the first (shallowest) value seen. Falls back to LocalFrontier when
+    Redis is down.
+    """
+    def __init__(self, name: str = 'frontier', host: str = 'localhost', port: int = 6379):
+        self.db = aioredis.Redis(connection_pool=get_async_pool(host, port))
+        self.key = name
+        self.depth_key = f'{name}:depth'
+        self.is_connected = False
+        self.local_frontier = None
+
+    async def connect(self) -> bool:
+        """Check the connection, falling back to a local frontier if Redis is down."""
+        try:
+            await self.db.ping()
+            self.is_connected = True
+            print("Successfully connected to Redis. Using distributed frontier.")
+        except Exception as e:
+            print(f"Redis connection failed: {e}. Falling back to local frontier.")
+            self.is_connected = False
+            self.local_frontier = LocalFrontier(self.key)
+        return self.is_connected
+
+    def write_push(self, pipe, *entries: FrontierEntry):
+        """Queue pushes of (url, depth, score) entries on a pipeline (used by BatchWriter)."""
+        for url, depth, score in entries:
+            pipe.zincrby(self.key, score, url)
+            pipe.hsetnx(self.depth_key, url, depth)
+
+    async def push(self, url: str, depth: int = 0, score: float = 1.0):
+        if not self.is_connected:
+            await self.local_frontier.push(url, depth, score)
+            return
+        pipe = self.db.pipeline(transaction=False)
+        self.write_push(pipe, (url, depth, score))
+        await pipe.execute()
+
+    async def pop_many(self, count: int, block: bool = False, timeout: float = 1) -> List[FrontierEntry]:
+        """Pop up to count of the highest-scored URLs (waiting up to timeout if empty)."""
+        if not self.is_connected:
+            return await self.local_frontier.pop_many(count, block, timeout)
+        popped = await self.db.zpopmax(self.key, count)
+        if not popped and block:
+            item = await self.db.bzpopmax(self.key, timeout=timeout)
+            if item:
+                popped = [(item[1], item[2])]
+                if count > 1:
+                    popped += await self.db.zpopmax(self.key, count - 1)
+        if not popped:
+            return []
+        urls = [url for url, _ in popped]
+        pipe = self.db.pipeline(transaction=False)
+        pipe.hmget(self.depth_key, urls)
+        pipe.hdel(self.depth_key, *urls)
+        depths, _ = await pipe.execute()
+        return [(url.decode('utf-8'), int(depth or 0), score)
+                for (url, score), depth in zip(popped, depths)]
+
+    async def size(self) -> int:
+        if not self.is_connected:
+            return len(self.local_frontier)
+        return await self.db.zcard(self.key)
+
+    async def close(self):
+        await self.db.aclose()
+
+class ShardedRedisFrontier(AsyncRedisFrontier):
+    """AsyncRedisFrontier split into `shards` sorted sets by hash of the host.
+
+    Every URL of a host lands in the same shard and each shard is worked by
+    exactly one node, so per-host politeness and caches stay node-local.
+    Nodes heartbeat into {name}:nodes; each node computes the same
+    rendezvous-hash assignment of shards to live nodes and holds a lease
+    ({name}:lease:<shard>, renewed every heartbeat) on its own shards.
+    When a node joins or leaves, only the shards whose owner changes move:
+    the old owner releases them and the new one takes the lease once free.
+    Pushes go straight to the owning shard, whoever owns it.
+
+    With reliable=True pops are at-least-once: a MULTI block moves the
+    claimed URLs from the shard into this node's processing set
+    (<shard>:processing:<node>) instead of deleting them, and write_ack()
+    removes them once the page is done. The owner of a shard requeues the
+    processing sets of nodes whose heartbeat has lapsed into <shard>:retry,
+    which pop_retries() serves ahead of new URLs, so a crashed node's
+    in-flight work is picked up within lease_ttl.
+    """
+    def __init__(self, name: str = 'frontier', host: str = 'localhost', port: int = 6379,
+                 shards: int = 16, lease_ttl: float = 15, heartbeat_interval: float = 5,
+                 node_id: Optional[str] = None, reliable: bool = False):
+        super().__init__(name, host, port)
+        self.num_shards = shards
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.node_id = node_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.nodes_key = f'{name}:nodes'
+        self.workers_key = f'{name}:workers'  # nodes that may have processing sets
+        self.reliable = reliable
+        self.live_nodes: List[str] = []
+        self.owned: List[int] = []
+        self.rotation = 0
+        self.heartbeat_task = None
+        self.stats = {
+            'rebalances': 0,
+            'acquired': 0,
+            'released': 0,
+            'lost': 0,
+            'requeued': 0
+        }
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return (urlsplit(url).hostname or '').lower()
+
+    def shard_of(self, url: str) -> int:
+        return zlib.crc32(self.host_of(url).encode('utf-8')) % self.num_shards
+
+    def shard_key(self, shard: int) -> str:
+        return f'{self.key}:{shard}'
+
+    def lease_key(self, shard: int) -> str:
+        return f'{self.key}:lease:{shard}'
+
+    def processing_key(self, shard: int, node: Optional[str] = None) -> str:
+        return f'{self.key}:{shard}:processing:{node or self.node_id}'
+
+    def retry_key(self, shard: int) -> str:
+        return f'{self.key}:{shard}:retry'
+
+    @staticmethod
+    def weight(node: str, shard: int) -> int:
+        return int.from_bytes(hashlib.md5(f'{node}/{shard}'.encode('utf-8')).digest()[:8], 'big')
+
+    def assigned_shards(self, nodes: List[str]) -> List[int]:
+        """Shards whose highest rendezvous weight among live nodes is ours."""
+        return [shard for shard in range(self.num_shards)
+                if max(nodes, key=lambda node: self.weight(node, shard)) == self.node_id]
+
+    async def connect(self) -> bool:
+        if not await super().connect():
+            return False
+        await self.rebalance()
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        print(f"Frontier node {self.node_id} owns {len(self.owned)} of {self.num_shards} shards")
+        return True
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logger.error(f"Error renewing frontier shard leases: {str(e)}")
+
+    async def rebalance(self):
+        """Announce this node, then acquire, renew or release shard leases to match the assignment."""
+        now = time.time()
+        pipe = self.db.pipeline(transaction=False)
+        pipe.zadd(self.nodes_key, {self.node_id: now})
+        pipe.zremrangebyscore(self.nodes_key, 0, now - self.lease_ttl)
+        pipe.zrange(self.nodes_key, 0, -1)
+        nodes = [node.decode('utf-8') for node in (await pipe.execute())[2]]
+        self.live_nodes = nodes
+        target = self.assigned_shards(nodes)
+        owned = []
+        for shard in self.owned:
+            if shard not in target:
+                await self.release(shard)
+            elif await self.renew(shard):
+                owned.append(shard)
+            else:
+                self.stats['lost'] += 1
+        lease_ms = int(self.lease_ttl * 1000)
+        for shard in target:
+            if shard not in owned and await self.db.set(self.lease_key(shard), self.node_id,
+                                                        nx=True, px=lease_ms):
+                self.stats['acquired'] += 1
+                owned.append(shard)
+        if sorted(owned) != sorted(self.owned):
+            self.stats['rebalances'] += 1
+        self.owned = sorted(owned)
+        if self.reliable:
+            await self.reap()
+
+    async def reap(self):
+        """Requeue what dead nodes had claimed from our shards."""
+        workers = [node.decode('utf-8') for node in await self.db.smembers(self.workers_key)]
+        for node in workers:
+            if node == self.node_id or node in self.live_nodes:
+                continue
+            for shard in self.owned:
+                self.stats['requeued'] += await self.requeue(shard, node)
+            pipe = self.db.pipeline(transaction=False)
+            for shard in range(self.num_shards):
+                pipe.exists(self.processing_key(shard, node))
+            if not any(await pipe.execute()):
+                await self.db.srem(self.workers_key, node)
+
+    async def requeue(self, shard: int, node: Optional[str] = None) -> int:
+        """Move a node's processing set for a shard into the shard's retry set."""
+        processing = self.processing_key(shard, node)
+        pipe = self.db.pipeline(transaction=True)
+        pipe.zcard(processing)
+        pipe.zunionstore(self.retry_key(shard), [self.retry_key(shard), processing], aggregate='MAX')
+        pipe.delete(processing)
+        return (await pipe.execute())[0]
+
+    async def renew(self, shard: int) -> bool:
+        """Extend our lease on a shard, unless it expired and someone else took it."""
+        key = self.lease_key(shard)
+        async with self.db.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                owner = await pipe.get(key)
+                if owner is None:
+                    # Expired but unclaimed; take it back
+                    await pipe.reset()
+                    return bool(await self.db.set(key, self.node_id, nx=True,
+                                                  px=int(self.lease_ttl * 1000)))
+                if owner.decode('utf-8') != self.node_id:
+                    return False
+                pipe.multi()
+                pipe.pexpire(key, int(self.lease_ttl * 1000))
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def release(self, shard: int):
+        key = self.lease_key(shard)
+        async with self.db.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                owner = await pipe.get(key)
+                if owner is not None and owner.decode('utf-8') == self.node_id:
+                    pipe.multi()
+                    pipe.delete(key)
+                    await pipe.execute()
+                    self.stats['released'] += 1
+            except WatchError:
+                pass
+
+    def write_push(self, pipe, *entries: FrontierEntry):
+        """Queue pushes on a pipeline, each entry routed to its host's shard."""
+        for url, depth, score in entries:
+            key = self.shard_key(self.shard_of(url))
+            pipe.zincrby(key, score, url)
+            pipe.hsetnx(f'{key}:depth', url, depth)
+
+    def plan_batch(self, count: int) -> List[Tuple[int, int]]:
+        """Split count over the owned shards, rotating which ones get the remainder."""
+        shards = list(self.owned)
+        if not shards:
+            return []
+        self.rotation = (self.rotation + 1) % len(shards)
+        shards = shards[self.rotation:] + shards[:self.rotation]
+        plan = [(shard, count // len(shards) + (1 if i < count % len(shards) else 0))
+                for i, shard in enumerate(shards)]
+        return [(shard, shard_count) for shard, shard_count in plan if shard_count]
+
+    async def claim(self, plan: List[Tuple[int, int]], retry: bool = False) -> List[FrontierEntry]:
+        """Atomically move the best URLs of each shard into our processing sets."""
+        pipe = self.db.pipeline(transaction=True)
+        pipe.sadd(self.workers_key, self.node_id)
+        for shard, shard_count in plan:
+            source = self.retry_key(shard) if retry else self.shard_key(shard)
+            processing = self.processing_key(shard)
+            claimed = f'{processing}:claim'
+            pipe.zrangestore(claimed, source, 0, shard_count - 1, desc=True)
+            pipe.zremrangebyrank(source, -shard_count, -1)
+            pipe.zunionstore(processing, [processing, claimed], aggregate='MAX')
+            pipe.zrange(claimed, 0, -1, withscores=True)
+            pipe.delete(claimed)
+        results = (await pipe.execute())[1:]
+        popped = [(self.shard_key(shard), url, score)
+                  for (shard, _), items in zip(plan, results[3::5]) for url, score in items]
+        if not popped:
+            return []
+        # Depths stay until the ack so a requeued URL keeps its own
+        pipe = self.db.pipeline(transaction=False)
+        for key, url, _ in popped:
+            pipe.hget(f'{key}:depth', url)
+        depths = await pipe.execute()
+        return [(url.decode('utf-8'), int(depth or 0), score)
+                for (_, url, score), depth in zip(popped, depths)]
+
+    async def pop_retries(self, count: int) -> List[FrontierEntry]:
+        """Claim URLs requeued from dead nodes; they were already marked seen, so skip the dedup."""
+        if not self.is_connected or not self.reliable:
+            return []
+        return await self.claim(self.plan_batch(count), retry=True)
+
+    def write_ack(self, pipe, *urls: str):
+        """Queue acks of finished URLs (as popped) on a pipeline."""
+        for url in urls:
+            shard = self.shard_of(url)
+            pipe.zrem(self.processing_key(shard), url)
+            pipe.hdel(f'{self.shard_key(shard)}:depth', url)
+
+    async def pop_many(self, count: int, block: bool = False, timeout: float = 1) -> List[FrontierEntry]:
+        """Pop up to count URLs from the shards this node owns, best first in each shard."""
+        if not self.is_connected:
+            return await self.local_frontier.pop_many(count, block, timeout)
+        plan = self.plan_batch(count)
+        if not plan:
+            if block:
+                await asyncio.sleep(timeout)
+            return []
+        if self.reliable:
+            entries = await self.claim(plan)
+            if not entries and block:
+                # BZPOPMAX can't move atomically, so wait and look once more
+                await asyncio.sleep(timeout)
+                entries = await self.claim(self.plan_batch(count))
+            return entries
+        shards = [shard for shard, _ in plan]
+        pipe = self.db.pipeline(transaction=False)
+        for shard, shard_count in plan:
+            pipe.zpopmax(self.shard_key(shard), shard_count)
+        popped = [(self.shard_key(shard), url, score)
+                  for (shard, _), items in zip(plan, await pipe.execute()) for url, score in items]
+        if not popped and block:
+            item = await self.db.bzpopmax([self.shard_key(shard) for shard in shards], timeout=timeout)
+            if item:
+                popped = [(item[0].decode('utf-8'), item[1], item[2])]
+        if not popped:
+            return []
+        pipe = self.db.pipeline(transaction=False)
+        for key, url, _ in popped:
+            pipe.hget(f'{key}:depth', url)
+            pipe.hdel(f'{key}:depth', url)
+        depths = (await pipe.execute())[::2]
+        return [(url.decode('utf-8'), int(depth or 0), score)
+                for (_, url, score), depth in zip(popped, depths)]
+
+    async def size(self) -> int:
+        if not self.is_connected:
+            return len(self.local_frontier)
+        pipe = self.db.pipeline(transaction=False)
+        for shard in range(self.num_shards):
+            pipe.zcard(self.shard_key(shard))
+        return sum(await pipe.execute())
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, node_id=self.node_id, owned_shards=list(self.owned))
+
+    async def close(self):
+        """Stop heartbeating and hand our shards back so other nodes pick them up at once."""
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+            await asyncio.gather(self.heartbeat_task, return_exceptions=True)
+            self.heartbeat_task = None
+        if self.is_connected:
+            try:
+                if self.reliable:
+                    # Whatever we claimed but never finished goes back for the next owner
+                    for shard in range(self.num_shards):
+                        self.stats['requeued'] += await self.requeue(shard)
+                    await self.db.srem(self.workers_key, self.node_id)
+                for shard in self.owned:
+                    await self.release(shard)
+                await self.db.zrem(self.nodes_key, self.node_id)
+            except Exception as e:
+                logger.error(f"Error releasing frontier shards: {str(e)}")
+            self.owned = []
+        await super().close()
+
+class LocalFrontier:
+    """In-memory priority frontier: a max-heap with lazy score updates.
+
+    A rescored URL gets a fresh heap entry; stale entries are skipped when
+    they surface.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.heap: List[Tuple[float, int, str]] = []  # (-score, seq, url)
+        self.scores: Dict[str, float] = {}
+        self.depths: Dict[str, int] = {}
+        self.seq = 0
+        self.not_empty = asyncio.Condition()
+        print(f"Using local in-memory frontier: {name}")
+
+    def __len__(self):
+        return len(self.scores)
+
+    async def push(self, url: str, depth: int = 0, score: float = 1.0):
+        async with self.not_empty:
+            self.add(url, depth, score)
+            self.not_empty.notify()
+
+    def add(self, url: str, depth: int, score: float):
+        score += self.scores.get(url, 0.0)
+        self.scores[url] = score
+        self.depths.setdefault(url, depth)
+        self.seq += 1
+        heapq.heappush(self.heap, (-score, self.seq, url))
+
+    async def wait_for_items(self, timeout: float):
+        async with self.not_empty:
+            try:
+                await asyncio.wait_for(self.not_empty.wait_for(lambda: self.scores), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def pop_many(self, count: int, block: bool = False, timeout: float = 1) -> List[FrontierEntry]:
+        if block and not self.scores:
+            await self.wait_for_items(timeout)
+        entries = []
+        while self.heap and len(entries) < count:
+            neg_score, _, url = heapq.heappop(self.heap)
+            if self.scores.get(url) != -neg_score:
+                continue  # superseded by a later push of the same URL
+            del self.scores[url]
+            entries.append((url, self.depths.pop(url), -neg_score))
+        return entries
@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import copy
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+import redis
+
+import config.crawler_config as crawler_config
+from crawler.crawler import WebCrawler
+
+logger = logging.getLogger(__name__)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Distributed web crawler')
+    parser.add_argument('--start-url', action='append', dest='start_urls',
+                        help='URL to start crawling from (repeatable; defaults to START_URLS in the config)')
+    parser.add_argument('--max-pages', type=int, help='Pages to crawl, shared by the processes')
+    parser.add_argument('--workers', type=int, help='Concurrent fetch workers per process')
+    parser.add_argument('--processes', type=int,
+                        help='Crawler processes on this node (default: one per CPU core)')
+    parser.add_argument('--bloom-capacity', type=int, help='Initial Bloom filter capacity')
+    parser.add_argument('--bloom-error-rate', type=float, help='Target Bloom filter false positive rate')
+    parser.add_argument('--redis-host', help='Redis host')
+    parser.add_argument('--redis-port', type=int, help='Redis port')
+    parser.add_argument('--no-uvloop', action='store_true', help='Use the default asyncio event loop')
+    return parser.parse_args(argv)
+
+def build_config(args):
+    """CONFIG from config/crawler_config.py with the command line applied on top."""
+    config = copy.deepcopy(crawler_config.CONFIG)
+    if args.max_pages is not None:
+        config['max_urls'] = args.max_pages
+    if args.workers is not None:
+        config['num_workers'] = args.workers
+        config['max_in_flight'] = args.workers
+    if args.bloom_capacity is not None:
+        config['bloom_filter']['initial_capacity'] = args.bloom_capacity
+    if args.bloom_error_rate is not None:
+        config['bloom_filter']['error_rate'] = args.bloom_error_rate
+    if args.redis_host:
+        config['redis']['host'] = args.redis_host
+    if args.redis_port:
+        config['redis']['port'] = args.redis_port
+    launcher_config = config.setdefault('launcher', {})
+    if args.processes is not None:
+        launcher_config['processes'] = args.processes
+    if args.no_uvloop:
+        launcher_config['uvloop'] = False
+    return config
+
+def process_configs(config, processes):
+    """One config per process: its share of the parsers, its own checkpoint and metrics port.
+
+    Processes only cooperate through Redis, so with more than one the URL
+    dedup and robots.txt cache are switched to their shared backends, and
+    max_urls becomes one budget counted in Redis under budget_key: a
+    process that owns few or no frontier shards still stops when the
+    others have crawled enough.
+    """
+    max_urls = config.get('max_urls', 50)
+    processes = max(1, min(processes, max_urls))
+    frontier_config = config.get('frontier', {})
+    shards = frontier_config.get('shards', 1)
+    if (shards > 1 or frontier_config.get('reliable', False)) and processes > shards:
+        # Each shard is worked by one process; any beyond that would sit idle
+        print(f"The frontier has {shards} shards; starting {shards} processes instead of {processes}")
+        processes = shards
+    if processes == 1:
+        return [config]
+    if config.get('dedup', {}).get('backend', 'local') != 'redis':
+        print("Multiple processes share URL dedup through Redis; using the 'redis' dedup backend")
+    parse_workers = config.get('parse_pool', {}).get('workers')
+    checkpoint_name = config.get('checkpoint', {}).get('name', 'crawler')
+    configs = []
+    for index in range(processes):
+        process_config = copy.deepcopy(config)
+        process_config['budget_key'] = f'budget:{checkpoint_name}'
+        process_config.setdefault('dedup', {})['backend'] = 'redis'
+        process_config.setdefault('robots', {})['backend'] = 'redis'
+        # Crawler processes already fill the cores; split the parsers between them, but keep
+        # at least one each so parsing stays off the event loop (0 in the config still means inline)
+        workers = os.cpu_count() if parse_workers is None else parse_workers
+        process_config.setdefault('parse_pool', {})['workers'] = max(1, workers // processes) if workers else 0
+        metrics_config = process_config.setdefault('metrics', {})
+        if metrics_config.get('http_port'):
+            metrics_config['http_port'] += index
+        checkpoint_config = process_config.setdefault('checkpoint', {})
+        checkpoint_config['name'] = f"{checkpoint_name}-{index}"
+        configs.append(process_config)
+    return configs
+
+def budget_redis(config):
+    return redis.Redis(host=config['redis']['host'], port=config['redis']['port'], socket_connect_timeout=2)
+
+def reset_budget(config):
+    """Start the shared page count from zero unless checkpoints will resume the crawl it belongs to."""
+    if config.get('checkpoint', {}).get('enabled', False):
+        return
+    try:
+        budget_redis(config).delete(config['budget_key'])
+    except redis.RedisError as e:
+        logger.error(f"Error resetting the shared page budget: {str(e)}")
+
+def finish_budget(config):
+    """Drop the shared page count once it is spent, so the next run starts a fresh crawl."""
+    try:
+        client = budget_redis(config)
+        if int(client.get(config['budget_key']) or 0) >= config['max_urls']:
+            client.delete(config['budget_key'])
+    except redis.RedisError as e:
+        logger.error(f"Error clearing the shared page budget: {str(e)}")
+
+def install_uvloop(enabled=True):
+    if not enabled:
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+async def run_crawler(config, start_urls):
+    crawler = WebCrawler(config)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, crawler.stop)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C still interrupts, just without a drain
+    return await crawler.crawl(start_urls)
+
+def run_process(index, config, start_urls, results, use_uvloop=True):
+    """Body of one crawler process; puts (index, stats) on the results queue."""
+    install_uvloop(use_uvloop)
+    try:
+        results.put((index, asyncio.run(run_crawler(config, start_urls))))
+    except Exception as e:
+        logger.error(f"Crawler process {index} failed: {str(e)}")
+
+def aggregate(results):
+    totals = {}
+    for stats in results:
+        for field, value in stats.items():
+            totals[field] = totals.get(field, 0) + value
+    return totals
+
+def print_summary(totals, processes, elapsed):
+    print(f"\n=== Node Summary ({processes} processes) ===")
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"Pages crawled: {totals.get('crawled', 0)} ({totals.get('crawled', 0) / max(elapsed, 1e-9):.1f} pages/s)")
+    print(f"URL attempts: {totals.get('attempts', 0)}")
+    print(f"Duplicates: {totals.get('duplicates', 0)} (content duplicates: {totals.get('content_duplicates', 0)})")
+    print(f"Unchanged revisits: {totals.get('not_modified', 0)}")
+    print(f"Blocked by robots.txt: {totals.get('robots_blocked', 0)}")
+    print(f"Rejected by the fetcher: {totals.get('rejected', 0)}")
+    print(f"Deferred to a later run: {totals.get('deferred', 0)}")
+    print(f"Errors: {totals.get('errors', 0)}")
+
+def launch(configs, start_urls, use_uvloop=True):
+    """Run one crawler process per config and wait for all of them.
+
+    The first SIGINT/SIGTERM asks every process to drain and exit; a
+    second one kills them.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    procs = [context.Process(target=run_process, args=(index, config, start_urls, results, use_uvloop),
+                             name=f'crawler-{index}')
+             for index, config in enumerate(configs)]
+    signals = []
+
+    def forward(signum, frame):
+        signals.append(signum)
+        for proc in procs:
+            if not proc.is_alive():
+                continue
+            if len(signals) == 1:
+                os.kill(proc.pid, signal.SIGTERM)
+            else:
+                proc.kill()
+        if len(signals) == 1:
+            print("\nDraining crawler processes; signal again to kill them")
+
+    previous = {signum: signal.signal(signum, forward) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        for proc in procs:
+            proc.start()
+        collected = {}
+        while len(collected) < len(procs) and any(proc.is_alive() for proc in procs):
+            try:
+                index, stats = results.get(timeout=0.5)
+                collected[index] = stats
+            except queue.Empty:
+                continue
+        for proc in procs:
+            proc.join()
+        while not results.empty():
+            index, stats = results.get()
+            collected[index] = stats
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    for index, proc in enumerate(procs):
+        if index not in collected:
+            print(f"Crawler process {index} exited with code {proc.exitcode} without reporting stats")
+    return [collected[index] for index in sorted(collected)]
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = build_config(args)
+    launcher_config = config.get('launcher', {})
+    start_urls = args.start_urls or crawler_config.START_URLS
+    processes = launcher_config.get('processes') or os.cpu_count() or 1
+    use_uvloop = launcher_config.get('uvloop', True)
+    configs = process_configs(config, processes)
+    started = time.time()
+    if len(configs) == 1:
+        if install_uvloop(use_uvloop):
+            print("Using uvloop event loop")
+        try:
+            results = [asyncio.run(run_crawler(configs[0], start_urls))]
+        except KeyboardInterrupt:
+            logger.info("Crawler interrupted by user")
+            return 1
+    else:
+        print(f"Starting {len(configs)} crawler processes")
+        reset_budget(configs[0])
+        results = launch(configs, start_urls, use_uvloop)
+        finish_budget(configs[0])
+    print_summary(aggregate(results), len(configs), time.time() - started)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
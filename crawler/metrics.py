@@ -0,0 +1,232 @@
+import bisect
+import logging
+import time
+from typing import Dict, Tuple
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Seconds; from sub-millisecond Bloom checks up to slow downloads
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is one bisect and three adds.
+
+    With keep_samples every value is kept as well, so quantile() is exact;
+    the benchmarks use that, a long crawl should not.
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'samples')
+
+    def __init__(self, buckets=LATENCY_BUCKETS, keep_samples=False):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.samples = [] if keep_samples else None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if self.samples is not None:
+            self.samples.append(value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation, or the exact value with samples."""
+        if not self.count:
+            return 0.0
+        if self.samples is not None:
+            ordered = sorted(self.samples)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99)
+        }
+
+class Metrics:
+    """Counters, gauges and latency histograms for one crawler process.
+
+    Everything runs on the crawler's event loop, so updates are plain dict
+    and int operations with no locks. Timers on the hottest paths (Bloom
+    checks) go through sample(), which times one call in sample_every.
+    Collectors registered with add_collector() refresh gauges right before
+    an export. The process's numbers are served in Prometheus text format
+    on http_host:http_port/metrics when http_port is set.
+    """
+    def __init__(self, enabled=True, sample_every=10, flush_interval=10, http_host='127.0.0.1',
+                 http_port=None, max_hosts=50, prefix='crawler', keep_samples=False):
+        self.enabled = enabled
+        self.sample_every = max(1, sample_every)
+        self.flush_interval = flush_interval
+        self.http_host = http_host
+        self.http_port = http_port
+        self.max_hosts = max_hosts
+        self.prefix = prefix
+        self.keep_samples = keep_samples
+        self.counters: Dict[Tuple[str, tuple], float] = {}    # (name, labels) -> value
+        self.gauges: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self.collectors = []
+        self.ticks = 0
+        self.runner = None
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_counter(self, name, value, labels=()):
+        """Publish a total some component already counts."""
+        self.counters[(name, labels)] = value
+
+    def set_gauge(self, name, value, labels=()):
+        self.gauges[(name, labels)] = value
+
+    def observe(self, name, seconds, labels=()):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = Histogram(keep_samples=self.keep_samples)
+        histogram.observe(seconds)
+
+    def sample(self):
+        """perf_counter() for one call in sample_every, None for the rest."""
+        if not self.enabled:
+            return None
+        self.ticks += 1
+        if self.ticks % self.sample_every:
+            return None
+        return time.perf_counter()
+
+    def since(self, name, started, labels=()):
+        """Record the time since a sample() that was taken."""
+        if started is not None:
+            self.observe(name, time.perf_counter() - started, labels)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def collect(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {str(e)}")
+
+    def trace_config(self):
+        """aiohttp hooks timing DNS, connection setup and time to first byte."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def request_start(session, ctx, params):
+            ctx.started = time.perf_counter()
+
+        async def dns_start(session, ctx, params):
+            ctx.dns_started = time.perf_counter()
+
+        async def dns_end(session, ctx, params):
+            self.observe('dns_seconds', time.perf_counter() - ctx.dns_started)
+
+        async def connect_start(session, ctx, params):
+            ctx.connect_started = time.perf_counter()
+
+        async def connect_end(session, ctx, params):
+            self.observe('connect_seconds', time.perf_counter() - ctx.connect_started)
+
+        async def request_end(session, ctx, params):
+            # Fires once the response headers are in
+            self.observe('ttfb_seconds', time.perf_counter() - ctx.started)
+
+        trace_config.on_request_start.append(request_start)
+        trace_config.on_dns_resolvehost_start.append(dns_start)
+        trace_config.on_dns_resolvehost_end.append(dns_end)
+        trace_config.on_connection_create_start.append(connect_start)
+        trace_config.on_connection_create_end.append(connect_end)
+        trace_config.on_request_end.append(request_end)
+        return trace_config
+
+    def metric_name(self, name):
+        return f'{self.prefix}_{name}'
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = tuple(labels) + tuple(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+        return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+    def snapshot(self):
+        """All current values as plain dicts, as saved to Redis."""
+        self.collect()
+        key_name = lambda key: self.metric_name(key[0]) + self.format_labels(key[1])
+        return {
+            'timestamp': time.time(),
+            'counters': {key_name(key): value for key, value in self.counters.items()},
+            'gauges': {key_name(key): value for key, value in self.gauges.items()},
+            'histograms': {key_name(key): histogram.to_dict() for key, histogram in self.histograms.items()}
+        }
+
+    def render(self):
+        """Prometheus text exposition format."""
+        self.collect()
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for kind, values, suffix in (('counter', self.counters, '_total'), ('gauge', self.gauges, '')):
+            for (name, labels), value in sorted(values.items()):
+                name = self.metric_name(name) + suffix
+                header(name, kind)
+                lines.append(f'{name}{self.format_labels(labels)} {value}')
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            name = self.metric_name(name)
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{self.format_labels(labels, (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{self.format_labels(labels)} {histogram.sum}')
+            lines.append(f'{name}_count{self.format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        """Serve /metrics if an http_port is configured."""
+        if not self.enabled or not self.http_port or self.runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        try:
+            await web.TCPSite(self.runner, self.http_host, self.http_port).start()
+            print(f"Serving metrics on http://{self.http_host}:{self.http_port}/metrics")
+        except OSError as e:
+            logger.error(f"Could not serve metrics on port {self.http_port}: {str(e)}")
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from crawler.extractor import extract_page
+
+logger = logging.getLogger(__name__)
+
+def ignore_interrupt():
+    """Parsers leave Ctrl+C to the crawler process, which drains and then shuts them down."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def parse_text(html, encoding):
+    if isinstance(html, bytes):
+        html = html.decode(encoding, errors='replace')
+    return extract_page(html)
+
+def parse_shared(name, size, encoding):
+    """Parse a body the parent left in shared memory instead of pickling it."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Decode straight from the mapping; bytes(...) would copy the body once more
+        with shm.buf[:size] as view:
+            html = str(view, encoding, 'replace')
+    finally:
+        shm.close()
+    return extract_page(html)
+
+class ParsePool:
+    """Runs HTML parsing in worker processes so the event loop never stalls on CPU.
+
+    At most max_queue parses are outstanding; callers of parse() wait beyond
+    that, which throttles fetching to what the parsers can keep up with.
+    Bodies of shm_threshold bytes or more are handed over through shared
+    memory rather than pickled through the executor's pipe. With workers=0
+    pages are parsed inline on the event loop. With a Metrics object, the
+    time each parse takes once it has a parser is recorded as parse_seconds.
+    """
+    def __init__(self, workers=None, max_queue=None, shm_threshold=256 * 1024, metrics=None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_queue = max_queue or max(1, self.workers * 2)
+        self.shm_threshold = shm_threshold
+        self.metrics = metrics
+        self.executor = None
+        self.slots = None
+        self.stats = {
+            'parsed': 0,
+            'shared_memory': 0,
+            'errors': 0
+        }
+
+    def start(self):
+        if self.workers and self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=ignore_interrupt)
+            print(f"Parsing pages in {self.workers} worker processes")
+        self.slots = asyncio.Semaphore(self.max_queue)
+
+    async def parse(self, html, encoding='utf-8'):
+        """Parse a page (str or bytes) and return its ExtractedPage."""
+        if self.executor is None:
+            started = time.perf_counter()
+            if isinstance(html, bytes):
+                html = html.decode(encoding, errors='replace')
+            self.stats['parsed'] += 1
+            page = extract_page(html)
+            self.record(started)
+            return page
+
+        loop = asyncio.get_running_loop()
+        async with self.slots:
+            started = time.perf_counter()
+            try:
+                if len(html) < self.shm_threshold:
+                    page = await loop.run_in_executor(self.executor, parse_text, html, encoding)
+                else:
+                    page = await self.parse_shared(loop, html, encoding)
+                self.stats['parsed'] += 1
+                self.record(started)
+                return page
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error parsing page in worker: {str(e)}")
+                return None
+
+    def record(self, started):
+        if self.metrics is not None:
+            self.metrics.observe('parse_seconds', time.perf_counter() - started)
+
+    async def parse_shared(self, loop, html, encoding):
+        body = html if isinstance(html, bytes) else html.encode(encoding)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(body)))
+        try:
+            shm.buf[:len(body)] = body
+            self.stats['shared_memory'] += 1
+            return await loop.run_in_executor(self.executor, parse_shared, shm.name, len(body), encoding)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
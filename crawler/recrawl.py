@@ -0,0 +1,35 @@
+import time
+from typing import Optional
+
+class RecrawlPolicy:
+    """Adaptive revisit intervals from observed change frequency.
+
+    A page starts at initial_interval. Each revisit that finds it changed
+    shortens the interval by `speedup`; each one that finds it unchanged
+    (a 304 or the same content hash) stretches it by `backoff`. Pages that
+    change hourly end up checked hourly and static ones drift towards
+    max_interval. A claimed revisit that isn't rescheduled within claim_ttl
+    seconds (its node died) is handed out again.
+    """
+    def __init__(self, enabled: bool = False, initial_interval: float = 86400,
+                 min_interval: float = 3600, max_interval: float = 30 * 86400,
+                 backoff: float = 2.0, speedup: float = 0.5, batch_size: int = 50,
+                 poll_interval: float = 5, claim_ttl: float = 600):
+        self.enabled = enabled
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.speedup = speedup
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.claim_ttl = claim_ttl
+
+    def next_interval(self, interval: Optional[float], changed: bool) -> float:
+        if not interval:
+            return self.initial_interval
+        interval *= self.speedup if changed else self.backoff
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def next_due(self, interval: float) -> float:
+        return time.time() + interval
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_ROBOTS_BYTES = 512 * 1024  # RFC 9309 lets crawlers ignore anything past 500 KiB
+
+class RobotsRules:
+    """Allow/Disallow rules of the one robots.txt group that applies to us.
+
+    Rules are ordered most specific first, so the first match decides,
+    matching the longest-match precedence in RFC 9309 (Allow wins ties).
+    Plain prefixes are tested with str.startswith and only rules using
+    '*' or '$' get a regex. unreachable marks a robots.txt that couldn't be
+    fetched, which is neither an Allow nor a Disallow.
+    """
+    def __init__(self, rules: List[Tuple[bool, str]], crawl_delay: Optional[float] = None,
+                 unreachable: bool = False):
+        self.rules = sorted(rules, key=lambda rule: (len(rule[1]), rule[0]), reverse=True)
+        self.crawl_delay = crawl_delay
+        self.unreachable = unreachable
+        self.matchers = [(allow, self.compile(pattern)) for allow, pattern in self.rules]
+
+    @staticmethod
+    def compile(pattern: str):
+        if '*' not in pattern and not pattern.endswith('$'):
+            return pattern
+        anchored = pattern.endswith('$')
+        body = pattern[:-1] if anchored else pattern
+        regex = '.*'.join(re.escape(part) for part in body.split('*'))
+        return re.compile(regex + ('$' if anchored else '')).match
+
+    def allowed(self, path: str) -> bool:
+        for allow, matcher in self.matchers:
+            if matcher.__class__ is str:
+                if path.startswith(matcher):
+                    return allow
+            elif matcher(path):
+                return allow
+        return True
+
+    def to_json(self) -> str:
+        return json.dumps({'rules': self.rules, 'crawl_delay': self.crawl_delay, 'unreachable': self.unreachable})
+
+    @classmethod
+    def from_json(cls, data) -> 'RobotsRules':
+        parsed = json.loads(data)
+        return cls([tuple(rule) for rule in parsed['rules']], parsed.get('crawl_delay'),
+                   parsed.get('unreachable', False))
+
+ALLOW_ALL = RobotsRules([])
+DISALLOW_ALL = RobotsRules([(False, '/')])
+UNREACHABLE = RobotsRules([(False, '/')], unreachable=True)
+
+PRODUCT_TOKEN = re.compile(r'[a-z_-]*')
+
+def product_token(user_agent: str) -> str:
+    """The leading product token of a User-Agent ('MyBot/1.0 (+url)' -> 'mybot'), lowercased."""
+    return PRODUCT_TOKEN.match(user_agent.strip().lower()).group(0)
+
+def parse_robots(text: str, user_agent: str) -> RobotsRules:
+    """Pick the group for user_agent (falling back to '*') out of a robots.txt."""
+    agent = product_token(user_agent)
+    groups = {}  # user-agent token -> (rules, crawl delay)
+    current = []
+    in_agents = False
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, _, value = line.partition(':')
+        field = field.strip().lower()
+        value = value.strip()
+        if field == 'user-agent':
+            if not in_agents:
+                current = []
+                in_agents = True
+            group = groups.setdefault('*' if value.startswith('*') else product_token(value), ([], []))
+            current.append(group)
+            continue
+        in_agents = False
+        for rules, delays in current:
+            if field in ('allow', 'disallow') and value:
+                rules.append((field == 'allow', value))
+            elif field == 'crawl-delay':
+                try:
+                    delays.append(float(value))
+                except ValueError:
+                    pass
+
+    # Our product token's group if there is one (RFC 9309 matches it case-insensitively), else '*'
+    token = agent if agent and agent in groups else '*'
+    if token not in groups:
+        return ALLOW_ALL
+    rules, delays = groups[token]
+    return RobotsRules(rules, delays[0] if delays else None)
+
+class RobotsCache:
+    """Fetches robots.txt once per origin and answers allow/disallow per URL.
+
+    Parsed rules live in a local LRU and, when a Redis client is given, in
+    Redis under key:<origin> with a TTL so one node's fetch serves all of
+    them. Concurrent lookups of a new origin share one fetch. Per RFC 9309
+    a missing robots.txt (4xx) allows everything and nothing is fetched
+    from an origin whose robots.txt is unreachable (5xx or network error).
+    That isn't a Disallow: allowed() answers None, so callers can put the
+    URL off until the robots.txt is tried again after error_ttl seconds.
+    """
+    def __init__(self, enabled: bool = True, user_agent: str = 'DistributedCrawler',
+                 ttl: float = 86400, error_ttl: float = 600, cache_size: int = 10000,
+                 max_crawl_delay: float = 60, backend: str = 'local', key: str = 'robots'):
+        self.enabled = enabled
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.cache_size = cache_size
+        self.max_crawl_delay = max_crawl_delay
+        self.backend = backend
+        self.key = key
+        self.session = None
+        self.redis = None
+        self.on_crawl_delay = None  # called with (netloc, seconds) when rules are loaded
+        self.cache = OrderedDict()  # origin -> (expires, RobotsRules)
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            'fetched': 0,
+            'redis_hits': 0,
+            'cache_hits': 0,
+            'errors': 0,
+            'unreachable': 0,  # lookups put off because robots.txt couldn't be fetched
+            'blocked': 0
+        }
+
+    def connect(self, session, client=None, on_crawl_delay=None):
+        self.session = session
+        self.redis = client if self.backend == 'redis' else None
+        self.on_crawl_delay = on_crawl_delay
+
+    @staticmethod
+    def split(url: str) -> Tuple[str, str, str]:
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        return f'{parts.scheme}://{parts.netloc}', parts.netloc, path
+
+    def cached_rules(self, origin: str) -> Optional[RobotsRules]:
+        entry = self.cache.get(origin)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self.cache[origin]
+            return None
+        self.cache.move_to_end(origin)
+        return entry[1]
+
+    def remember(self, origin: str, netloc: str, rules: RobotsRules, ttl: float):
+        self.cache[origin] = (time.time() + ttl, rules)
+        self.cache.move_to_end(origin)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        if rules.crawl_delay and self.on_crawl_delay:
+            self.on_crawl_delay(netloc, min(rules.crawl_delay, self.max_crawl_delay))
+
+    def known_allowed(self, url: str) -> Optional[bool]:
+        """Answer from the local cache only; None when the origin's rules aren't loaded or reachable."""
+        if not self.enabled:
+            return True
+        origin, _, path = self.split(url)
+        rules = self.cached_rules(origin)
+        return None if rules is None or rules.unreachable else rules.allowed(path)
+
+    def retry_after(self, url: str) -> float:
+        """Seconds until the origin's robots.txt is fetched again."""
+        entry = self.cache.get(self.split(url)[0])
+        return max(entry[0] - time.time(), 0) if entry else 0
+
+    async def allowed(self, url: str) -> Optional[bool]:
+        """Whether robots.txt lets us fetch url; None while the origin's robots.txt is unreachable."""
+        if not self.enabled:
+            return True
+        origin, netloc, path = self.split(url)
+        rules = self.cached_rules(origin)
+        if rules is None:
+            rules = await self.load(origin, netloc)
+        else:
+            self.stats['cache_hits'] += 1
+        if rules.unreachable:
+            self.stats['unreachable'] += 1
+            return None
+        if rules.allowed(path):
+            return True
+        self.stats['blocked'] += 1
+        return False
+
+    async def load(self, origin: str, netloc: str) -> RobotsRules:
+        future = self.pending.get(origin)
+        if future is None:
+            future = asyncio.ensure_future(self.load_uncached(origin, netloc))
+            self.pending[origin] = future
+            future.add_done_callback(lambda _: self.pending.pop(origin, None))
+        return await asyncio.shield(future)
+
+    async def load_uncached(self, origin: str, netloc: str) -> RobotsRules:
+        redis_key = f'{self.key}:{origin}'
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.get(redis_key)
+                pipe.ttl(redis_key)
+                data, ttl = await pipe.execute()
+                if data:
+                    self.stats['redis_hits'] += 1
+                    rules = RobotsRules.from_json(data)
+                    self.remember(origin, netloc, rules, ttl if ttl > 0 else self.ttl)
+                    return rules
+            except Exception as e:
+                logger.error(f"Error reading robots rules for {origin}: {str(e)}")
+
+        rules, ttl = await self.fetch(origin)
+        self.remember(origin, netloc, rules, ttl)
+        if self.redis is not None:
+            try:
+                await self.redis.set(redis_key, rules.to_json(), ex=int(ttl))
+            except Exception as e:
+                logger.error(f"Error caching robots rules for {origin}: {str(e)}")
+        return rules
+
+    async def fetch(self, origin: str) -> Tuple[RobotsRules, float]:
+        self.stats['fetched'] += 1
+        try:
+            async with self.session.get(f'{origin}/robots.txt',
+                                        headers={'User-Agent': self.user_agent}) as response:
+                if 400 <= response.status < 500:
+                    return ALLOW_ALL, self.ttl
+                if response.status != 200:
+                    self.stats['errors'] += 1
+                    return UNREACHABLE, self.error_ttl
+                # read(n) returns whatever is buffered, so collect chunks up to the cap
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(65536):
+                    body += chunk
+                    if len(body) >= MAX_ROBOTS_BYTES:
+                        del body[MAX_ROBOTS_BYTES:]
+                        break
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Error fetching robots.txt for {origin}: {str(e)}")
+            return UNREACHABLE, self.error_ttl
+        return parse_robots(body.decode('utf-8', errors='replace'), self.user_agent), self.ttl
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, cached=len(self.cache))
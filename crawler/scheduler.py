@@ -1,65 +1,141 @@
 import asyncio
-import random
-from datetime import datetime, timedelta
+import heapq
+import time
 import logging
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from urllib.parse import urlparse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class CrawlScheduler:
+    """Per-host politeness scheduler.
+
+    Each host has its own max-heap of URLs by priority score (FIFO among
+    equal scores). Hosts that have work and a free connection slot sit in a
+    min-heap ordered by the time they may next be fetched, so picking the
+    next URL is O(log hosts + log URLs of that host). A host's delay runs
+    from when its last fetch finished: an entry queued earlier is re-keyed
+    when it reaches the top of the heap, even with max_per_host > 1.
+    """
     def __init__(self, config: Dict):
         self.config = config
-        self.url_queue = asyncio.Queue()
+        self.host_queues: Dict[str, List[Tuple[float, int, str, int]]] = {}  # host -> heap of (-score, seq, url, depth)
+        self.ready_heap: List[Tuple[float, int, str]] = []  # (next_allowed, seq, host)
+        self.in_heap = set()
+        self.next_allowed: Dict[str, float] = {}  # host -> monotonic timestamp
+        self.host_in_flight: Dict[str, int] = {}
+        self.host_delays: Dict[str, float] = {}  # per-host overrides, e.g. robots.txt Crawl-delay
         self.pending_urls = set()
-        self.last_crawled = {}  # URL -> timestamp
         self.rate_limit = config.get('crawl_delay', 1.0)
         self.max_depth = config.get('max_depth', 5)
+        self.max_per_host = config.get('max_per_host', 1)
+        self.wakeup = asyncio.Event()
+        self.seq = 0
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def get_delay(self, host: str) -> float:
+        return self.host_delays.get(host, self.rate_limit)
+
+    def set_crawl_delay(self, host: str, delay: float):
+        """Override the delay between requests for one host."""
+        self.host_delays[host.lower()] = delay
 
     def is_rate_limited(self, url: str) -> bool:
-        """Check if URL is rate limited."""
-        if url not in self.last_crawled:
-            return False
-        
-        elapsed = datetime.now() - self.last_crawled[url]
-        return elapsed.total_seconds() < self.rate_limit
+        """Check if the URL's host may not be fetched right now."""
+        host = self.get_host(url)
+        if self.host_in_flight.get(host, 0) >= self.max_per_host:
+            return True
+        return self.next_allowed.get(host, 0) > time.monotonic()
 
-    def schedule_url(self, url: str, depth: int = 0) -> bool:
-        """Schedule a URL for crawling."""
+    def push_host(self, host: str):
+        """Put a host on the ready heap if it has work and a free slot."""
+        if host in self.in_heap or not self.host_queues.get(host):
+            return
+        if self.host_in_flight.get(host, 0) >= self.max_per_host:
+            return
+        self.seq += 1
+        heapq.heappush(self.ready_heap, (self.next_allowed.get(host, 0), self.seq, host))
+        self.in_heap.add(host)
+        self.wakeup.set()
+
+    def schedule_url(self, url: str, depth: int = 0, score: float = 0.0) -> bool:
+        """Schedule a URL for crawling; higher scores of a host go first."""
         if depth > self.max_depth:
             return False
 
         if url in self.pending_urls:
             return False
 
-        if self.is_rate_limited(url):
-            return False
-
+        host = self.get_host(url)
         self.pending_urls.add(url)
-        self.url_queue.put_nowait((url, depth))
+        self.seq += 1
+        heapq.heappush(self.host_queues.setdefault(host, []), (-score, self.seq, url, depth))
+        self.push_host(host)
         return True
 
-    async def get_next_url(self) -> str:
-        """Get next URL to crawl."""
+    async def get_next_url(self) -> Tuple[str, int, float]:
+        """Wait for and return (url, depth, score) of the next URL whose host is ready."""
         while True:
+            timeout = None
+            if self.ready_heap:
+                ready_at, _, host = self.ready_heap[0]
+                allowed_at = self.next_allowed.get(host, 0)
+                if ready_at < allowed_at:
+                    # Queued before a later fetch finished or the host was deferred; re-key it
+                    self.seq += 1
+                    heapq.heapreplace(self.ready_heap, (allowed_at, self.seq, host))
+                    continue
+                now = time.monotonic()
+                if ready_at <= now:
+                    heapq.heappop(self.ready_heap)
+                    self.in_heap.discard(host)
+                    queue = self.host_queues[host]
+                    neg_score, _, url, depth = heapq.heappop(queue)
+                    if not queue:
+                        del self.host_queues[host]
+                    self.pending_urls.discard(url)
+                    self.host_in_flight[host] = self.host_in_flight.get(host, 0) + 1
+                    self.next_allowed[host] = now + self.get_delay(host)
+                    self.push_host(host)
+                    return url, depth, -neg_score
+                timeout = ready_at - now
+            # Sleep until the earliest host is ready or new work arrives
+            self.wakeup.clear()
             try:
-                url, depth = await self.url_queue.get()
-                self.url_queue.task_done()
-                self.pending_urls.remove(url)
-                return url, depth
-            except asyncio.QueueEmpty:
-                await asyncio.sleep(0.1)
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def defer_host(self, host: str, seconds: float):
+        """Hand out no URL of host for the next `seconds`."""
+        host = host.lower()
+        self.next_allowed[host] = max(self.next_allowed.get(host, 0), time.monotonic() + seconds)
 
     def update_last_crawled(self, url: str):
-        """Update last crawled timestamp for URL."""
-        self.last_crawled[url] = datetime.now()
+        """Mark a fetch of the URL as finished so its host can be fetched again."""
+        host = self.get_host(url)
+        in_flight = self.host_in_flight.get(host, 0) - 1
+        if in_flight > 0:
+            self.host_in_flight[host] = in_flight
+        else:
+            self.host_in_flight.pop(host, None)
+        # Measure the politeness delay from when the response finished
+        self.next_allowed[host] = max(self.next_allowed.get(host, 0),
+                                      time.monotonic() + self.get_delay(host))
+        self.push_host(host)
 
     def get_stats(self) -> Dict:
         """Get scheduler statistics."""
         return {
             'pending_urls': len(self.pending_urls),
-            'url_queue_size': self.url_queue.qsize(),
-            'last_crawled_count': len(self.last_crawled)
+            'queued_hosts': len(self.host_queues),
+            'ready_hosts': len(self.ready_heap),
+            'in_flight': sum(self.host_in_flight.values()),
+            'last_crawled_count': len(self.next_allowed)
         }
 
 async def main():
@@ -71,18 +147,19 @@ async def main():
     scheduler = CrawlScheduler(config)
 
     # Schedule some URLs
-    start_urls = ['https://example.com']
+    start_urls = [
+        'https://example.com',
+        'https://example.com/about',
+        'https://example.org'
+    ]
     for url in start_urls:
         scheduler.schedule_url(url)
 
     # Get next URL
-    while True:
-        try:
-            url, depth = await scheduler.get_next_url()
-            print(f"Processing URL: {url} (depth: {depth})")
-            scheduler.update_last_crawled(url)
-        except asyncio.QueueEmpty:
-            break
+    while scheduler.pending_urls:
+        url, depth, score = await scheduler.get_next_url()
+        print(f"Processing URL: {url} (depth: {depth})")
+        scheduler.update_last_crawled(url)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,17 +1,18 @@
 import re
-from urllib.parse import urlparse
+from urllib.parse import urljoin, urlparse
 import logging
 from typing import List, Dict, Optional
+from crawler.extractor import extract_page
+from crawler.canonical import UrlCanonicalizer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def normalize_url(url: str) -> str:
-    """Normalize URL by removing fragments and query parameters."""
-    parsed = urlparse(url)
-    normalized = parsed._replace(fragment='')
-    normalized = normalized._replace(query='')
-    return normalized.geturl()
+default_canonicalizer = UrlCanonicalizer()
+
+def normalize_url(url: str, base_url: Optional[str] = None) -> Optional[str]:
+    """Normalize URL to its canonical form (see crawler.canonical), or None if it isn't crawlable."""
+    return default_canonicalizer.canonicalize(url, base_url)
 
 def extract_domain(url: str) -> str:
     """Extract domain from URL."""
@@ -28,47 +29,20 @@ def is_valid_url(url: str) -> bool:
 
 def extract_links(html: str, base_url: str) -> List[str]:
     """Extract all links from HTML content."""
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html, 'html.parser')
+    page = extract_page(html)
+    if page.base_href:
+        base_url = urljoin(base_url, page.base_href)
     links = []
-    for link in soup.find_all('a'):
-        href = link.get('href')
-        if href:
-            full_url = urljoin(base_url, href)
-            if is_valid_url(full_url):
-                links.append(full_url)
+    for href in page.links:
+        full_url = normalize_url(href, base_url)
+        if full_url and is_valid_url(full_url):
+            links.append(full_url)
     return links
 
 def get_page_title(html: str) -> Optional[str]:
     """Extract page title from HTML."""
-    from bs4 import BeautifulSoup
-    try:
-        soup = BeautifulSoup(html, 'html.parser')
-        title = soup.title.string if soup.title else None
-        return title.strip() if title else None
-    except:
-        return None
+    return extract_page(html).title
 
 def get_page_content(html: str) -> str:
     """Extract main content from HTML."""
-    from bs4 import BeautifulSoup
-    try:
-        soup = BeautifulSoup(html, 'html.parser')
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text
-        text = soup.get_text()
-        
-        # Break into lines and remove leading and trailing space on each
-        lines = (line.strip() for line in text.splitlines())
-        
-        # Break multi-headlines into a line each
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        
-        # Drop blank lines
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        return text
-    except:
-        return ''
+    return extract_page(html).text
@@ -1,18 +1,34 @@
+"""Plot measured false positive rates from a Bloom filter benchmark run.
+
+    python -m benchmarks.bench_bloom --json bloom.json
+    python fpr.py bloom.json
+"""
+import json
+import sys
+
 import matplotlib.pyplot as plt
 
-# Example data
-url_counts = [10000, 20000, 40000, 60000, 80000, 100000]
-fixed_fpr = [0.01, 0.025, 0.045, 0.07, 0.11, 0.16]     # Example: FPR rises with more URLs
-adaptive_fpr = [0.01, 0.012, 0.015, 0.017, 0.019, 0.021] # Example: Adaptive stays low
+path = sys.argv[1] if len(sys.argv) > 1 else 'bloom.json'
+with open(path) as f:
+    data = json.load(f)
+data = data.get('bloom', data)  # benchmarks.run_all nests the Bloom results
+
+series = {}
+for entry in data['results']:
+    if 'fpr' in entry:
+        series.setdefault(entry['filter'], []).append((entry['urls'], entry['fpr']))
 
 plt.figure(figsize=(6,4))
-plt.plot(url_counts, fixed_fpr, marker='o', label='Fixed Bloom Filter')
-plt.plot(url_counts, adaptive_fpr, marker='s', label='Adaptive Bloom Filter')
+for name, points in series.items():
+    url_counts, fprs = zip(*sorted(points))
+    plt.plot(url_counts, fprs, marker='o', label=name)
+plt.axhline(data['params']['error_rate'], color='grey', linestyle='--', label='target error rate')
+plt.xscale('log')
 plt.xlabel('Number of Unique URLs')
-plt.ylabel('False Positive Rate')
-plt.title('False Positive Rate Comparison')
+plt.ylabel('Measured False Positive Rate')
+plt.title(f"False Positive Rate (capacity {data['params']['capacity']})")
 plt.legend()
 plt.grid(True)
 plt.tight_layout()
 plt.savefig('fpr_comparison.png', dpi=300)
-plt.show()
\ No newline at end of file
+plt.show()
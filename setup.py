@@ -10,12 +10,18 @@ setup(
         'python-memcached==1.59',
         'redis==5.0.1',
         'pybloom-live==2.3.1',
+        'numpy==1.26.2',
         'python-dotenv==1.0.0',
         'aiohttp==3.9.1'
     ],
+    extras_require={
+        'zstd': ['zstandard==0.22.0'],
+        'uvloop': ['uvloop==0.19.0'],
+        'test': ['pytest', 'fakeredis']
+    },
     entry_points={
         'console_scripts': [
-            'crawler=crawler.crawler:main'
+            'crawler=crawler.launcher:main'
         ]
     }
 )
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+# Failures worth retrying the whole batch for; anything else is down to one of its operations
+RETRYABLE_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)
+
+logger = logging.getLogger(__name__)
+
+class RecordedCommands:
+    """Stands in for a pipeline and remembers the commands queued on it.
+
+    A failed batch is retried by replaying what its operations queued the
+    first time, not by calling them again: operations aren't idempotent
+    (write_page pops newly trained dictionaries and counts pages).
+    """
+    def __init__(self):
+        self.commands = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return record
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __call__(self, pipe):
+        for name, args, kwargs in self.commands:
+            getattr(pipe, name)(*args, **kwargs)
+
+class BatchWriter:
+    """Write-behind buffer that sends Redis commands in pipelined batches.
+
+    Callers submit operations, callables that queue commands on a pipeline.
+    The buffer is flushed as one non-transactional pipeline when it reaches
+    batch_size or every flush_interval seconds, whichever comes first.
+    Submitters wait for a flush when max_buffer operations are pending.
+    A batch that can't reach Redis goes back to the head of the buffer and
+    is retried with exponential backoff (close() gives up after
+    close_retries); an operation that raises, or whose commands Redis
+    rejects, is dropped on its own.
+    With a Metrics object each flush's round trip is recorded under name.
+    """
+    def __init__(self, client, batch_size=100, flush_interval=0.05, max_buffer=5000,
+                 retry_backoff=0.1, max_backoff=5.0, close_retries=5, metrics=None, name='writes'):
+        self.client = client
+        self.metrics = metrics
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.close_retries = close_retries
+        self.buffer = []  # (operation, on_flushed) in submission order
+        self.failures = 0  # consecutive failed flushes
+        self.flush_lock = asyncio.Lock()
+        self.batch_ready = asyncio.Event()
+        self.flusher = None
+        self.closing = False
+        self.stats = {
+            'submitted': 0,
+            'flushes': 0,
+            'retries': 0,
+            'failed': 0,
+            'backpressure_waits': 0
+        }
+
+    async def start(self):
+        """Start the background flush task."""
+        if self.flusher is None:
+            self.flusher = asyncio.create_task(self.run())
+
+    async def run(self):
+        while not self.closing:
+            try:
+                await asyncio.wait_for(self.batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.batch_ready.clear()
+            if not await self.flush():
+                await asyncio.sleep(self.backoff_delay())
+
+    def backoff_delay(self):
+        return min(self.retry_backoff * 2 ** max(self.failures - 1, 0), self.max_backoff)
+
+    async def submit(self, operation, on_flushed=None):
+        """Buffer an operation that takes a pipeline and queues commands on it.
+
+        on_flushed, if given, is called with no arguments once the operation
+        has reached Redis.
+        """
+        if len(self.buffer) >= self.max_buffer:
+            # Back-pressure: the caller pays for the flush it is waiting on
+            self.stats['backpressure_waits'] += 1
+            if not await self.flush():
+                await asyncio.sleep(self.backoff_delay())
+        self.buffer.append((operation, on_flushed))
+        self.stats['submitted'] += 1
+        if len(self.buffer) >= self.batch_size:
+            self.batch_ready.set()
+
+    async def flush(self):
+        """Send everything buffered so far in one pipelined round trip.
+
+        Returns False if Redis couldn't be reached; the batch is then back
+        at the head of the buffer.
+        """
+        async with self.flush_lock:
+            if not self.buffer:
+                return True
+            batch, self.buffer = self.buffer, []
+            recorded = self.record(batch)
+            try:
+                self.finish(recorded, await self.send(recorded))
+            except RETRYABLE_ERRORS as e:
+                return self.retry_later(recorded, e)
+            except Exception as e:
+                # Something can't be sent at all (an unencodable value, say); send one at a time to drop just that
+                logger.error(f"Error flushing {len(recorded)} buffered writes, sending them one by one: {str(e)}")
+                for index, entry in enumerate(recorded):
+                    try:
+                        self.finish([entry], await self.send([entry]))
+                    except RETRYABLE_ERRORS as e:
+                        return self.retry_later(recorded[index:], e)
+                    except Exception as e:
+                        self.stats['failed'] += 1
+                        logger.error(f"Error in a buffered write: {str(e)}")
+            return True
+
+    def record(self, batch):
+        """Run each new operation against a RecordedCommands; one that raises is dropped alone."""
+        recorded = []
+        for operation, on_flushed in batch:
+            if not isinstance(operation, RecordedCommands):
+                commands = RecordedCommands()
+                try:
+                    operation(commands)
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    logger.error(f"Error queueing a buffered write: {str(e)}")
+                    continue
+                operation = commands
+            recorded.append((operation, on_flushed))
+        return recorded
+
+    async def send(self, recorded):
+        pipe = self.client.pipeline(transaction=False)
+        for commands, _ in recorded:
+            commands(pipe)
+        started = time.perf_counter()
+        results = await self.execute(pipe)
+        if self.metrics is not None:
+            self.metrics.observe('redis_pipeline_seconds', time.perf_counter() - started,
+                                 (('writer', self.name),))
+        return results
+
+    def finish(self, recorded, results):
+        """Run the callbacks of the operations whose commands all succeeded."""
+        self.failures = 0
+        self.stats['flushes'] += 1
+        position = 0
+        for commands, on_flushed in recorded:
+            errors = [r for r in results[position:position + len(commands)] if isinstance(r, Exception)]
+            position += len(commands)
+            if errors:
+                # Redis rejected a command; sending it again won't change that
+                self.stats['failed'] += 1
+                logger.error(f"Error in a buffered write: {str(errors[0])}")
+            elif on_flushed is not None:
+                try:
+                    on_flushed()
+                except Exception as e:
+                    logger.error(f"Error in a write callback: {str(e)}")
+
+    def retry_later(self, recorded, error):
+        # Keep the batch, in order, ahead of anything submitted meanwhile
+        self.buffer = recorded + self.buffer
+        self.failures += 1
+        self.stats['retries'] += 1
+        logger.error(f"Error flushing {len(recorded)} buffered writes, retrying in "
+                     f"{self.backoff_delay():.1f}s: {str(error)}")
+        return False
+
+    async def execute(self, pipe):
+        if asyncio.iscoroutinefunction(pipe.execute):
+            return await pipe.execute(raise_on_error=False)
+        # The sync client would block the event loop, so run it on a thread
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: pipe.execute(raise_on_error=False))
+
+    async def close(self):
+        """Stop the flush task and write out anything still buffered, retrying a few times."""
+        self.closing = True
+        if self.flusher is not None:
+            self.batch_ready.set()
+            await self.flusher
+            self.flusher = None
+        for attempt in range(self.close_retries + 1):
+            if await self.flush():
+                return
+            if attempt < self.close_retries:
+                await asyncio.sleep(self.backoff_delay())
+        self.stats['failed'] += len(self.buffer)
+        logger.error(f"Gave up on {len(self.buffer)} buffered writes after {self.close_retries} retries")
+        self.buffer = []
@@ -0,0 +1,131 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is used instead
+    zstandard = None
+
+class PageCompressor:
+    """Compresses page bodies for storage.
+
+    Uses zstd when the zstandard package is installed and zlib otherwise.
+    With dictionaries enabled, the first train_samples pages of each domain
+    are used to train a shared zstd dictionary, which is then used for all
+    later pages of that domain. Small pages from one site share most of
+    their markup, so a dictionary often doubles the ratio. New dictionaries
+    are handed to storage through pop_new_dictionaries() so every node can
+    decompress with them. With train_later set, domains that have enough
+    samples wait in `ready` so the caller can run train() off the event loop.
+    """
+    def __init__(self, codec='zstd', level=3, dictionaries=True, dict_size=65536,
+                 train_samples=50, sample_bytes=16384, max_training_domains=100):
+        if codec == 'zstd' and zstandard is None:
+            print("zstandard is not installed; compressing pages with zlib instead.")
+            codec = 'zlib'
+        self.codec = codec
+        self.level = level
+        self.dictionaries = dictionaries and codec == 'zstd'
+        self.dict_size = dict_size
+        self.train_samples = train_samples
+        self.sample_bytes = sample_bytes
+        self.max_training_domains = max_training_domains
+        self.samples = {}       # domain -> sample bodies collected for training
+        self.domain_dicts = {}  # domain -> ZstdCompressionDict, or None once it stops sampling
+        self.loaded_dicts = {}  # dict_id (str) -> ZstdCompressionDict
+        self.compressors = {}   # dict_id or None -> ZstdCompressor
+        self.new_dictionaries = []
+        self.train_later = False
+        self.ready = []         # (domain, samples) waiting for train() when train_later is set
+        self.stats = {
+            'pages': 0,
+            'raw_bytes': 0,
+            'stored_bytes': 0,
+            'dictionaries': 0
+        }
+
+    def compress(self, domain, body):
+        """Return (stored bytes, metadata fields describing how to decompress them)."""
+        if self.codec == 'zstd':
+            zdict = self.domain_dicts.get(domain) if self.dictionaries else None
+            if self.dictionaries and domain not in self.domain_dicts:
+                self.add_sample(domain, body)
+            data = self.get_compressor(zdict).compress(body)
+            metadata = {'codec': 'zstd'}
+            if zdict is not None:
+                metadata['dict_id'] = str(zdict.dict_id())
+        elif self.codec == 'zlib':
+            data = zlib.compress(body, self.level)
+            metadata = {'codec': 'zlib'}
+        else:
+            data = body
+            metadata = {'codec': 'none'}
+        self.stats['pages'] += 1
+        self.stats['raw_bytes'] += len(body)
+        self.stats['stored_bytes'] += len(data)
+        return data, metadata
+
+    def get_compressor(self, zdict):
+        key = zdict.dict_id() if zdict is not None else None
+        if key not in self.compressors:
+            self.compressors[key] = zstandard.ZstdCompressor(level=self.level, dict_data=zdict)
+        return self.compressors[key]
+
+    def add_sample(self, domain, body):
+        if domain not in self.samples and len(self.samples) >= self.max_training_domains:
+            return
+        samples = self.samples.setdefault(domain, [])
+        samples.append(body[:self.sample_bytes])
+        if len(samples) < self.train_samples:
+            return
+        del self.samples[domain]
+        self.domain_dicts[domain] = None  # sampled once; a failed training isn't retried
+        if self.train_later:
+            self.ready.append((domain, samples))
+        else:
+            self.add_dictionary(domain, self.train(samples))
+
+    def train(self, samples):
+        """Train a dictionary on a domain's samples; None if there is too little to learn from."""
+        try:
+            return zstandard.train_dictionary(self.dict_size, samples)
+        except zstandard.ZstdError:
+            return None
+
+    def add_dictionary(self, domain, zdict):
+        if zdict is None:
+            return
+        dict_id = str(zdict.dict_id())
+        self.domain_dicts[domain] = zdict
+        self.loaded_dicts[dict_id] = zdict
+        self.new_dictionaries.append((dict_id, zdict.as_bytes()))
+        self.stats['dictionaries'] += 1
+
+    def pop_new_dictionaries(self):
+        """Dictionaries trained since the last call, as (dict_id, bytes) to persist."""
+        new, self.new_dictionaries = self.new_dictionaries, []
+        return new
+
+    def has_dictionary(self, dict_id):
+        return dict_id in self.loaded_dicts
+
+    def load_dictionary(self, dict_id, data):
+        self.loaded_dicts[dict_id] = zstandard.ZstdCompressionDict(data)
+
+    def decompress(self, data, codec, dict_id=None):
+        if data is None or codec in (None, 'none'):
+            return data
+        if codec == 'zlib':
+            return zlib.decompress(data)
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed pages")
+        zdict = self.loaded_dicts.get(dict_id) if dict_id else None
+        return zstandard.ZstdDecompressor(dict_data=zdict).decompress(data)
+
+    def get_stats(self):
+        stored = self.stats['stored_bytes']
+        return dict(
+            self.stats,
+            codec=self.codec,
+            compression_ratio=self.stats['raw_bytes'] / stored if stored else 0,
+            bytes_saved=self.stats['raw_bytes'] - stored
+        )
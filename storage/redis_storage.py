@@ -1,30 +1,186 @@
+import asyncio
 import redis
+import redis.asyncio as aioredis
 import json
+import hashlib
 from datetime import datetime
 import os
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
+from storage.compression import PageCompressor
 
 load_dotenv()
 
+async_pools = {}
+
+def get_async_pool(host, port, decode_responses=False):
+    """Return the shared redis.asyncio connection pool for host:port."""
+    key = (host, int(port), decode_responses)
+    if key not in async_pools:
+        async_pools[key] = aioredis.ConnectionPool(
+            host=host,
+            port=int(port),
+            db=0,
+            decode_responses=decode_responses,
+            socket_connect_timeout=2
+        )
+    return async_pools[key]
+
+async def close_async_pools():
+    """Disconnect every shared async connection pool."""
+    for pool in async_pools.values():
+        await pool.disconnect()
+    async_pools.clear()
+
 class RedisStorage:
-    def __init__(self):
+    """Pages as a metadata hash plus a compressed body, keyed by URL hash.
+
+    Bodies stay bytes end to end (no decode_responses round trip) and are
+    only decompressed when a page is read back.
+    """
+    validator_fields = ('etag', 'last_modified', 'content_hash', 'recrawl_interval', 'depth', 'score')
+
+    def __init__(self, compression=None):
         self.redis = redis.Redis(
             host=os.getenv('REDIS_HOST', 'localhost'),
             port=int(os.getenv('REDIS_PORT', 6379)),
-            decode_responses=True
+            decode_responses=False
         )
-        self.page_key = 'pages'
+        self.setup(compression)
+
+    def setup(self, compression=None):
+        """Key layout and compressor, shared by the sync and async storage."""
+        self.page_key = 'pages'  # legacy list of JSON pages, see migrate_legacy_pages
+        self.meta_prefix = 'page:meta:'
+        self.body_prefix = 'page:body:'
+        self.dict_prefix = 'page:dict:'
+        self.compression_key = 'page:compression'
+        self.recrawl_key = 'page:recrawl'  # sorted set of URLs scored by next revisit time
+        self.recrawl_claims_key = 'page:recrawl:claims'  # claimed revisits scored by lease expiry
         self.stats_key = 'stats'
+        self.checkpoint_prefix = 'checkpoint:'
+        self.compressor = PageCompressor(**(compression or {}))
+
+    @staticmethod
+    def url_hash(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def content_hash(body):
+        return hashlib.sha1(body).hexdigest()
+
+    def write_page(self, pipe, url, content, timestamp, title=None, encoding=None,
+                   etag=None, last_modified=None, depth=None, score=None):
+        """Queue the commands that store one page on a pipeline.
+
+        depth and score are kept so a revisit expands links as the first visit did.
+        """
+        key = self.url_hash(url)
+        body = content.encode('utf-8') if isinstance(content, str) else content
+        data, compression = self.compressor.compress(urlsplit(url).netloc, body)
+        metadata = {
+            'url': url,
+            'length': len(body),
+            'stored_length': len(data),
+            'timestamp': timestamp,
+            'checked': timestamp,
+            'content_hash': self.content_hash(body),
+            **compression
+        }
+        if title:
+            metadata['title'] = title
+        if encoding:
+            metadata['encoding'] = encoding
+        if depth is not None:
+            metadata['depth'] = depth
+        if score is not None:
+            metadata['score'] = score
+        # Validators for conditional re-fetches; a page that drops them loses the old ones
+        pipe.hdel(self.meta_prefix + key, 'etag', 'last_modified')
+        if etag:
+            metadata['etag'] = etag
+        if last_modified:
+            metadata['last_modified'] = last_modified
+        # A freshly trained dictionary must land before any page that needs it
+        for dict_id, dict_data in self.compressor.pop_new_dictionaries():
+            pipe.set(self.dict_prefix + dict_id, dict_data)
+        pipe.hset(self.meta_prefix + key, mapping=metadata)
+        pipe.set(self.body_prefix + key, data)
+        pipe.hincrby(self.compression_key, 'pages', 1)
+        pipe.hincrby(self.compression_key, 'raw_bytes', len(body))
+        pipe.hincrby(self.compression_key, 'stored_bytes', len(data))
+
+    def touch_page(self, pipe, url, timestamp):
+        """Record a revisit that found the stored page unchanged."""
+        pipe.hset(self.meta_prefix + self.url_hash(url), 'checked', timestamp)
+
+    def schedule_recrawl(self, pipe, url, interval, due):
+        """Queue url for a revisit at `due` (epoch seconds), remembering its interval."""
+        pipe.hset(self.meta_prefix + self.url_hash(url), 'recrawl_interval', interval)
+        pipe.zadd(self.recrawl_key, {url: due})
+        pipe.zrem(self.recrawl_claims_key, url)
+
+    def validator_pipeline(self, urls):
+        pipe = self.redis.pipeline(transaction=False)
+        for url in urls:
+            pipe.hmget(self.meta_prefix + self.url_hash(url), *self.validator_fields)
+        return pipe
+
+    @classmethod
+    def build_validators(cls, values):
+        validators = {field: value.decode('utf-8') for field, value in zip(cls.validator_fields, values)
+                      if value is not None}
+        for field, convert in (('recrawl_interval', float), ('depth', int), ('score', float)):
+            if field in validators:
+                validators[field] = convert(validators[field])
+        return validators
+
+    def get_validators(self, urls):
+        """ETag, Last-Modified, content hash, revisit interval, depth and score stored for each URL."""
+        return [self.build_validators(values) for values in self.validator_pipeline(urls).execute()]
+
+    def claim_due_recrawls(self, now, count, lease=600):
+        """Take up to count URLs whose revisit is due; ZREM makes each one go to a single node.
+
+        Each claim is leased for `lease` seconds: unless schedule_recrawl
+        files the URL's next visit by then, a later claim puts it back.
+        """
+        self.requeue_expired_claims(now)
+        due = self.redis.zrangebyscore(self.recrawl_key, 0, now, start=0, num=count)
+        if not due:
+            return []
+        return self.claimed(due, self.lease_pipeline(due, now, lease).execute())
+
+    def lease_pipeline(self, due, now, lease):
+        pipe = self.redis.pipeline(transaction=True)
+        for url in due:
+            pipe.zrem(self.recrawl_key, url)
+        pipe.zadd(self.recrawl_claims_key, {url: now + lease for url in due})
+        return pipe
+
+    @staticmethod
+    def claimed(due, results):
+        return [url.decode('utf-8') for url, claimed in zip(due, results) if claimed]
+
+    def requeue_expired_claims(self, now):
+        """Put revisits whose claim expired (the node died or lost them) back as due now."""
+        expired = self.redis.zrangebyscore(self.recrawl_claims_key, 0, now)
+        if expired:
+            self.requeue_pipeline(expired, now).execute()
+
+    def requeue_pipeline(self, expired, now):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zrem(self.recrawl_claims_key, *expired)
+        # NX: a URL that was rescheduled in the meantime keeps its own due time
+        pipe.zadd(self.recrawl_key, {url: now for url in expired}, nx=True)
+        return pipe
 
     def save_page(self, url, content):
         """Save a webpage to Redis."""
         try:
-            page_data = {
-                'url': url,
-                'content': content,
-                'timestamp': datetime.now().isoformat()
-            }
-            self.redis.rpush(self.page_key, json.dumps(page_data))
+            pipe = self.redis.pipeline(transaction=False)
+            self.write_page(pipe, url, content, datetime.now().isoformat())
+            pipe.execute()
             return True
         except Exception as e:
             print(f"Error saving page: {str(e)}")
@@ -33,39 +189,142 @@ class RedisStorage:
     def get_page(self, url):
         """Retrieve a webpage by URL."""
         try:
-            pages = self.redis.lrange(self.page_key, 0, -1)
-            for page in pages:
-                page_data = json.loads(page)
-                if page_data['url'] == url:
-                    return page_data
-            return None
+            key = self.url_hash(url)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hgetall(self.meta_prefix + key)
+            pipe.get(self.body_prefix + key)
+            metadata, content = pipe.execute()
+            if not metadata:
+                return None
+            metadata = self.decode_metadata(metadata)
+            self.ensure_dictionary(metadata.get('dict_id'))
+            return self.build_page(metadata, content)
         except Exception as e:
             print(f"Error getting page: {str(e)}")
             return None
 
-    def save_stats(self, stats):
-        """Save crawler statistics."""
+    @staticmethod
+    def decode_metadata(metadata):
+        return {k.decode('utf-8'): v.decode('utf-8') for k, v in metadata.items()}
+
+    def ensure_dictionary(self, dict_id):
+        """Fetch a compression dictionary trained by another writer, once."""
+        if dict_id and not self.compressor.has_dictionary(dict_id):
+            data = self.redis.get(self.dict_prefix + dict_id)
+            if data:
+                self.compressor.load_dictionary(dict_id, data)
+
+    def build_page(self, metadata, content):
+        page_data = dict(metadata)
+        content = self.compressor.decompress(content, metadata.get('codec'), metadata.get('dict_id'))
+        if content is not None:
+            content = content.decode(metadata.get('encoding', 'utf-8'), errors='replace')
+        page_data['content'] = content
+        return page_data
+
+    @staticmethod
+    def summarize_compression(totals):
+        stats = {k.decode('utf-8'): int(v) for k, v in totals.items()}
+        raw = stats.get('raw_bytes', 0)
+        stored = stats.get('stored_bytes', 0)
+        stats['compression_ratio'] = raw / stored if stored else 0
+        stats['bytes_saved'] = raw - stored
+        return stats
+
+    def iter_pages(self, batch_size=100):
+        """Yield every stored page, fetching batch_size pages per round trip."""
+        batch = []
+        for meta_key in self.redis.scan_iter(match=self.meta_prefix + '*', count=batch_size):
+            batch.append(meta_key)
+            if len(batch) >= batch_size:
+                yield from self.load_pages(batch)
+                batch = []
+        if batch:
+            yield from self.load_pages(batch)
+
+    def load_pages(self, meta_keys):
+        pipe = self.redis.pipeline(transaction=False)
+        prefix_length = len(self.meta_prefix)
+        for meta_key in meta_keys:
+            pipe.hgetall(meta_key)
+            pipe.get(self.body_prefix.encode('utf-8') + meta_key[prefix_length:])
+        results = pipe.execute()
+        for metadata, content in zip(results[::2], results[1::2]):
+            if metadata:
+                metadata = self.decode_metadata(metadata)
+                self.ensure_dictionary(metadata.get('dict_id'))
+                yield self.build_page(metadata, content)
+
+    def migrate_legacy_pages(self, batch_size=500):
+        """Move pages from the old 'pages' list into the hash-indexed layout."""
+        migrated = 0
         try:
-            self.redis.set(self.stats_key, json.dumps(stats))
+            total = self.redis.llen(self.page_key)
+            for start in range(0, total, batch_size):
+                pages = self.redis.lrange(self.page_key, start, start + batch_size - 1)
+                pipe = self.redis.pipeline(transaction=False)
+                for page in pages:
+                    page_data = json.loads(page)
+                    self.write_page(pipe, page_data['url'], page_data['content'],
+                                    page_data.get('timestamp', ''))
+                pipe.execute()
+                migrated += len(pages)
+            self.redis.delete(self.page_key)
+            print(f"Migrated {migrated} pages from '{self.page_key}'")
+        except Exception as e:
+            print(f"Error migrating pages: {str(e)}")
+        return migrated
+
+    def save_stats(self, stats, name=None):
+        """Save crawler statistics, under stats:<name> when a name is given."""
+        try:
+            self.redis.set(f'{self.stats_key}:{name}' if name else self.stats_key, json.dumps(stats))
             return True
         except Exception as e:
             print(f"Error saving stats: {str(e)}")
             return False
 
-    def get_stats(self):
+    def get_stats(self, name=None):
         """Retrieve crawler statistics."""
         try:
-            stats = self.redis.get(self.stats_key)
+            stats = self.redis.get(f'{self.stats_key}:{name}' if name else self.stats_key)
             return json.loads(stats) if stats else None
         except Exception as e:
             print(f"Error getting stats: {str(e)}")
             return None
 
+    def save_checkpoint(self, name, state):
+        """Save a crawler's resumable state under checkpoint:<name>."""
+        try:
+            self.redis.set(self.checkpoint_prefix + name, json.dumps(state))
+            return True
+        except Exception as e:
+            print(f"Error saving checkpoint: {str(e)}")
+            return False
+
+    def load_checkpoint(self, name):
+        try:
+            state = self.redis.get(self.checkpoint_prefix + name)
+            return json.loads(state) if state else None
+        except Exception as e:
+            print(f"Error loading checkpoint: {str(e)}")
+            return None
+
+    def delete_checkpoint(self, name):
+        self.redis.delete(self.checkpoint_prefix + name)
+
+    def get_compression_stats(self):
+        """Compression totals across every writer, with ratio and bytes saved."""
+        try:
+            return self.summarize_compression(self.redis.hgetall(self.compression_key))
+        except Exception as e:
+            print(f"Error getting compression stats: {str(e)}")
+            return None
+
     def get_all_pages(self):
-        """Retrieve all crawled pages."""
+        """Retrieve all crawled pages. Prefer iter_pages for large crawls."""
         try:
-            pages = self.redis.lrange(self.page_key, 0, -1)
-            return [json.loads(page) for page in pages]
+            return list(self.iter_pages())
         except Exception as e:
             print(f"Error getting all pages: {str(e)}")
             return []
@@ -73,3 +332,195 @@ class RedisStorage:
     def close(self):
         """Close the Redis connection."""
         self.redis.close()
+
+class AsyncRedisStorage(RedisStorage):
+    """RedisStorage on redis.asyncio, sharing one connection pool per server."""
+    def __init__(self, compression=None, host=None, port=None):
+        self.redis = aioredis.Redis(connection_pool=get_async_pool(
+            host or os.getenv('REDIS_HOST', 'localhost'),
+            port or os.getenv('REDIS_PORT', 6379)
+        ))
+        self.setup(compression)
+        # zstd training takes long enough to stall every fetch; it runs in a thread instead
+        self.compressor.train_later = True
+        self.training = None
+
+    def write_page(self, pipe, url, content, timestamp, title=None, encoding=None,
+                   etag=None, last_modified=None, depth=None, score=None):
+        super().write_page(pipe, url, content, timestamp, title, encoding, etag, last_modified, depth, score)
+        if self.compressor.ready and self.training is None:
+            self.training = asyncio.ensure_future(self.train_dictionaries())
+
+    async def train_dictionaries(self):
+        """Train the dictionaries of domains that collected enough samples, off the event loop.
+
+        A finished dictionary is picked up by the next write_page, which
+        stores it ahead of the first page compressed with it.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while self.compressor.ready:
+                domain, samples = self.compressor.ready.pop(0)
+                zdict = await loop.run_in_executor(None, self.compressor.train, samples)
+                self.compressor.add_dictionary(domain, zdict)
+        finally:
+            self.training = None
+
+    async def save_page(self, url, content):
+        """Save a webpage to Redis."""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            self.write_page(pipe, url, content, datetime.now().isoformat())
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error saving page: {str(e)}")
+            return False
+
+    async def get_page(self, url):
+        """Retrieve a webpage by URL."""
+        try:
+            key = self.url_hash(url)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hgetall(self.meta_prefix + key)
+            pipe.get(self.body_prefix + key)
+            metadata, content = await pipe.execute()
+            if not metadata:
+                return None
+            metadata = self.decode_metadata(metadata)
+            await self.ensure_dictionary(metadata.get('dict_id'))
+            return self.build_page(metadata, content)
+        except Exception as e:
+            print(f"Error getting page: {str(e)}")
+            return None
+
+    async def iter_pages(self, batch_size=100):
+        """Yield every stored page, fetching batch_size pages per round trip."""
+        batch = []
+        async for meta_key in self.redis.scan_iter(match=self.meta_prefix + '*', count=batch_size):
+            batch.append(meta_key)
+            if len(batch) >= batch_size:
+                for page in await self.load_pages(batch):
+                    yield page
+                batch = []
+        if batch:
+            for page in await self.load_pages(batch):
+                yield page
+
+    async def get_validators(self, urls):
+        """ETag, Last-Modified, content hash, revisit interval, depth and score stored for each URL."""
+        return [self.build_validators(values) for values in await self.validator_pipeline(urls).execute()]
+
+    async def claim_due_recrawls(self, now, count, lease=600):
+        """Take up to count URLs whose revisit is due, leased as in RedisStorage.claim_due_recrawls."""
+        await self.requeue_expired_claims(now)
+        due = await self.redis.zrangebyscore(self.recrawl_key, 0, now, start=0, num=count)
+        if not due:
+            return []
+        return self.claimed(due, await self.lease_pipeline(due, now, lease).execute())
+
+    async def requeue_expired_claims(self, now):
+        expired = await self.redis.zrangebyscore(self.recrawl_claims_key, 0, now)
+        if expired:
+            await self.requeue_pipeline(expired, now).execute()
+
+    async def ensure_dictionary(self, dict_id):
+        if dict_id and not self.compressor.has_dictionary(dict_id):
+            data = await self.redis.get(self.dict_prefix + dict_id)
+            if data:
+                self.compressor.load_dictionary(dict_id, data)
+
+    async def load_pages(self, meta_keys):
+        pipe = self.redis.pipeline(transaction=False)
+        prefix_length = len(self.meta_prefix)
+        for meta_key in meta_keys:
+            pipe.hgetall(meta_key)
+            pipe.get(self.body_prefix.encode('utf-8') + meta_key[prefix_length:])
+        results = await pipe.execute()
+        pages = []
+        for metadata, content in zip(results[::2], results[1::2]):
+            if metadata:
+                metadata = self.decode_metadata(metadata)
+                await self.ensure_dictionary(metadata.get('dict_id'))
+                pages.append(self.build_page(metadata, content))
+        return pages
+
+    async def migrate_legacy_pages(self, batch_size=500):
+        """Move pages from the old 'pages' list into the hash-indexed layout."""
+        migrated = 0
+        try:
+            total = await self.redis.llen(self.page_key)
+            for start in range(0, total, batch_size):
+                pages = await self.redis.lrange(self.page_key, start, start + batch_size - 1)
+                pipe = self.redis.pipeline(transaction=False)
+                for page in pages:
+                    page_data = json.loads(page)
+                    self.write_page(pipe, page_data['url'], page_data['content'],
+                                    page_data.get('timestamp', ''))
+                await pipe.execute()
+                migrated += len(pages)
+            await self.redis.delete(self.page_key)
+            print(f"Migrated {migrated} pages from '{self.page_key}'")
+        except Exception as e:
+            print(f"Error migrating pages: {str(e)}")
+        return migrated
+
+    async def save_stats(self, stats, name=None):
+        """Save crawler statistics, under stats:<name> when a name is given."""
+        try:
+            await self.redis.set(f'{self.stats_key}:{name}' if name else self.stats_key, json.dumps(stats))
+            return True
+        except Exception as e:
+            print(f"Error saving stats: {str(e)}")
+            return False
+
+    async def get_stats(self, name=None):
+        """Retrieve crawler statistics."""
+        try:
+            stats = await self.redis.get(f'{self.stats_key}:{name}' if name else self.stats_key)
+            return json.loads(stats) if stats else None
+        except Exception as e:
+            print(f"Error getting stats: {str(e)}")
+            return None
+
+    async def save_checkpoint(self, name, state):
+        """Save a crawler's resumable state under checkpoint:<name>."""
+        try:
+            await self.redis.set(self.checkpoint_prefix + name, json.dumps(state))
+            return True
+        except Exception as e:
+            print(f"Error saving checkpoint: {str(e)}")
+            return False
+
+    async def load_checkpoint(self, name):
+        try:
+            state = await self.redis.get(self.checkpoint_prefix + name)
+            return json.loads(state) if state else None
+        except Exception as e:
+            print(f"Error loading checkpoint: {str(e)}")
+            return None
+
+    async def delete_checkpoint(self, name):
+        await self.redis.delete(self.checkpoint_prefix + name)
+
+    async def get_compression_stats(self):
+        """Compression totals across every writer, with ratio and bytes saved."""
+        try:
+            return self.summarize_compression(await self.redis.hgetall(self.compression_key))
+        except Exception as e:
+            print(f"Error getting compression stats: {str(e)}")
+            return None
+
+    async def get_all_pages(self):
+        """Retrieve all crawled pages. Prefer iter_pages for large crawls."""
+        try:
+            return [page async for page in self.iter_pages()]
+        except Exception as e:
+            print(f"Error getting all pages: {str(e)}")
+            return []
+
+    async def close(self):
+        """Release the connection back to the shared pool."""
+        if self.training is not None:
+            await self.training
+        await self.redis.aclose()
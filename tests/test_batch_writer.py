@@ -0,0 +1,95 @@
+import asyncio
+
+import fakeredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from storage.batch_writer import BatchWriter
+
+class FlakyRedis:
+    """fakeredis whose next `failures` pipelines fail to reach the server."""
+    def __init__(self, failures=0):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.failures = failures
+        self.attempts = 0
+
+    def pipeline(self, transaction=False):
+        pipe = self.redis.pipeline(transaction=transaction)
+        self.attempts += 1
+        if self.failures:
+            self.failures -= 1
+
+            async def execute(raise_on_error=True):
+                raise RedisConnectionError('Connection refused')
+            pipe.execute = execute
+        return pipe
+
+def make_writer(client, **kwargs):
+    return BatchWriter(client, retry_backoff=0.001, max_backoff=0.01, **kwargs)
+
+def test_failed_batch_is_retried_in_order():
+    async def scenario():
+        client = FlakyRedis(failures=2)
+        writer = make_writer(client)
+        done, calls = [], []
+
+        def push(value):
+            def operation(pipe):
+                calls.append(value)  # runs once, however often the batch is resent
+                pipe.rpush('log', value)
+            return operation
+        for value in 'abc':
+            await writer.submit(push(value), lambda value=value: done.append(value))
+        assert not await writer.flush()
+        await writer.submit(push('d'), lambda: done.append('d'))
+        assert not await writer.flush()
+        assert await writer.flush()
+        assert await client.redis.lrange('log', 0, -1) == [b'a', b'b', b'c', b'd']
+        assert done == calls == ['a', 'b', 'c', 'd']
+        assert writer.stats['retries'] == 2
+        assert writer.stats['failed'] == 0
+        assert writer.buffer == []
+    asyncio.run(scenario())
+
+def test_broken_operations_are_dropped_alone():
+    async def scenario():
+        client = FlakyRedis()
+        writer = make_writer(client)
+        done = []
+        await client.redis.set('text', 'not a number')
+
+        def broken(pipe):
+            raise ValueError('cannot serialize')
+        await writer.submit(lambda pipe: pipe.set('a', 1), lambda: done.append('a'))
+        await writer.submit(broken, lambda: done.append('broken'))
+        await writer.submit(lambda pipe: pipe.incr('text'), lambda: done.append('rejected'))
+        await writer.submit(lambda pipe: pipe.hset('h', mapping={'k': None}), lambda: done.append('unencodable'))
+        await writer.submit(lambda pipe: pipe.set('b', 2), lambda: done.append('b'))
+        assert await writer.flush()
+        assert done == ['a', 'b']
+        assert await client.redis.mget('a', 'b') == [b'1', b'2']
+        assert writer.stats['failed'] == 3
+        assert writer.buffer == []
+    asyncio.run(scenario())
+
+def test_close_retries_until_written():
+    async def scenario():
+        client = FlakyRedis(failures=3)
+        writer = make_writer(client, flush_interval=0.001)
+        await writer.start()
+        await writer.submit(lambda pipe: pipe.set('key', 'value'))
+        await writer.close()
+        assert await client.redis.get('key') == b'value'
+        assert writer.stats['failed'] == 0
+    asyncio.run(scenario())
+
+def test_close_gives_up_after_close_retries():
+    async def scenario():
+        client = FlakyRedis(failures=100)
+        writer = make_writer(client, close_retries=2)
+        await writer.submit(lambda pipe: pipe.set('a', 1))
+        await writer.submit(lambda pipe: pipe.set('b', 1))
+        await writer.close()
+        assert client.attempts == 3
+        assert writer.stats['failed'] == 2
+        assert writer.buffer == []
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+import pytest
+
+from bloom_filter.adaptive_bloom import AdaptiveBloomFilter
+from bloom_filter.snapshot import SnapshotError, read_header
+
+def urls(start, count, prefix='https://example.com/page/'):
+    return [f'{prefix}{i}' for i in range(start, start + count)]
+
+@pytest.fixture
+def bloom():
+    # Small slices so the snapshot holds more than one of them
+    bloom = AdaptiveBloomFilter(initial_capacity=1000, error_rate=0.01, reservoir_size=100)
+    for start in range(0, 5000, 500):
+        bloom.add_many(urls(start, 500))
+    assert len(bloom.bloom_filter.filters) > 1
+    return bloom
+
+def test_save_load_keeps_membership(bloom, tmp_path):
+    path = tmp_path / 'seen.abf'
+    bloom.save(path)
+    loaded = AdaptiveBloomFilter.load(path, verify=True)
+
+    assert loaded.contains_many(urls(0, 5000)).all()
+    unseen = loaded.contains_many(urls(0, 5000, prefix='https://other.org/'))
+    assert list(unseen) == list(bloom.contains_many(urls(0, 5000, prefix='https://other.org/')))
+    assert loaded.bloom_filter.count == bloom.bloom_filter.count
+    assert loaded.bloom_filter.capacity == bloom.bloom_filter.capacity
+    assert len(loaded.bloom_filter.filters) == len(bloom.bloom_filter.filters)
+    assert loaded.inserted_items == bloom.inserted_items
+    assert loaded.grow_fill == bloom.grow_fill
+
+def test_loaded_filter_keeps_growing(bloom, tmp_path):
+    path = tmp_path / 'seen.abf'
+    bloom.save(path)
+    loaded = AdaptiveBloomFilter.load(path)
+    present = loaded.add_many(urls(4990, 20))
+    assert list(present) == [True] * 10 + [False] * 10
+    assert loaded.bloom_filter.count == bloom.bloom_filter.count + 10
+    # The default copy-on-write mapping leaves the file untouched
+    assert AdaptiveBloomFilter.load(path).bloom_filter.count == bloom.bloom_filter.count
+
+def test_copy_is_independent(bloom, tmp_path):
+    copy = bloom.copy()
+    bloom.add_many(urls(10000, 10))
+    assert not copy.contains_many(urls(10000, 10)).any()
+    path = tmp_path / 'copy.abf'
+    copy.save(path)
+    assert AdaptiveBloomFilter.load(path).contains_many(urls(0, 5000)).all()
+
+def test_corrupt_snapshot_is_rejected(bloom, tmp_path):
+    path = tmp_path / 'seen.abf'
+    bloom.save(path)
+    data_start = read_header(path)['data_start']
+    with open(path, 'r+b') as f:
+        f.seek(data_start)
+        byte = f.read(1)
+        f.seek(data_start)
+        f.write(bytes([byte[0] ^ 0xff]))
+    with pytest.raises(SnapshotError):
+        AdaptiveBloomFilter.load(path, verify=True)
+
+    path.write_bytes(b'not a snapshot at all')
+    with pytest.raises(SnapshotError):
+        AdaptiveBloomFilter.load(path)
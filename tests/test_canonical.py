@@ -0,0 +1,59 @@
+import pytest
+
+from crawler.canonical import UrlCanonicalizer, remove_dot_segments
+
+@pytest.fixture
+def canonicalizer():
+    return UrlCanonicalizer()
+
+@pytest.mark.parametrize('variants, canonical', [
+    (['HTTP://Example.COM/a', 'http://example.com:80/a', 'http://example.com/a#top', 'http://example.com/a/'],
+     'http://example.com/a'),
+    (['https://example.com:443/', 'https://example.com', 'https://user:pw@example.com/', 'https://example.com./'],
+     'https://example.com/'),
+    (['https://example.com/x?b=2&a=1', 'https://example.com/x?a=1&b=2&utm_source=feed',
+      'https://example.com/x?a=1&gclid=abc&b=2&sessionid=42'],
+     'https://example.com/x?a=1&b=2'),
+    (['https://example.com/a/./b/../c', 'https://example.com/a/c', 'https://example.com/a/b/../../a/c'],
+     'https://example.com/a/c'),
+    (['https://example.com/caf%c3%a9', 'https://example.com/caf%C3%A9', 'https://example.com/café'],
+     'https://example.com/caf%C3%A9'),
+    (['https://example.com/a%2fb', 'https://example.com/a%2Fb'], 'https://example.com/a%2Fb'),
+    (['https://example.com/cart;jsessionid=ABC123', 'https://example.com/cart'], 'https://example.com/cart'),
+])
+def test_equivalent_urls_share_one_form(canonicalizer, variants, canonical):
+    assert {canonicalizer.canonicalize(url) for url in variants} == {canonical}
+
+def test_relative_links_resolve_against_base(canonicalizer):
+    base = 'https://example.com/docs/guide/index.html'
+    assert canonicalizer.canonicalize('../api?utm_medium=x', base) == 'https://example.com/docs/api'
+    assert canonicalizer.canonicalize('#section', base) == 'https://example.com/docs/guide/index.html'
+    assert canonicalizer.canonicalize('//Other.org/', base) == 'https://other.org/'
+
+def test_distinct_resources_stay_distinct(canonicalizer):
+    urls = ['https://example.com/a', 'http://example.com/a', 'https://example.com:8443/a',
+            'https://example.com/a?page=2', 'https://example.com/A']
+    assert len({canonicalizer.canonicalize(url) for url in urls}) == len(urls)
+
+@pytest.mark.parametrize('href', ['mailto:me@example.com', 'javascript:void(0)', 'ftp://example.com/f',
+                                  'http://', 'http://exa mple.com:99999/'])
+def test_uncrawlable_links_are_rejected(canonicalizer, href):
+    assert canonicalizer.canonicalize(href) is None
+
+def test_options():
+    https = UrlCanonicalizer(force_https=True, strip_trailing_slash=False)
+    assert https.canonicalize('http://example.com:80/a/') == 'https://example.com/a/'
+    unsorted = UrlCanonicalizer(sort_query=False, drop_params=['ref'])
+    assert unsorted.canonicalize('https://example.com/?b=1&ref=x&a=2') == 'https://example.com/?b=1&a=2'
+
+def test_idna_host(canonicalizer):
+    assert canonicalizer.canonicalize('https://bücher.example/') == 'https://xn--bcher-kva.example/'
+
+@pytest.mark.parametrize('path, resolved', [
+    ('/a/b/c/./../../g', '/a/g'),
+    ('/../a', '/a'),
+    ('/a/b/..', '/a/'),
+    ('/a/.', '/a/'),
+])
+def test_remove_dot_segments(path, resolved):
+    assert remove_dot_segments(path) == resolved
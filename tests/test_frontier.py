@@ -0,0 +1,179 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from crawler.frontier import ShardedRedisFrontier
+
+SHARDS = 8
+LEASE_TTL = 0.3
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def make_node(server, node_id, **kwargs):
+    """A frontier node on the fake server; tests drive rebalance() instead of the heartbeat."""
+    frontier = ShardedRedisFrontier('test', shards=SHARDS, lease_ttl=LEASE_TTL, node_id=node_id, **kwargs)
+    frontier.db = fakeredis.FakeAsyncRedis(server=server)
+    frontier.is_connected = True
+    return frontier
+
+async def lease_owners(frontier):
+    owners = await frontier.db.mget([frontier.lease_key(shard) for shard in range(SHARDS)])
+    return [owner.decode('utf-8') if owner else None for owner in owners]
+
+def test_shards_split_between_live_nodes(server):
+    async def scenario():
+        a, b = make_node(server, 'a'), make_node(server, 'b')
+        await a.rebalance()
+        assert a.owned == list(range(SHARDS))
+        # b only gets its shards once a has seen it join and let them go
+        await b.rebalance()
+        assert b.owned == []
+        await a.rebalance()
+        await b.rebalance()
+        assert sorted(a.owned + b.owned) == list(range(SHARDS))
+        assert a.owned and b.owned
+        assert b.owned == b.assigned_shards(['a', 'b'])
+        assert await lease_owners(a) == ['a' if shard in a.owned else 'b' for shard in range(SHARDS)]
+    asyncio.run(scenario())
+
+def test_lease_taken_over_after_ttl(server):
+    async def scenario():
+        a, b = make_node(server, 'a'), make_node(server, 'b')
+        await a.rebalance()
+        await b.rebalance()
+        await a.rebalance()
+        await b.rebalance()
+        a_shards = list(a.owned)
+        # a stops heartbeating; its leases and its entry in the node set lapse
+        await asyncio.sleep(LEASE_TTL / 2)
+        await b.rebalance()
+        assert b.owned != list(range(SHARDS))
+        await asyncio.sleep(LEASE_TTL)
+        await b.rebalance()
+        assert b.live_nodes == ['b']
+        assert b.owned == list(range(SHARDS))
+        assert b.stats['acquired'] == SHARDS
+        # A node that comes back late finds its leases gone
+        for shard in a_shards:
+            assert not await a.renew(shard)
+        await a.rebalance()
+        assert a.owned == []
+        assert a.stats['lost'] == len(a_shards)
+        # ...and gets its share back once the survivor sees it again
+        await b.rebalance()
+        await a.rebalance()
+        assert a.owned == a_shards
+        assert sorted(a.owned + b.owned) == list(range(SHARDS))
+    asyncio.run(scenario())
+
+def test_close_hands_shards_over_at_once(server):
+    async def scenario():
+        a, b = make_node(server, 'a'), make_node(server, 'b')
+        await a.rebalance()
+        await b.rebalance()
+        await a.close()
+        await b.rebalance()
+        assert b.owned == list(range(SHARDS))
+        await b.close()
+    asyncio.run(scenario())
+
+def test_pushes_route_by_host(server):
+    async def scenario():
+        a = make_node(server, 'a')
+        await a.rebalance()
+        urls = [f'https://host{i}.example/page' for i in range(20)]
+        for url in urls:
+            await a.push(url, depth=2, score=1.0)
+            await a.push(url.replace('page', 'other'), depth=2, score=2.0)
+        for url in urls:
+            members = await a.db.zrange(a.shard_key(a.shard_of(url)), 0, -1)
+            assert url.encode('utf-8') in members
+            assert url.replace('page', 'other').encode('utf-8') in members
+        # Each pop splits its count evenly over the shards, so drain in rounds
+        entries = []
+        while await a.size():
+            entries += await a.pop_many(40)
+        assert sorted(url for url, _, _ in entries) == sorted(urls + [u.replace('page', 'other') for u in urls])
+        assert {depth for _, depth, _ in entries} == {2}
+        assert await a.size() == 0
+    asyncio.run(scenario())
+
+async def claim_all(frontier, retries=False):
+    """Pop until nothing is left, since each pop splits its count over the shards."""
+    entries = []
+    while True:
+        batch = await (frontier.pop_retries(SHARDS) if retries else frontier.pop_many(SHARDS))
+        if not batch:
+            return entries
+        entries += batch
+
+async def ack(frontier, *urls):
+    pipe = frontier.db.pipeline(transaction=False)
+    frontier.write_ack(pipe, *urls)
+    await pipe.execute()
+
+def test_unacked_claims_requeued_from_dead_node(server):
+    async def scenario():
+        a = make_node(server, 'a', reliable=True)
+        await a.rebalance()
+        urls = [f'https://host{i}.example/' for i in range(3)]
+        for depth, url in enumerate(urls):
+            await a.push(url, depth=depth, score=1.0 + depth)
+        claimed = await claim_all(a)
+        assert sorted(url for url, _, _ in claimed) == urls
+        assert await a.size() == 0
+        await ack(a, urls[0])
+
+        # a dies without acking the other two; b takes over its shards and reaps
+        b = make_node(server, 'b', reliable=True)
+        await asyncio.sleep(LEASE_TTL * 1.2)
+        await b.rebalance()
+        assert b.owned == list(range(SHARDS))
+        assert b.stats['requeued'] == 2
+        retried = await claim_all(b, retries=True)
+        assert sorted(retried) == [(urls[1], 1, 2.0), (urls[2], 2, 3.0)]
+        assert await claim_all(b) == []
+        # Nothing is left under the dead node's name
+        assert not await b.db.sismember(b.workers_key, 'a')
+        for shard in range(SHARDS):
+            assert not await b.db.exists(a.processing_key(shard))
+
+        await ack(b, urls[1], urls[2])
+        for shard in range(SHARDS):
+            assert not await b.db.exists(b.processing_key(shard), b.retry_key(shard))
+        assert await b.db.hlen(f'{b.shard_key(b.shard_of(urls[1]))}:depth') == 0
+    asyncio.run(scenario())
+
+def test_live_node_claims_are_not_requeued(server):
+    async def scenario():
+        a, b = make_node(server, 'a', reliable=True), make_node(server, 'b', reliable=True)
+        await a.rebalance()
+        await b.rebalance()
+        await a.rebalance()
+        await b.rebalance()
+        for i in range(10):
+            await a.push(f'https://host{i}.example/')
+        claimed_a, claimed_b = await claim_all(a), await claim_all(b)
+        assert len(claimed_a) + len(claimed_b) == 10
+        await a.rebalance()
+        await b.rebalance()
+        assert a.stats['requeued'] == b.stats['requeued'] == 0
+        assert await claim_all(a, retries=True) == await claim_all(b, retries=True) == []
+    asyncio.run(scenario())
+
+def test_close_requeues_own_claims(server):
+    async def scenario():
+        a = make_node(server, 'a', reliable=True)
+        await a.rebalance()
+        await a.push('https://host1.example/', depth=1)
+        await a.push('https://host2.example/', depth=1)
+        first, second = await claim_all(a)
+        await ack(a, first[0])
+        await a.close()
+        b = make_node(server, 'b', reliable=True)
+        await b.rebalance()
+        assert await claim_all(b, retries=True) == [second]
+    asyncio.run(scenario())
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from crawler.robots import RobotsCache, RobotsRules, parse_robots, product_token
+
+ROBOTS = """
+User-agent: *
+Disallow: /private
+
+User-agent:
+Disallow: /empty-agent
+
+User-agent: Distributed
+Disallow: /prefix-agent
+
+User-agent: DistributedCrawler/2.1
+Disallow: /ours
+Crawl-delay: 3
+"""
+
+@pytest.mark.parametrize('user_agent, token', [
+    ('DistributedCrawler', 'distributedcrawler'),
+    ('DistributedCrawler/1.0 (+https://example.com/bot)', 'distributedcrawler'),
+    ('  Googlebot-News', 'googlebot-news'),
+    ('', '')
+])
+def test_product_token(user_agent, token):
+    assert product_token(user_agent) == token
+
+def test_group_matches_product_token_only():
+    rules = parse_robots(ROBOTS, 'DistributedCrawler/1.0')
+    assert not rules.allowed('/ours/page')
+    assert rules.allowed('/empty-agent')
+    assert rules.allowed('/prefix-agent')
+    assert rules.allowed('/private')
+    assert rules.crawl_delay == 3
+
+def test_other_agents_fall_back_to_star():
+    rules = parse_robots(ROBOTS, 'Crawler')
+    assert not rules.allowed('/private')
+    assert rules.allowed('/empty-agent')
+    assert rules.allowed('/ours')
+
+def test_longest_match_allow_wins_ties():
+    rules = parse_robots('User-agent: *\nDisallow: /a\nAllow: /a/b\nDisallow: /*.pdf$\nAllow: /a\n', 'bot')
+    assert rules.allowed('/a/b/c')
+    assert rules.allowed('/a')
+    assert not rules.allowed('/doc.pdf')
+    assert rules.allowed('/doc.pdf?x=1')
+
+class FakeResponse:
+    def __init__(self, status, body=b''):
+        self.status = status
+        self.body = body
+        self.content = self
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeSession:
+    """Answers robots.txt requests from a list of responses (or exceptions to raise)."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append((url, headers))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def make_cache(*responses, **kwargs):
+    cache = RobotsCache(**kwargs)
+    cache.connect(FakeSession(*responses))
+    return cache
+
+@pytest.mark.parametrize('failure', [FakeResponse(503), OSError('Connection reset')])
+def test_unreachable_robots_is_not_a_disallow(failure):
+    async def scenario():
+        cache = make_cache(failure, error_ttl=60)
+        assert await cache.allowed('https://example.com/page') is None
+        assert await cache.allowed('https://example.com/other') is None
+        assert cache.known_allowed('https://example.com/page') is None
+        assert 59 < cache.retry_after('https://example.com/page') <= 60
+        assert cache.stats['blocked'] == 0
+        assert cache.stats['unreachable'] == 2
+        assert cache.stats['fetched'] == 1
+    asyncio.run(scenario())
+
+def test_rules_are_fetched_again_after_error_ttl():
+    async def scenario():
+        cache = make_cache(FakeResponse(500), FakeResponse(200, b'User-agent: *\nDisallow: /no\n'),
+                           error_ttl=0.05)
+        assert await cache.allowed('https://example.com/no') is None
+        await asyncio.sleep(0.06)
+        assert await cache.allowed('https://example.com/no') is False
+        assert await cache.allowed('https://example.com/yes') is True
+    asyncio.run(scenario())
+
+def test_missing_robots_allows_everything():
+    async def scenario():
+        cache = make_cache(FakeResponse(404))
+        assert await cache.allowed('https://example.com/anything') is True
+        assert cache.known_allowed('https://example.com/else') is True
+    asyncio.run(scenario())
+
+def test_body_read_up_to_cap_and_agent_sent():
+    async def scenario():
+        body = b'User-agent: *\n' + b'Allow: /filler\n' * 5000 + b'Disallow: /late\n'
+        cache = make_cache(FakeResponse(200, body), user_agent='DistributedCrawler/1.0')
+        assert await cache.allowed('https://example.com/late') is False
+        assert cache.session.requests == [('https://example.com/robots.txt',
+                                           {'User-Agent': 'DistributedCrawler/1.0'})]
+    asyncio.run(scenario())
+
+def test_unreachable_state_survives_redis_round_trip():
+    rules = RobotsRules.from_json(RobotsRules([(False, '/')], unreachable=True).to_json())
+    assert rules.unreachable
+    assert not RobotsRules.from_json('{"rules": [], "crawl_delay": null}').unreachable
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from crawler.scheduler import CrawlScheduler
+
+DELAY = 0.05
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+def make_scheduler(**config):
+    return CrawlScheduler({'crawl_delay': DELAY, 'max_depth': 3, **config})
+
+async def drain(scheduler, count):
+    """Fetch count URLs, finishing each before asking for the next; returns (url, time) pairs."""
+    fetched = []
+    for _ in range(count):
+        url, _, _ = await scheduler.get_next_url()
+        fetched.append((url, time.monotonic()))
+        scheduler.update_last_crawled(url)
+    return fetched
+
+def test_higher_scores_first_fifo_among_ties():
+    scheduler = make_scheduler(crawl_delay=0)
+    for path, score in [('a', 1), ('b', 5), ('c', 1), ('d', 5), ('e', 3)]:
+        scheduler.schedule_url(f'https://example.com/{path}', score=score)
+    fetched = run(drain(scheduler, 5))
+    assert [url.rsplit('/', 1)[1] for url, _ in fetched] == ['b', 'd', 'e', 'a', 'c']
+
+def test_same_host_waits_for_crawl_delay():
+    scheduler = make_scheduler()
+    for i in range(3):
+        scheduler.schedule_url(f'https://example.com/{i}')
+    fetched = run(drain(scheduler, 3))
+    gaps = [later - earlier for (_, earlier), (_, later) in zip(fetched, fetched[1:])]
+    assert all(gap >= DELAY * 0.9 for gap in gaps)
+
+def test_waiting_host_does_not_block_others():
+    scheduler = make_scheduler(crawl_delay=1.0)
+    scheduler.schedule_url('https://slow.example/1')
+    scheduler.schedule_url('https://slow.example/2')
+    scheduler.schedule_url('https://a.example/')
+    scheduler.schedule_url('https://b.example/')
+    started = time.monotonic()
+    fetched = run(drain(scheduler, 3))
+    assert time.monotonic() - started < 0.5
+    assert {url for url, _ in fetched} == {'https://slow.example/1', 'https://a.example/', 'https://b.example/'}
+    assert scheduler.pending_urls == {'https://slow.example/2'}
+
+def test_host_crawl_delay_override():
+    scheduler = make_scheduler(crawl_delay=0)
+    scheduler.set_crawl_delay('Polite.example', DELAY * 4)
+    scheduler.schedule_url('https://polite.example/1')
+    scheduler.schedule_url('https://polite.example/2')
+    fetched = run(drain(scheduler, 2))
+    assert fetched[1][1] - fetched[0][1] >= DELAY * 4 * 0.9
+
+def test_in_flight_host_is_not_handed_out_again():
+    async def scenario():
+        scheduler = make_scheduler(crawl_delay=0)
+        scheduler.schedule_url('https://example.com/1')
+        scheduler.schedule_url('https://example.com/2')
+        first, _, _ = await scheduler.get_next_url()
+        assert scheduler.is_rate_limited('https://example.com/2')
+        waiting = asyncio.ensure_future(scheduler.get_next_url())
+        await asyncio.sleep(DELAY)
+        assert not waiting.done()
+        scheduler.update_last_crawled(first)
+        second, _, _ = await waiting
+        return first, second
+    assert run(scenario()) == ('https://example.com/1', 'https://example.com/2')
+
+def test_rejects_duplicates_and_deep_urls():
+    scheduler = make_scheduler()
+    assert scheduler.schedule_url('https://example.com/', depth=3)
+    assert not scheduler.schedule_url('https://example.com/', depth=1)
+    assert not scheduler.schedule_url('https://example.com/deep', depth=4)
+    assert scheduler.get_stats()['pending_urls'] == 1
+
+def test_delay_runs_from_finish_with_several_slots():
+    async def scenario():
+        scheduler = make_scheduler(crawl_delay=DELAY * 2, max_per_host=2)
+        scheduler.schedule_url('https://example.com/1')
+        scheduler.schedule_url('https://example.com/2')
+        first, _, _ = await scheduler.get_next_url()
+        await asyncio.sleep(DELAY)
+        finished = time.monotonic()
+        scheduler.update_last_crawled(first)
+        await scheduler.get_next_url()
+        return time.monotonic() - finished
+    assert run(scenario()) >= DELAY * 2 * 0.9
+
+def test_deferred_host_waits():
+    async def scenario():
+        scheduler = make_scheduler(crawl_delay=0)
+        scheduler.schedule_url('https://example.com/1')
+        scheduler.schedule_url('https://other.example/1')
+        scheduler.defer_host('Example.com', DELAY * 2)
+        started = time.monotonic()
+        first, _, _ = await scheduler.get_next_url()
+        second, _, _ = await scheduler.get_next_url()
+        return first, second, time.monotonic() - started
+    first, second, waited = run(scenario())
+    assert (first, second) == ('https://other.example/1', 'https://example.com/1')
+    assert waited >= DELAY * 2 * 0.9
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import fakeredis
+
+from storage.redis_storage import AsyncRedisStorage
+
+def make_storage():
+    storage = AsyncRedisStorage(compression={'dictionaries': False})
+    storage.redis = fakeredis.FakeAsyncRedis()
+    return storage
+
+async def write(storage, operation):
+    pipe = storage.redis.pipeline(transaction=False)
+    operation(pipe)
+    await pipe.execute()
+
+def test_revisit_keeps_depth_and_score():
+    async def scenario():
+        storage = make_storage()
+        url = 'https://example.com/deep'
+        await write(storage, lambda pipe: storage.write_page(
+            pipe, url, b'<html>page</html>', '2026-01-01T00:00:00', etag='"v1"', depth=4, score=0.25))
+        [validators] = await storage.get_validators([url])
+        assert validators['depth'] == 4
+        assert validators['score'] == 0.25
+        assert validators['etag'] == '"v1"'
+        page = await storage.get_page(url)
+        assert page['content'] == '<html>page</html>'
+    asyncio.run(scenario())
+
+def test_pages_stored_without_depth_have_no_depth():
+    async def scenario():
+        storage = make_storage()
+        await write(storage, lambda pipe: storage.write_page(pipe, 'https://example.com/', b'x', 'now'))
+        [validators] = await storage.get_validators(['https://example.com/'])
+        assert 'depth' not in validators and 'score' not in validators
+    asyncio.run(scenario())
+
+def test_expired_recrawl_claim_is_handed_out_again():
+    async def scenario():
+        storage = make_storage()
+        now = time.time()
+        await write(storage, lambda pipe: storage.schedule_recrawl(pipe, 'https://example.com/a', 60, now - 1))
+        assert await storage.claim_due_recrawls(now, 10, lease=0.1) == ['https://example.com/a']
+        assert await storage.claim_due_recrawls(now, 10, lease=0.1) == []
+        assert await storage.claim_due_recrawls(time.time() + 0.2, 10) == ['https://example.com/a']
+        # Filing the next visit ends the claim
+        await write(storage, lambda pipe: storage.schedule_recrawl(pipe, 'https://example.com/a', 60, now + 60))
+        assert await storage.redis.zcard(storage.recrawl_claims_key) == 0
+        assert await storage.claim_due_recrawls(now + 30, 10) == []
+    asyncio.run(scenario())